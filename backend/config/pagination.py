@@ -0,0 +1,274 @@
+"""
+Pagination classes shared by all API apps.
+
+HybridPagination keeps page-number pagination as the default and switches
+to keyset (cursor) pagination when the client sends ``?pagination=cursor``
+or a ``cursor`` param, or when a viewset sets ``pagination_mode = 'cursor'``.
+
+Keyset pages seek on the queryset's ordering plus an ``id`` tiebreaker
+(``WHERE (created_at, id) < (last_created_at, last_id)``) and never run
+``COUNT(*)``, so every page costs the same no matter how deep it is.
+Ordering fields must be non-nullable, unless they are ordered with an
+explicit ``nulls_first``/``nulls_last`` (``F('field').desc(nulls_last=True)``),
+in which case the seek condition gets a branch for the NULL rows.
+Related fields (``product__price``) are supported.
+
+SinceKeysetPagination adds an incremental feed: ``?since=<cursor>``
+returns only the rows after that position, oldest first, so a client can
+poll for what is new instead of re-reading the whole collection.
+"""
+
+import base64
+import binascii
+import datetime
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import F, OrderBy, Q
+from rest_framework.exceptions import NotFound, ParseError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value) -> str | None:
+    """Serialize a position value without losing precision."""
+    if value is None:
+        return None
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+def _order_expression(name: str, descending: bool, nulls_last: bool | None):
+    """order_by() argument of one keyset ordering entry."""
+    if nulls_last is None:
+        return f"{'-' if descending else ''}{name}"
+    nulls = {'nulls_last': True} if nulls_last else {'nulls_first': True}
+    return F(name).desc(**nulls) if descending else F(name).asc(**nulls)
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only keyset pagination over the queryset ordering."""
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, queryset) -> list[tuple[str, bool, bool | None]]:
+        """
+        Get (field, descending, nulls_last) entries for the queryset ordering.
+
+        ``nulls_last`` is None for plain field names (non-nullable fields)
+        and True/False for ``F()`` orderings with explicit null placement.
+        Any existing pk ordering is dropped and ``id`` is appended as the
+        tiebreaker, in the direction of the leading field. Other ordering
+        expressions cannot be seeked on and are rejected with a 400.
+        """
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        fields = []
+        for item in ordering:
+            if isinstance(item, str):
+                name, descending, nulls_last = item.lstrip('-'), item.startswith('-'), None
+            elif isinstance(item, OrderBy) and isinstance(item.expression, F):
+                name, descending = item.expression.name, item.descending
+                nulls_last = True if item.nulls_last else False if item.nulls_first else None
+            else:
+                raise ParseError('This ordering does not support cursor pagination')
+            if name not in ('id', 'pk'):
+                fields.append((name, descending, nulls_last))
+        descending = fields[0][1] if fields else True
+        fields.append(('id', descending, None))
+        return fields
+
+    def decode_cursor(self, request) -> list | None:
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, item) -> str:
+        """Encode the position of a row (model instance or values() dict)."""
+        position = []
+        for name, *_ in self.ordering:
+            if isinstance(item, dict):
+                value = item[name]
+            else:
+                value = item
+                for attribute in name.split('__'):
+                    value = getattr(value, attribute)
+            position.append(_encode_value(value))
+        return base64.urlsafe_b64encode(json.dumps(position).encode('ascii')).decode('ascii')
+
+    def seek_filter(self, position: list) -> Q:
+        """
+        Build the lexicographic "after this position" condition.
+
+        For a field with explicit null placement, NULLs count as greater
+        than every value when they sort last and smaller when they sort
+        first.
+        """
+        condition = Q()
+        for index, (name, descending, nulls_last) in enumerate(self.ordering):
+            value = position[index]
+            if value is None:
+                if nulls_last is not False:
+                    # Nothing sorts after NULL but ties on later fields
+                    continue
+                clause = Q(**{f'{name}__isnull': False})
+            else:
+                clause = Q(**{f"{name}__{'lt' if descending else 'gt'}": value})
+                if nulls_last:
+                    clause |= Q(**{f'{name}__isnull': True})
+            for (previous, *_), previous_value in zip(self.ordering[:index], position):
+                if previous_value is None:
+                    clause &= Q(**{f'{previous}__isnull': True})
+                else:
+                    clause &= Q(**{previous: previous_value})
+            condition |= clause
+        return condition
+
+    def order_queryset(self, queryset):
+        """Order the queryset by its keyset ordering (including the tiebreaker)."""
+        self.ordering = self.get_ordering(queryset)
+        return queryset.order_by(*[_order_expression(*entry) for entry in self.ordering])
+
+    def cursor_for(self, queryset, item) -> str:
+        """Encode a cursor for the rows that follow item in queryset's ordering."""
+        self.ordering = self.get_ordering(queryset)
+        return self.encode_cursor(item)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        queryset = self.order_queryset(queryset)
+
+        position = self.decode_cursor(request)
+        if position is not None:
+            if len(position) != len(self.ordering):
+                raise NotFound(self.invalid_cursor_message)
+            try:
+                queryset = queryset.filter(self.seek_filter(position))
+            except (ValidationError, ValueError, TypeError):
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset[:self.page_size_value + 1])
+        self.has_next = len(rows) > self.page_size_value
+        self.page = rows[:self.page_size_value]
+        return self.page
+
+    def get_next_link(self) -> str | None:
+        if not self.has_next or not self.page:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.page[-1]))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class SinceKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination with an incremental ``?since=`` feed.
+
+    Without ``since`` it pages like KeysetPagination. With ``since`` (a
+    cursor of this pagination, or empty to start from the beginning) the
+    ordering is reversed, so only rows newer than that position come
+    back, oldest first. ``next`` continues the feed and ``cursor`` is the
+    position to poll from next time.
+    """
+
+    since_query_param = 'since'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.feed = self.since_query_param in request.query_params
+        if self.feed:
+            self.cursor_query_param = self.since_query_param
+        return super().paginate_queryset(queryset, request, view)
+
+    def order_queryset(self, queryset):
+        if not self.feed:
+            return super().order_queryset(queryset)
+        self.ordering = [
+            (name, not descending, None if nulls_last is None else not nulls_last)
+            for name, descending, nulls_last in self.get_ordering(queryset)
+        ]
+        return queryset.order_by(*[_order_expression(*entry) for entry in self.ordering])
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.feed:
+            response.data['cursor'] = (
+                self.encode_cursor(self.page[-1]) if self.page
+                else self.request.query_params.get(self.since_query_param) or None
+            )
+        return response
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['cursor'] = {'type': 'string', 'nullable': True}
+        return response_schema
+
+
+class HybridPagination(PageNumberPagination):
+    """
+    Page-number pagination with opt-in keyset mode.
+
+    Keyset mode is selected with ``?pagination=cursor``, by sending a
+    ``cursor`` param, or per viewset with ``pagination_mode = 'cursor'``.
+    """
+
+    mode_query_param = 'pagination'
+    keyset_class = KeysetPagination
+
+    def use_keyset(self, request, view=None) -> bool:
+        if getattr(view, 'pagination_mode', None) == 'cursor':
+            return True
+        params = request.query_params
+        return (
+            params.get(self.mode_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request, view):
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -220,7 +220,7 @@ REST_FRAMEWORK = {
     ],
     
     # Pagination
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'config.pagination.HybridPagination',
     'PAGE_SIZE': 20,
     
     # Filtering
@@ -239,6 +239,8 @@ REST_FRAMEWORK = {
     'DEFAULT_THROTTLE_RATES': {
         'anon': os.environ.get('THROTTLE_ANON', '5000/hour'),
         'user': os.environ.get('THROTTLE_USER', '10000/hour'),
+        # Full catalog exports (ScopedRateThrottle scope)
+        'export': os.environ.get('THROTTLE_EXPORT', '60/hour'),
     },
     
     # Schema generation
@@ -403,6 +405,39 @@ if USE_S3:
     print(f"[Settings] S3 Bucket: {AWS_STORAGE_BUCKET_NAME}")
     print(f"[Settings] S3 Custom Domain: {AWS_S3_CUSTOM_DOMAIN}")
 
+# Resized WebP/JPEG variants of uploaded photos are generated after the
+# upload commits on a background thread pool; set to false to generate them
+# inline (tests, scripts).
+IMAGE_VARIANTS_ASYNC = os.environ.get('IMAGE_VARIANTS_ASYNC', 'true').lower() == 'true'
+
+# Public origin of the frontend, used for absolute links (sitemaps). Must
+# match the frontend's NEXT_PUBLIC_SITE_URL, which it falls back to.
+SITE_URL = (
+    os.environ.get('SITE_URL')
+    or os.environ.get('NEXT_PUBLIC_SITE_URL')
+    or 'http://localhost:3000'
+)
+
+# =============================================================================
+# CATALOG CACHE
+# =============================================================================
+
+# Cached catalog responses are invalidated by a version bump on every catalog
+# edit, so the timeout only bounds how long unused entries linger.
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# The homepage bundle also embeds community forest stats, which change on
+# every adoption without bumping the catalog version; keep its timeout short.
+HOME_CACHE_TIMEOUT = int(os.environ.get('HOME_CACHE_TIMEOUT', 60 * 5))
+
+# Rebuild the homepage bundle for every language right after a catalog edit
+# commits, instead of on the next request.
+HOME_PRECOMPUTE = os.environ.get('HOME_PRECOMPUTE', 'false').lower() == 'true'
+
+# Rebuild the unit map cluster layers right after a unit edit commits,
+# instead of on the next map request.
+UNIT_MAP_PRECOMPUTE = os.environ.get('UNIT_MAP_PRECOMPUTE', 'false').lower() == 'true'
+
 # =============================================================================
 # STRIPE CONFIGURATION
 # =============================================================================
@@ -411,6 +446,11 @@ STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY', '')
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', '')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', '')
 
+# Limited stock is held for an order while its checkout session is open and
+# only decremented when payment succeeds. Holds stop counting against
+# availability once they expire; `release_expired_holds` marks them released.
+STOCK_HOLD_TTL = int(os.environ.get('STOCK_HOLD_TTL', 60 * 30))
+
 # =============================================================================
 # LOGGING CONFIGURATION
 # =============================================================================
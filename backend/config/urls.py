@@ -6,7 +6,7 @@ The `urlpatterns` list routes URLs to views. For more information please see:
 """
 
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.http import JsonResponse
 from drf_spectacular.views import (
     SpectacularAPIView,
@@ -14,6 +14,8 @@ from drf_spectacular.views import (
     SpectacularSwaggerView,
 )
 
+from products.views import sitemap_index, sitemap_shard
+
 
 def health_check(request):
     """Health check endpoint for Docker and load balancers."""
@@ -24,6 +26,14 @@ urlpatterns = [
     # Admin site
     path('admin/', admin.site.urls),
     
+    # Sitemaps (nginx routes these paths at the site root to the backend)
+    path('sitemap.xml', sitemap_index, name='sitemap-index'),
+    re_path(
+        r'^sitemaps/(?P<section>products)-(?P<number>[1-9][0-9]*)\.xml$',
+        sitemap_shard,
+        name='sitemap-shard',
+    ),
+    
     # Health check endpoint
     path('api/health/', health_check, name='health_check'),
     
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("ecosystems", "0001_initial"),
+        ("orders", "0002_keyset_pagination_indexes"),
+        ("products", "0009_keyset_pagination_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="adoptedtree",
+            index=models.Index(
+                fields=["user", "-adoption_date", "-id"],
+                name="ecosystems__user_id_729903_idx",
+            ),
+        ),
+    ]
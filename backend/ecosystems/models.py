@@ -143,6 +143,7 @@ class AdoptedTree(models.Model):
         indexes = [
             models.Index(fields=['tree_number']),
             models.Index(fields=['user', 'status']),
+            models.Index(fields=['user', '-adoption_date', '-id']),
         ]
     
     def __str__(self) -> str:
@@ -70,6 +70,19 @@ class AdoptedTreeRepository:
         )
         return float(result['total'] or 0)
     
+    @staticmethod
+    def get_global_totals() -> dict:
+        """Get the tree count and total CO2 offset across all adopted trees."""
+        from django.db.models import Count, Sum
+        result = AdoptedTree.objects.aggregate(
+            tree_count=Count('id'),
+            total_co2=Sum('co2_offset_kg'),
+        )
+        return {
+            'tree_count': result['tree_count'],
+            'total_co2': float(result['total_co2'] or 0),
+        }
+    
     @staticmethod
     def create_from_order_item(user: User, order_item, **kwargs) -> AdoptedTree:
         """Create an adopted tree from an order item."""
@@ -132,6 +132,22 @@ class EcosystemService:
             'equivalent_car_miles': round(total_co2 * 2.5, 0),  # Rough estimate
         }
     
+    def get_global_forest_stats(self) -> dict:
+        """
+        Get statistics about the whole community forest.
+        
+        Same shape as get_user_forest_stats(), computed with one query.
+        """
+        totals = self.tree_repo.get_global_totals()
+        total_co2 = totals['total_co2']
+        
+        return {
+            'tree_count': totals['tree_count'],
+            'total_co2_offset_kg': total_co2,
+            'total_co2_offset_tons': round(total_co2 / 1000, 2),
+            'equivalent_car_miles': round(total_co2 * 2.5, 0),  # Rough estimate
+        }
+    
     def update_tree_metrics(
         self,
         tree: AdoptedTree,
@@ -92,8 +92,10 @@ class OrderAdmin(admin.ModelAdmin):
     
     @admin.action(description='Mark selected orders as paid')
     def mark_as_paid(self, request, queryset):
-        from django.utils import timezone
-        queryset.update(status=Order.OrderStatus.PAID, paid_at=timezone.now())
+        from .services import order_service
+        # Through the service so stock holds become permanent decrements
+        for order in queryset:
+            order_service.mark_as_paid(order)
     
     @admin.action(description='Mark selected orders as fulfilled')
     def mark_as_fulfilled(self, request, queryset):
@@ -249,6 +249,7 @@ class Order(models.Model):
             models.Index(fields=['order_number']),
             models.Index(fields=['user', 'status']),
             models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['user', '-created_at', '-id']),
         ]
     
     def __str__(self) -> str:
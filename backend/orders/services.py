@@ -4,20 +4,29 @@ Order service for business logic operations.
 This module contains business logic for cart and order operations.
 """
 
+import logging
+from datetime import timedelta
 from typing import Optional
 from decimal import Decimal
 from django.db import transaction
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 from .models import Cart, CartItem, Order, OrderItem
 from .repositories import (
     CartRepository, CartItemRepository,
     OrderRepository, OrderItemRepository
 )
-from products.services import product_service
+from products.models import Product
+from products.services import product_service, unit_service
+
+logger = logging.getLogger(__name__)
 
 User = get_user_model()
 
+# Length of an annual sponsorship
+SPONSORSHIP_PERIOD = timedelta(days=365)
+
 
 class CartService:
     """Service for shopping cart business logic."""
@@ -126,6 +135,18 @@ class CartService:
             'total': cart.total,
         }
     
+    def check_cart_availability(self, cart: Cart, items: Optional[list] = None) -> list[dict]:
+        """
+        Check the availability of every cart line with one product query.
+        
+        Pass already loaded cart items to avoid reading them again.
+        """
+        if items is None:
+            items = list(cart.items.all())
+        return product_service.check_availability_batch(
+            [(item.product_id, item.quantity) for item in items]
+        )
+    
     def merge_anonymous_cart(self, user: User, session_key: str) -> Cart:
         """
         Merge an anonymous cart into a user's cart after login.
@@ -163,7 +184,7 @@ class OrderService:
         1. Validates cart is not empty
         2. Checks all products are available
         3. Creates the order and order items
-        4. Reserves stock for each product
+        4. Holds stock for all products until payment (STOCK_HOLD_TTL)
         5. Clears the cart
         
         Args:
@@ -178,27 +199,53 @@ class OrderService:
         if cart.total_items == 0:
             return {'success': False, 'error': 'Cart is empty'}
         
-        # Check availability for all items
-        for item in cart.items.all():
-            if not product_service.check_availability(item.product.id, item.quantity):
+        # Check availability for all items (one query for the whole cart)
+        items = list(cart.items.select_related('product'))
+        availability = self.cart_service.check_cart_availability(cart, items)
+        for item, line in zip(items, availability):
+            if not line['is_available']:
                 return {
                     'success': False,
                     'error': f'{item.product.title} is not available in requested quantity'
                 }
         
-        # Create the order
+        # Create the order and order items
         order = self.order_repo.create(user, cart, **kwargs)
-        
-        # Create order items and reserve stock
-        for cart_item in cart.items.all():
+        for cart_item in items:
             self.order_item_repo.create_from_cart_item(order, cart_item)
-            product_service.reserve_stock(cart_item.product.id, cart_item.quantity)
+        
+        # Hold stock for the whole cart; it is decremented once paid
+        failed = product_service.hold_stock(order, [(item.product_id, item.quantity) for item in items])
+        if failed:
+            transaction.set_rollback(True)
+            product = next(item.product for item in items if item.product_id in failed)
+            return {
+                'success': False,
+                'error': f'{product.title} is not available in requested quantity'
+            }
         
         # Clear the cart
         cart.clear()
         
         return {'success': True, 'order': order}
     
+    def hold_stock(self, order: Order) -> dict:
+        """
+        Hold stock for an existing order again (e.g. retrying checkout).
+        
+        Returns:
+            Dict with success status and error
+        """
+        items = list(order.items.all())
+        failed = product_service.hold_stock(order, [(item.product_id, item.quantity) for item in items])
+        if failed:
+            item = next(item for item in items if item.product_id in failed)
+            return {
+                'success': False,
+                'error': f'{item.product_title} is not available in requested quantity'
+            }
+        return {'success': True}
+    
     def get_order(self, order_id: str) -> Optional[Order]:
         """Get an order by ID."""
         return self.order_repo.get_by_id(order_id)
@@ -212,8 +259,48 @@ class OrderService:
         return self.order_repo.get_user_orders(user)
     
     def mark_as_paid(self, order: Order) -> Order:
-        """Mark an order as paid."""
-        return self.order_repo.update_status(order, Order.OrderStatus.PAID)
+        """
+        Mark an order as paid, turn its stock holds into decrements and
+        assign sponsorship units to the buyer (first payment only).
+        """
+        was_paid = order.is_paid
+        order = self.order_repo.update_status(order, Order.OrderStatus.PAID)
+        product_service.convert_holds(order)
+        if not was_paid:
+            self.allocate_units(order)
+        return order
+    
+    def allocate_units(self, order: Order) -> dict[int, list[int]]:
+        """
+        Assign available units of the order's unit-based products to the buyer.
+        
+        Each purchased quantity claims one unit, which becomes SPONSORED by
+        the order's user; annual sponsorships expire SPONSORSHIP_PERIOD
+        after payment. Shortfalls are logged for manual follow-up.
+        
+        Returns:
+            Dict of order item id to claimed unit ids
+        """
+        items = list(order.items.select_related('product'))
+        with_units = unit_service.get_product_ids_with_units([item.product_id for item in items])
+        allocated = {}
+        for item in items:
+            if item.product_id not in with_units:
+                continue
+            expires_at = None
+            if item.product.pricing_type == Product.PricingType.ANNUAL:
+                expires_at = timezone.now() + SPONSORSHIP_PERIOD
+            unit_ids = unit_service.allocate_units(
+                item.product_id, item.quantity, sponsor=order.user, expires_at=expires_at,
+                partial=True, order=order
+            )
+            if len(unit_ids) < item.quantity:
+                logger.warning(
+                    'Order %s: only %s of %s units available for product %s',
+                    order.pk, len(unit_ids), item.quantity, item.product_id
+                )
+            allocated[item.id] = unit_ids
+        return allocated
     
     def mark_as_fulfilled(self, order: Order) -> Order:
         """Mark an order as fulfilled."""
@@ -223,14 +310,20 @@ class OrderService:
         """
         Cancel an order.
         
-        Only pending or paid orders can be cancelled.
+        Only pending or paid orders can be cancelled. Held or taken stock
+        and the units the payment sponsored are given back.
         """
         if not order.can_cancel:
             return {'success': False, 'error': 'Order cannot be cancelled'}
         
         self.order_repo.update_status(order, Order.OrderStatus.CANCELLED)
         
-        # TODO: Restore stock for cancelled items
+        # Release held stock and give back stock already taken by payment
+        product_service.release_holds(order)
+        
+        # Give back the units the payment assigned to the buyer
+        unit_service.release_order_units(order)
+        
         # TODO: Process refund if order was paid
         
         return {'success': True, 'order': order}
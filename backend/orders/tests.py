@@ -7,10 +7,12 @@ Tests cover models, services, and API endpoints.
 from decimal import Decimal
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 from .models import Cart, CartItem, Order, OrderItem
 from .services import CartService, OrderService
-from products.models import Category, Product
+from products.models import Category, Product, SponsorshipUnit, StockHold
+from products.services import product_service
 
 User = get_user_model()
 
@@ -192,3 +194,155 @@ class OrderServiceTest(TestCase):
         self.assertTrue(result['success'])
         self.assertIsNotNone(result['order'])
         self.assertEqual(result['order'].total_amount, Decimal('500.00'))
+
+
+class CheckoutAvailabilityTest(TestCase):
+    """Tests for whole-cart availability checks at checkout."""
+
+    def setUp(self):
+        self.cart_service = CartService()
+        self.order_service = OrderService()
+        self.user = User.objects.create_user(
+            username='checkoutuser',
+            email='checkout@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(
+            name='Trees',
+            slug='trees',
+            is_active=True
+        )
+        self.products = [
+            Product.objects.create(
+                title=f'Tree {index}',
+                slug=f'tree-{index}',
+                category=self.category,
+                product_type=Product.ProductType.TREE,
+                price=Decimal('20.00'),
+                stock=5,
+                is_unlimited_stock=False,
+                is_active=True
+            )
+            for index in range(4)
+        ]
+        self.cart = self.cart_service.get_cart(user=self.user)
+        for product in self.products:
+            self.cart_service.add_to_cart(self.cart, product.id, quantity=2)
+
+    def test_cart_check_costs_one_product_query(self):
+        """Test that checking a loaded cart reads products once."""
+        items = list(self.cart.items.all())
+        with self.assertNumQueries(1):
+            results = self.cart_service.check_cart_availability(self.cart, items)
+        self.assertTrue(all(line['is_available'] for line in results))
+
+    def test_checkout_rejects_short_stock(self):
+        """Test that checkout fails when any line exceeds stock."""
+        Product.objects.filter(id=self.products[2].id).update(stock=1)
+        result = self.order_service.create_order_from_cart(self.user, self.cart)
+        self.assertFalse(result['success'])
+        self.assertIn('Tree 2', result['error'])
+
+    def test_checkout_holds_stock_until_paid(self):
+        """Test that checkout holds stock and payment decrements it."""
+        result = self.order_service.create_order_from_cart(self.user, self.cart)
+        self.assertTrue(result['success'])
+        order = result['order']
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 5)
+        self.assertFalse(product_service.check_availability(self.products[0].id, 4))
+
+        self.order_service.mark_as_paid(order)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 3)
+
+        self.order_service.cancel_order(order)
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].stock, 5)
+
+    def test_cancel_after_lapsed_hold_keeps_stock(self):
+        """Test that cancelling an order paid after its hold lapsed gives back only what was taken."""
+        order = self.order_service.create_order_from_cart(self.user, self.cart)['order']
+        StockHold.objects.filter(order=order).update(expires_at=timezone.now())
+        product_service.hold_repo.release_expired()
+        # The lapsed units of the first product were sold meanwhile
+        Product.objects.filter(id=self.products[0].id).update(stock=1)
+
+        self.order_service.mark_as_paid(order)
+        self.products[0].refresh_from_db()
+        self.products[1].refresh_from_db()
+        self.assertEqual((self.products[0].stock, self.products[1].stock), (1, 3))
+
+        self.order_service.cancel_order(order)
+        self.products[0].refresh_from_db()
+        self.products[1].refresh_from_db()
+        self.assertEqual((self.products[0].stock, self.products[1].stock), (1, 5))
+
+    def test_cancelled_checkout_releases_holds(self):
+        """Test that cancelling an unpaid order frees its held stock."""
+        order = self.order_service.create_order_from_cart(self.user, self.cart)['order']
+        self.order_service.cancel_order(order)
+        self.assertTrue(product_service.check_availability(self.products[0].id, 5))
+
+
+class UnitAllocationOnPaymentTest(TestCase):
+    """Tests that paid orders are assigned sponsorship units."""
+
+    def setUp(self):
+        self.order_service = OrderService()
+        self.user = User.objects.create_user(
+            username='unitbuyer',
+            email='unitbuyer@example.com',
+            password='testpass123'
+        )
+        self.category = Category.objects.create(
+            name='Trees',
+            slug='trees',
+            is_active=True
+        )
+        self.product = Product.objects.create(
+            title='Native Oak',
+            slug='native-oak',
+            category=self.category,
+            product_type=Product.ProductType.TREE,
+            price=Decimal('20.00'),
+            is_active=True
+        )
+        for index in range(3):
+            SponsorshipUnit.objects.create(code=f'OAK-{index}', name=f'Oak {index}', product=self.product)
+        self.order = Order.objects.create(
+            user=self.user,
+            subtotal=Decimal('40.00'),
+            total_amount=Decimal('40.00'),
+            customer_email=self.user.email
+        )
+        OrderItem.objects.create(
+            order=self.order,
+            product=self.product,
+            product_title=self.product.title,
+            quantity=2,
+            unit_price=self.product.price
+        )
+
+    def test_payment_sponsors_units_once(self):
+        """Test that payment claims one unit per quantity, even if repeated."""
+        self.order_service.mark_as_paid(self.order)
+        self.order_service.mark_as_paid(self.order)
+        sponsored = SponsorshipUnit.objects.filter(sponsor=self.user)
+        self.assertEqual(sponsored.count(), 2)
+        self.assertTrue(all(unit.status == SponsorshipUnit.Status.SPONSORED for unit in sponsored))
+        self.assertTrue(all(unit.sponsorship_expires_at for unit in sponsored))
+
+    def test_cancel_paid_order_frees_its_units(self):
+        """Test that cancelling a paid order makes its units available again."""
+        self.order_service.mark_as_paid(self.order)
+        other = SponsorshipUnit.objects.filter(status=SponsorshipUnit.Status.AVAILABLE).first()
+        other.status = SponsorshipUnit.Status.SPONSORED
+        other.sponsor = self.user
+        other.save()
+
+        self.assertTrue(self.order_service.cancel_order(self.order)['success'])
+        self.assertEqual(list(SponsorshipUnit.objects.filter(sponsor=self.user)), [other])
+        self.assertEqual(
+            SponsorshipUnit.objects.filter(status=SponsorshipUnit.Status.AVAILABLE).count(), 2
+        )
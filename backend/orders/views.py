@@ -148,6 +148,21 @@ class CartViewSet(viewsets.ViewSet):
         cart_service.clear_cart(cart)
         return Response(CartSerializer(cart).data)
     
+    @extend_schema(
+        summary="Check cart availability",
+        description="Check stock for every item in the cart with a single query.",
+        tags=["Cart"]
+    )
+    @action(detail=False, methods=['get'])
+    def availability(self, request):
+        """Check availability of all cart items."""
+        cart = self.get_cart(request)
+        results = cart_service.check_cart_availability(cart)
+        return Response({
+            'items': results,
+            'all_available': all(line['is_available'] for line in results),
+        })
+    
     @extend_schema(
         summary="Get cart summary",
         description="Get a summary of the cart with totals.",
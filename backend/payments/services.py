@@ -7,13 +7,16 @@ This module handles payment processing with Stripe.
 import stripe
 from typing import Optional
 from decimal import Decimal
+from datetime import timedelta
 from django.conf import settings
 from django.db import transaction
+from django.utils import timezone
 
 from .models import Payment
 from orders.models import Order
 from orders.services import order_service
 from ecosystems.services import ecosystem_service
+from products.services import product_service
 
 # Configure Stripe
 stripe.api_key = settings.STRIPE_SECRET_KEY
@@ -55,11 +58,20 @@ class PaymentService:
                     'quantity': item.quantity,
                 })
             
+            # Close the session when the stock hold lapses (Stripe only
+            # accepts 30 minutes to 24 hours from now)
+            now = timezone.now()
+            expires_at = min(
+                max(product_service.get_hold_expiry(order) or now, now + timedelta(minutes=30, seconds=30)),
+                now + timedelta(hours=23, minutes=59),
+            )
+            
             # Create Stripe Checkout Session
             session = stripe.checkout.Session.create(
                 payment_method_types=['card'],
                 line_items=line_items,
                 mode='payment',
+                expires_at=int(expires_at.timestamp()),
                 success_url=success_url,
                 cancel_url=cancel_url,
                 customer_email=order.customer_email,
@@ -168,6 +180,9 @@ class PaymentService:
         elif event['type'] == 'payment_intent.payment_failed':
             return self._handle_payment_failed(event['data']['object'])
         
+        elif event['type'] == 'checkout.session.expired':
+            return self._handle_checkout_expired(event['data']['object'])
+        
         # Unhandled event type
         return {'success': True, 'message': f"Unhandled event type: {event['type']}"}
     
@@ -193,6 +208,31 @@ class PaymentService:
         except Payment.DoesNotExist:
             return {'success': False, 'error': 'Payment not found'}
     
+    def _handle_checkout_expired(self, session: dict) -> dict:
+        """Handle an abandoned checkout session: release its stock holds."""
+        try:
+            payment = Payment.objects.select_related('order').get(
+                stripe_checkout_session_id=session['id']
+            )
+            
+            if payment.status == Payment.PaymentStatus.PENDING:
+                payment.status = Payment.PaymentStatus.CANCELLED
+                payment.save(update_fields=['status', 'updated_at'])
+            
+            # A retried checkout holds the stock again for a newer session;
+            # only the order's latest pending session may release it
+            superseded = Payment.objects.filter(
+                order=payment.order,
+                status=Payment.PaymentStatus.PENDING,
+            ).exclude(pk=payment.pk).exists()
+            if not payment.order.is_paid and not superseded:
+                product_service.release_holds(payment.order)
+            
+            return {'success': True}
+            
+        except Payment.DoesNotExist:
+            return {'success': False, 'error': 'Payment not found'}
+    
     def _handle_payment_succeeded(self, payment_intent: dict) -> dict:
         """Handle successful payment intent."""
         try:
@@ -16,6 +16,8 @@ from .models import Payment
 from .services import PaymentService
 from .repositories import PaymentRepository
 from orders.models import Order
+from products.models import Category, Product, StockHold
+from products.services import product_service
 
 User = get_user_model()
 
@@ -182,6 +184,32 @@ class PaymentServiceTest(TestCase):
         self.assertTrue(result['success'])
         self.assertEqual(result['payment_intent_id'], 'pi_test456')
 
+    def test_expired_old_session_keeps_retry_holds(self):
+        """Test that an old session expiring does not release a retry's holds."""
+        category = Category.objects.create(name='Trees', slug='trees', is_active=True)
+        oak = Product.objects.create(
+            title='Oak', slug='oak', category=category, product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'), stock=3, is_unlimited_stock=False, is_active=True
+        )
+        for session_id in ['cs_old', 'cs_new']:
+            # Each checkout attempt holds the stock again and opens a session
+            self.assertEqual(product_service.hold_stock(self.order, [(oak.id, 2)]), [])
+            Payment.objects.create(
+                order=self.order, user=self.user, stripe_checkout_session_id=session_id,
+                amount=self.order.total_amount, status=Payment.PaymentStatus.PENDING
+            )
+
+        self.assertTrue(self.service._handle_checkout_expired({'id': 'cs_old'})['success'])
+        hold = StockHold.objects.get(order=self.order)
+        self.assertEqual(hold.status, StockHold.HoldStatus.ACTIVE)
+        self.assertEqual(
+            Payment.objects.get(stripe_checkout_session_id='cs_old').status, Payment.PaymentStatus.CANCELLED
+        )
+
+        self.service._handle_checkout_expired({'id': 'cs_new'})
+        hold.refresh_from_db()
+        self.assertEqual(hold.status, StockHold.HoldStatus.RELEASED)
+
 
 class PaymentAPITest(APITestCase):
     """Tests for Payment API endpoints."""
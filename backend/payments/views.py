@@ -68,6 +68,15 @@ class CreateCheckoutSessionView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # Retrying checkout for an existing order: hold its stock again
+        if order_id:
+            result = order_service.hold_stock(order)
+            if not result['success']:
+                return Response(
+                    {'error': result['error']},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+        
         # Create Stripe Checkout Session
         result = payment_service.create_checkout_session(
             order=order,
@@ -6,9 +6,10 @@ Registers Category and Product models with the Django admin.
 
 from django.contrib import admin
 from django.utils.html import format_html
+from .cache import invalidate_catalog, invalidate_units
 from .models import (
     Category, Product, ProductImage, ProductUpdate,
-    SponsorshipUnit, UnitImage, UnitUpdate
+    SponsorshipUnit, StockHold, UnitImage, UnitUpdate
 )
 
 
@@ -32,7 +33,7 @@ class ProductUpdateInline(admin.TabularInline):
 class CategoryAdmin(admin.ModelAdmin):
     """Admin configuration for Category model."""
     
-    list_display = ['name', 'slug', 'is_active', 'display_order', 'created_at']
+    list_display = ['name', 'slug', 'is_active', 'display_order', 'active_product_count', 'created_at']
     list_filter = ['is_active', 'created_at']
     search_fields = ['name', 'name_en', 'description']
     prepopulated_fields = {'slug': ('name',)}
@@ -228,16 +229,20 @@ class ProductAdmin(admin.ModelAdmin):
     @admin.action(description='Set stock to 0 (Out of Stock)')
     def set_out_of_stock(self, request, queryset):
         queryset.update(stock=0, is_unlimited_stock=False)
+        # Bulk updates skip post_save: drop cached catalog responses and ETags
+        invalidate_catalog()
         self.message_user(request, f'{queryset.count()} products set to out of stock.')
     
     @admin.action(description='Set as Unlimited Stock')
     def set_unlimited_stock(self, request, queryset):
         queryset.update(is_unlimited_stock=True)
+        invalidate_catalog()
         self.message_user(request, f'{queryset.count()} products set to unlimited stock.')
     
     @admin.action(description='Remove Unlimited Stock (use stock count)')
     def remove_unlimited_stock(self, request, queryset):
         queryset.update(is_unlimited_stock=False)
+        invalidate_catalog()
         self.message_user(request, f'{queryset.count()} products now use stock count.')
 
 
@@ -325,7 +330,7 @@ class SponsorshipUnitAdmin(admin.ModelAdmin):
     ]
     search_fields = ['code', 'name', 'description', 'location_name', 'species']
     prepopulated_fields = {'slug': ('code', 'name')}
-    raw_id_fields = ['sponsor']
+    raw_id_fields = ['sponsor', 'sponsor_order']
     readonly_fields = ['created_at', 'updated_at', 'sponsored_at']
     date_hierarchy = 'created_at'
     
@@ -367,7 +372,7 @@ class SponsorshipUnitAdmin(admin.ModelAdmin):
             'description': 'Métricas de impacto ambiental.'
         }),
         ('Apadrinamiento', {
-            'fields': ('sponsor', 'sponsored_at', 'sponsorship_expires_at'),
+            'fields': ('sponsor', 'sponsor_order', 'sponsored_at', 'sponsorship_expires_at'),
             'classes': ('collapse',),
             'description': 'Información del padrino actual.'
         }),
@@ -392,11 +397,14 @@ class SponsorshipUnitAdmin(admin.ModelAdmin):
     
     def mark_as_available(self, request, queryset):
         queryset.update(status='available', sponsor=None)
+        # Bulk updates skip post_save: refresh the unit caches (map, sitemaps)
+        invalidate_units()
         self.message_user(request, f'{queryset.count()} unidades marcadas como disponibles.')
     mark_as_available.short_description = 'Marcar como disponible'
     
     def mark_as_inactive(self, request, queryset):
         queryset.update(status='inactive')
+        invalidate_units()
         self.message_user(request, f'{queryset.count()} unidades marcadas como inactivas.')
     mark_as_inactive.short_description = 'Marcar como inactivo'
 
@@ -453,3 +461,15 @@ class UnitUpdateAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
+
+
+@admin.register(StockHold)
+class StockHoldAdmin(admin.ModelAdmin):
+    """Admin configuration for StockHold model (read-only: holds follow checkouts)."""
+    
+    list_display = ['product', 'order', 'quantity', 'status', 'expires_at', 'created_at']
+    list_filter = ['status', 'expires_at']
+    search_fields = ['product__title', 'order__order_number']
+    raw_id_fields = ['product', 'order']
+    readonly_fields = ['product', 'order', 'quantity', 'status', 'expires_at', 'created_at']
+    ordering = ['-created_at']
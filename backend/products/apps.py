@@ -13,3 +13,7 @@ class ProductsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'products'
     verbose_name = 'Product Catalog'
+    
+    def ready(self) -> None:
+        """Import signals when app is ready."""
+        from . import signals  # noqa: F401
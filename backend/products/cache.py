@@ -0,0 +1,296 @@
+"""
+Versioned response cache for the product catalog.
+
+Catalog responses are cached under a key that embeds a global catalog
+version. Any change to a product, category, image or update bumps the
+version (see signals.py), so stale entries are never read again and simply
+expire. Hit/miss counters are kept per process and added to shared
+counters in the cache backend at most every CACHE_STATS_FLUSH_INTERVAL
+seconds, so the hit ratio covers all worker processes without a cache
+write on every request. Sponsorship units have a
+version of their own, so frequent unit status changes don't flush the
+product catalog.
+
+This module also provides HTTP conditional GET (ETag / Last-Modified)
+for catalog endpoints.
+"""
+
+import hashlib
+import threading
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Max, QuerySet
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .serializers import get_request_language
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_HITS_KEY = 'catalog:stats:hits'
+CATALOG_MISSES_KEY = 'catalog:stats:misses'
+# Bumped when sponsorship units change; unit edits don't touch the catalog version
+UNITS_VERSION_KEY = 'units:version'
+# Bumped when the in-memory suggestion indexes of other processes are stale
+SUGGEST_VERSION_KEY = 'suggest:version'
+# Seconds between additions of a process's hit/miss counts to the shared counters
+CACHE_STATS_FLUSH_INTERVAL = 10
+
+
+def _get_version(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        # Seed with a timestamp so an evicted version never falls back
+        # to a number that older cache entries were stored under.
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key: str) -> int:
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def get_catalog_version() -> int:
+    """Get the current catalog version, initializing it if missing."""
+    return _get_version(CATALOG_VERSION_KEY)
+
+
+def bump_catalog_version() -> int:
+    """Invalidate every cached catalog response by bumping the version."""
+    return _bump_version(CATALOG_VERSION_KEY)
+
+
+def invalidate_catalog() -> None:
+    """
+    Bump the catalog version now and again after the transaction commits.
+
+    The second bump discards anything a concurrent reader cached from the
+    pre-commit rows while the transaction was still open.
+    """
+    bump_catalog_version()
+    transaction.on_commit(bump_catalog_version)
+
+
+def get_units_version() -> int:
+    """Get the current sponsorship unit version, initializing it if missing."""
+    return _get_version(UNITS_VERSION_KEY)
+
+
+def bump_units_version() -> int:
+    """Invalidate cached unit data by bumping the units version."""
+    return _bump_version(UNITS_VERSION_KEY)
+
+
+def invalidate_units() -> None:
+    """Bump the units version now and again after the transaction commits."""
+    bump_units_version()
+    transaction.on_commit(bump_units_version)
+
+
+def get_suggest_version() -> int:
+    """Get the current suggestion index version, initializing it if missing."""
+    return _get_version(SUGGEST_VERSION_KEY)
+
+
+def bump_suggest_version() -> int:
+    """Mark every process's suggestion index stale by bumping the version."""
+    return _bump_version(SUGGEST_VERSION_KEY)
+
+
+def build_home_cache_key(language: str) -> str:
+    """Build the cache key of the homepage bundle for a language."""
+    return f"home:v{get_catalog_version()}:{language}"
+
+
+def build_catalog_cache_key(request, scope: str) -> str:
+    """
+    Build the cache key for a catalog request.
+
+    The key covers the host (pagination links are absolute), path, query
+    params (filters, ordering, page), language and catalog version.
+    """
+    query = sorted(request.query_params.lists())
+    raw = f"{request.get_host()}|{request.path}|{query}"
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    language = get_request_language(request)
+    return f"catalog:v{get_catalog_version()}:{scope}:{language}:{digest}"
+
+
+class _PendingStats:
+    """Hit/miss counts of this process not yet added to the shared counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys((CATALOG_HITS_KEY, CATALOG_MISSES_KEY), 0)
+        self._flushed_at = time.monotonic()
+
+    def count(self, key: str) -> None:
+        """Count one hit or miss, flushing once the interval has passed."""
+        with self._lock:
+            self._counts[key] += 1
+            if time.monotonic() - self._flushed_at < CACHE_STATS_FLUSH_INTERVAL:
+                return
+        self.flush()
+
+    def take(self) -> dict[str, int]:
+        """Return and clear the pending counts."""
+        with self._lock:
+            counts, self._counts = self._counts, dict.fromkeys(self._counts, 0)
+            self._flushed_at = time.monotonic()
+        return counts
+
+    def flush(self) -> None:
+        """Add the pending counts to the shared counters."""
+        for key, count in self.take().items():
+            if not count:
+                continue
+            cache.add(key, 0, timeout=None)
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                pass
+
+
+_pending_stats = _PendingStats()
+
+
+def _increment(key: str) -> None:
+    _pending_stats.count(key)
+
+
+def get_cache_stats() -> dict:
+    """
+    Get catalog cache hit/miss counters and the current version.
+
+    This process's counts are flushed first; other processes' counts of
+    the last CACHE_STATS_FLUSH_INTERVAL seconds are not included yet.
+    """
+    _pending_stats.flush()
+    counters = cache.get_many([CATALOG_HITS_KEY, CATALOG_MISSES_KEY])
+    hits = counters.get(CATALOG_HITS_KEY, 0)
+    misses = counters.get(CATALOG_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'version': get_catalog_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0.0,
+    }
+
+
+def reset_cache_stats() -> None:
+    """Reset the hit/miss counters."""
+    _pending_stats.take()
+    cache.delete_many([CATALOG_HITS_KEY, CATALOG_MISSES_KEY])
+
+
+class CatalogCacheMixin:
+    """
+    ViewSet mixin that serves list and retrieve from the catalog cache.
+
+    Only successful responses are stored. The X-Cache header reports
+    whether a response was a HIT or a MISS.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, 'list', super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, 'detail', super().retrieve, *args, **kwargs)
+
+    def cached_response(self, request, scope, build, *args, **kwargs):
+        """Return the cached payload for this request or build and store it."""
+        key = build_catalog_cache_key(request, f"{self.basename}:{scope}")
+        data = cache.get(key)
+        if data is not None:
+            _increment(CATALOG_HITS_KEY)
+            response = Response(data)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _increment(CATALOG_MISSES_KEY)
+        response = build(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, response.data, timeout=settings.CATALOG_CACHE_TIMEOUT)
+        response['X-Cache'] = 'MISS'
+        return response
+
+
+def get_catalog_validators(request, queryset: QuerySet) -> tuple[str, int | None]:
+    """
+    Compute a strong ETag and Last-Modified timestamp for a catalog response.
+
+    Uses one aggregate query (MAX(updated_at) and COUNT) over the queryset
+    the response is built from, combined with the catalog version, the
+    request path/query and the response language.
+    """
+    stats = queryset.values('id', 'updated_at').aggregate(
+        last_modified=Max('updated_at'), total=Count('id')
+    )
+    last_modified = stats['last_modified']
+    query = sorted(request.query_params.lists())
+    raw = (
+        f"{get_catalog_version()}|{last_modified}|{stats['total']}|"
+        f"{request.path}|{query}|{get_request_language(request)}"
+    )
+    etag = f'"{hashlib.md5(raw.encode("utf-8")).hexdigest()}"'
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    return etag, timestamp
+
+
+class ConditionalGetMixin:
+    """
+    ViewSet mixin answering If-None-Match / If-Modified-Since with 304.
+
+    Validators are computed before anything is serialized and memoized
+    under the catalog version, so a repeated 304 costs no query at all.
+    Actions other than list and retrieve call conditional_response() with
+    the queryset they serialize.
+    """
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            request, queryset, partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional_response(
+            request, queryset, partial(super().retrieve, request, *args, **kwargs)
+        )
+
+    def get_validators(self, request, queryset: QuerySet) -> tuple[str, int | None]:
+        """Get the (memoized) ETag and Last-Modified for this request."""
+        key = build_catalog_cache_key(request, f"{self.basename}:{self.action}:validators")
+        validators = cache.get(key)
+        if validators is None:
+            validators = get_catalog_validators(request, queryset)
+            cache.set(key, validators, timeout=settings.CATALOG_CACHE_TIMEOUT)
+        return validators
+
+    def conditional_response(self, request, queryset: QuerySet, build):
+        """Return 304 when the client copy is current, else the built response."""
+        etag, last_modified = self.get_validators(request, queryset)
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = build()
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            patch_vary_headers(response, ['Accept-Language'])
+        return response
@@ -0,0 +1,131 @@
+"""
+Server-side clustering for the sponsorship unit map.
+
+Below UNIT_MAP_POINTS_ZOOM, units are grouped into geohash cells whose
+precision follows the map zoom, and each cell is sent as one cluster with
+its unit count, a per-status breakdown and the centroid of its units.
+From UNIT_MAP_POINTS_ZOOM on, the units inside the viewport are sent as
+individual markers. Only the approximate coordinates are ever used.
+
+Every cluster layer is built from a single GROUP BY at the finest
+precision, rolled up in Python, and cached per precision under the
+catalog and units versions, so a status change (or any unit edit) makes
+the next request rebuild the layers.
+"""
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import get_catalog_version, get_units_version
+from .geo import BBox, split_bbox
+from .models import SponsorshipUnit
+from .repositories import SponsorshipUnitRepository
+
+# (zoom upper bound exclusive, geohash precision) for clustered zooms
+ZOOM_PRECISIONS = ((3, 1), (5, 2), (8, 3), (10, 4), (12, 5), (14, 6))
+# From this zoom on, individual units are returned instead of clusters
+UNIT_MAP_POINTS_ZOOM = ZOOM_PRECISIONS[-1][0]
+CLUSTER_PRECISIONS = tuple(precision for _, precision in ZOOM_PRECISIONS)
+# Upper bound on individual markers in one response
+MAX_MAP_POINTS = 500
+
+
+def precision_for_zoom(zoom: int) -> int | None:
+    """Geohash precision of the clusters at a zoom; None when units are shown."""
+    for max_zoom, precision in ZOOM_PRECISIONS:
+        if zoom < max_zoom:
+            return precision
+    return None
+
+
+def layer_cache_key(precision: int) -> str:
+    return f'units:map:v{get_catalog_version()}.{get_units_version()}:p{precision}'
+
+
+def build_cluster_layers() -> dict[int, list[dict]]:
+    """Build the clusters of every precision from one grouped query."""
+    statuses = SponsorshipUnit.Status.values
+    cells = list(SponsorshipUnitRepository.get_map_cells(max(CLUSTER_PRECISIONS)))
+    layers = {}
+    for precision in CLUSTER_PRECISIONS:
+        merged = {}
+        for row in cells:
+            cluster = merged.setdefault(row['cell'][:precision], {
+                'count': 0, 'lat_sum': 0.0, 'lng_sum': 0.0,
+                'statuses': dict.fromkeys(statuses, 0),
+            })
+            cluster['count'] += row['count']
+            cluster['lat_sum'] += row['lat_sum']
+            cluster['lng_sum'] += row['lng_sum']
+            for value in statuses:
+                cluster['statuses'][value] += row[f'status_{value}']
+        layers[precision] = [
+            {
+                'geohash': cell,
+                'lat': round(cluster['lat_sum'] / cluster['count'], 6),
+                'lng': round(cluster['lng_sum'] / cluster['count'], 6),
+                'count': cluster['count'],
+                'statuses': cluster['statuses'],
+            }
+            for cell, cluster in sorted(merged.items())
+        ]
+    return layers
+
+
+def warm_cluster_layers() -> dict[int, list[dict]]:
+    """Build and cache every cluster layer."""
+    layers = build_cluster_layers()
+    cache.set_many(
+        {layer_cache_key(precision): clusters for precision, clusters in layers.items()},
+        timeout=settings.CATALOG_CACHE_TIMEOUT,
+    )
+    return layers
+
+
+def get_cluster_layer(precision: int) -> list[dict]:
+    """Get the cached clusters of a precision, building all layers on a miss."""
+    clusters = cache.get(layer_cache_key(precision))
+    if clusters is None:
+        clusters = warm_cluster_layers()[precision]
+    return clusters
+
+
+def _inside(bbox: BBox, lat: float, lng: float) -> bool:
+    return any(
+        min_lat <= lat <= max_lat and min_lng <= lng <= max_lng
+        for min_lat, min_lng, max_lat, max_lng in split_bbox(bbox)
+    )
+
+
+def get_unit_map(bbox: BBox, zoom: int) -> dict:
+    """
+    Get the map payload of a viewport.
+
+    Clusters are those whose centroid lies inside the box. Individual
+    units are capped at MAX_MAP_POINTS; ``truncated`` reports the cap.
+    """
+    precision = precision_for_zoom(zoom)
+    if precision is not None:
+        clusters = [
+            cluster for cluster in get_cluster_layer(precision)
+            if _inside(bbox, cluster['lat'], cluster['lng'])
+        ]
+        return {'zoom': zoom, 'precision': precision, 'clusters': clusters, 'units': [], 'truncated': False}
+
+    rows = list(SponsorshipUnitRepository.get_map_points(bbox)[:MAX_MAP_POINTS + 1])
+    units = [
+        {
+            'id': row['id'],
+            'code': row['code'],
+            'name': row['name'],
+            'slug': row['slug'],
+            'status': row['status'],
+            'lat': float(row['location_lat_approx']),
+            'lng': float(row['location_lng_approx']),
+        }
+        for row in rows[:MAX_MAP_POINTS]
+    ]
+    return {
+        'zoom': zoom, 'precision': None, 'clusters': [], 'units': units,
+        'truncated': len(rows) > MAX_MAP_POINTS,
+    }
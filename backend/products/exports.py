@@ -0,0 +1,152 @@
+"""
+Streaming exports of the catalog.
+
+Every active product and every active unit of an active product is
+written as NDJSON (one JSON object per line) or CSV. Rows are read with
+values() through a server-side cursor (``iterator(chunk_size=...)``) and
+encoded as they arrive, so memory stays flat regardless of catalog size
+and the export is a single pass.
+
+Exports carry flat, public columns only: unit coordinates are the
+approximate ones shown to non-sponsors, and sponsors are never included.
+"""
+
+import csv
+from collections.abc import Iterable, Iterator
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F
+
+from .repositories import ProductRepository, SponsorshipUnitRepository
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+# Resource -> (queryset factory, {output column: model lookup})
+EXPORT_RESOURCES = {
+    'products': (ProductRepository.get_for_export, {
+        'id': 'id',
+        'slug': 'slug',
+        'title': 'title',
+        'title_en': 'title_en',
+        'short_description': 'short_description',
+        'short_description_en': 'short_description_en',
+        'product_type': 'product_type',
+        'category_slug': 'category__slug',
+        'price': 'price',
+        'compare_at_price': 'compare_at_price',
+        'currency': 'currency',
+        'pricing_type': 'pricing_type',
+        'stock': 'stock',
+        'is_unlimited_stock': 'is_unlimited_stock',
+        'rating': 'rating',
+        'reviews_count': 'reviews_count',
+        'is_featured': 'is_featured',
+        'is_new': 'is_new',
+        'species': 'species',
+        'location_name': 'location_name',
+        'location_lat': 'location_lat',
+        'location_lng': 'location_lng',
+        'co2_offset_kg': 'co2_offset_kg',
+        'area_size': 'area_size',
+        'duration': 'duration',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }),
+    'units': (SponsorshipUnitRepository.get_for_export, {
+        'id': 'id',
+        'code': 'code',
+        'name': 'name',
+        'slug': 'slug',
+        'product_slug': 'product__slug',
+        'status': 'status',
+        'species': 'species',
+        'age_years': 'age_years',
+        'height_cm': 'height_cm',
+        'area_m2': 'area_m2',
+        'co2_per_year': 'co2_per_year',
+        'co2_absorbed_total': 'co2_absorbed_total',
+        'location_name': 'location_name',
+        'location_lat_approx': 'location_lat_approx',
+        'location_lng_approx': 'location_lng_approx',
+        'location_radius_km': 'location_radius_km',
+        'is_featured': 'is_featured',
+        'created_at': 'created_at',
+        'updated_at': 'updated_at',
+    }),
+}
+
+# Lines joined into each chunk handed to the response / file
+LINES_PER_WRITE = 500
+
+
+def get_export_columns(resource: str) -> list[str]:
+    """Output column names of a resource, in export order."""
+    return list(EXPORT_RESOURCES[resource][1])
+
+
+def export_rows(resource: str, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[dict]:
+    """Stream the export rows of a resource as dicts."""
+    get_queryset, columns = EXPORT_RESOURCES[resource]
+    plain = [name for name, lookup in columns.items() if name == lookup]
+    aliases = {name: F(lookup) for name, lookup in columns.items() if name != lookup}
+    return get_queryset().values(*plain, **aliases).iterator(chunk_size=chunk_size)
+
+
+def _ndjson_lines(rows: Iterable[dict], columns: list[str]) -> Iterator[str]:
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode({name: row[name] for name in columns}) + '\n'
+
+
+class _LineBuffer:
+    """File-like object handing back what csv.writer writes."""
+
+    def write(self, value: str) -> str:
+        return value
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def _csv_lines(rows: Iterable[dict], columns: list[str]) -> Iterator[str]:
+    writer = csv.writer(_LineBuffer())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_value(row[name]) for name in columns])
+
+
+def _batched(lines: Iterable[str], size: int = LINES_PER_WRITE) -> Iterator[str]:
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def stream_export(resource: str, export_format: str,
+                  chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Stream a resource export as text chunks.
+
+    ``resource`` is a key of EXPORT_RESOURCES and ``export_format`` a key
+    of EXPORT_CONTENT_TYPES.
+    """
+    columns = get_export_columns(resource)
+    rows = export_rows(resource, chunk_size)
+    lines = _ndjson_lines(rows, columns) if export_format == 'ndjson' else _csv_lines(rows, columns)
+    return _batched(lines)
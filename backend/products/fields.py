@@ -0,0 +1,126 @@
+"""
+Serializer fields for bounded nested collections.
+
+Detail payloads embed only the first ``limit`` items of a related
+collection (gallery, updates) plus a cursor link to fetch the rest from a
+keyset-paginated endpoint. ``limit + 1`` rows are read so the link can be
+built without a COUNT; when the relation is prefetched with
+bounded_prefetch() this costs no extra query. ``filters`` restrict a
+collection (e.g. public updates only) and must match the prefetch.
+"""
+
+from django.db.models import Prefetch
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.utils.urls import replace_query_param
+
+from config.pagination import KeysetPagination, SinceKeysetPagination
+
+
+def bounded_attr(relation: str) -> str:
+    """Attribute holding the items loaded by bounded_prefetch()."""
+    return f'{relation}_bounded'
+
+
+def bounded_prefetch(model, relation: str, limit: int, **filters) -> Prefetch:
+    """Prefetch the first ``limit + 1`` items (matching ``filters``) of a relation in keyset order."""
+    related_model = model._meta.get_field(relation).related_model
+    queryset = KeysetPagination().order_queryset(related_model.objects.filter(**filters))
+    # Sliced prefetches must use to_attr
+    return Prefetch(relation, queryset=queryset[:limit + 1], to_attr=bounded_attr(relation))
+
+
+def get_bounded_items(instance, relation: str, limit: int, filters: dict | None = None) -> tuple[list, bool]:
+    """
+    Get up to ``limit`` related items and whether more exist.
+
+    Uses the items loaded by bounded_prefetch() when present, otherwise
+    runs one query. Results are memoized on the instance so the collection
+    field and its ``_next`` link share a single read.
+    """
+    memo = instance.__dict__.setdefault('_bounded_items', {})
+    if relation not in memo:
+        items = getattr(instance, bounded_attr(relation), None)
+        if items is None:
+            queryset = KeysetPagination().order_queryset(getattr(instance, relation).filter(**(filters or {})))
+            items = list(queryset[:limit + 1])
+        memo[relation] = (items[:limit], len(items) > limit)
+    return memo[relation]
+
+
+class BoundedNestedField(serializers.Field):
+    """Read-only nested collection capped at ``limit`` items."""
+
+    def __init__(self, serializer_class, limit: int, filters: dict | None = None, **kwargs):
+        self.serializer_class = serializer_class
+        self.limit = limit
+        self.filters = filters
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        items, _ = get_bounded_items(instance, self.source, self.limit, self.filters)
+        return items
+
+    def to_representation(self, items):
+        return self.serializer_class(items, many=True, context=self.context).data
+
+
+class BoundedNextLinkField(serializers.Field):
+    """
+    Cursor link to the items a BoundedNestedField left out, or None.
+
+    ``url_name`` is a detail route (looked up by ``lookup_field``) serving
+    the relation with KeysetPagination.
+    """
+
+    def __init__(self, relation: str, limit: int, url_name: str, lookup_field: str = 'slug',
+                 filters: dict | None = None, **kwargs):
+        self.relation = relation
+        self.limit = limit
+        self.url_name = url_name
+        self.lookup_field = lookup_field
+        self.filters = filters
+        kwargs['source'] = relation
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance
+
+    def to_representation(self, instance):
+        items, has_more = get_bounded_items(instance, self.relation, self.limit, self.filters)
+        if not has_more:
+            return None
+        cursor = KeysetPagination().cursor_for(getattr(instance, self.relation).all(), items[-1])
+        url = reverse(self.url_name, kwargs={self.lookup_field: getattr(instance, self.lookup_field)})
+        request = self.context.get('request')
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        return replace_query_param(url, KeysetPagination.cursor_query_param, cursor)
+
+
+class BoundedSinceCursorField(serializers.Field):
+    """
+    ``?since=`` cursor of the first embedded item of a newest-first relation.
+
+    Polling the relation's SinceKeysetPagination endpoint with it returns
+    only the items posted after the payload was built. None when empty.
+    """
+
+    def __init__(self, relation: str, limit: int, filters: dict | None = None, **kwargs):
+        self.relation = relation
+        self.limit = limit
+        self.filters = filters
+        kwargs['source'] = relation
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance
+
+    def to_representation(self, instance):
+        items, _ = get_bounded_items(instance, self.relation, self.limit, self.filters)
+        if not items:
+            return None
+        return SinceKeysetPagination().cursor_for(getattr(instance, self.relation).all(), items[0])
@@ -0,0 +1,153 @@
+"""
+Sparse fieldsets for catalog serializers.
+
+Clients pick the top-level fields of a response with ``?fields=a,b`` or
+drop some with ``?omit=a,b``. SparseFieldsetMixin prunes the serialized
+JSON, and optimize_queryset() prunes the SQL to match: unused columns are
+deferred with only(), and unused select_related/prefetch_related lookups
+are dropped.
+
+Serializers declare the model attributes read by computed fields (model
+properties, SerializerMethodFields) in ``field_sources``; plain fields are
+resolved from their ``source``.
+"""
+
+from functools import lru_cache
+
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def parse_field_list(value: str | None) -> list[str]:
+    """Split a comma separated field list, ignoring blanks."""
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def select_fields(request, available: list[str]) -> list[str] | None:
+    """
+    Get the field names requested with ?fields= / ?omit=, in serializer order.
+
+    Returns None when neither param is present. Unknown names raise a
+    ValidationError (HTTP 400).
+    """
+    if request is None:
+        return None
+    params = getattr(request, 'query_params', request.GET)
+    fields = parse_field_list(params.get(FIELDS_PARAM))
+    omit = parse_field_list(params.get(OMIT_PARAM))
+    if not fields and not omit:
+        return None
+
+    unknown = sorted(set(fields + omit) - set(available))
+    if unknown:
+        raise ValidationError({
+            FIELDS_PARAM if set(unknown) & set(fields) else OMIT_PARAM:
+                [f"Unknown field(s): {', '.join(unknown)}"]
+        })
+    return [
+        name for name in available
+        if (not fields or name in fields) and name not in omit
+    ]
+
+
+@lru_cache(maxsize=None)
+def get_field_attributes(serializer_class) -> dict[str, frozenset[str]]:
+    """Map each serializer field to the model attributes it reads."""
+    declared = getattr(serializer_class, 'field_sources', {})
+    translated = set(getattr(serializer_class, 'translated_fields', [])) | set(
+        getattr(serializer_class, 'translated_json_fields', [])
+    )
+    attributes = {}
+    for name, field in serializer_class().fields.items():
+        if name in declared:
+            attributes[name] = frozenset(declared[name])
+            continue
+        if field.source == '*':
+            attributes[name] = frozenset()
+            continue
+        root = field.source.split('.')[0]
+        attributes[name] = frozenset({root, f'{root}_en'} if name in translated else {root})
+    return attributes
+
+
+def _select_related_lookups(select_related, prefix: str = '') -> list[str]:
+    """Flatten Query.select_related into lookup strings."""
+    if not isinstance(select_related, dict):
+        return []
+    lookups = []
+    for name, nested in select_related.items():
+        lookups.append(f'{prefix}{name}')
+        lookups.extend(_select_related_lookups(nested, f'{prefix}{name}__'))
+    return lookups
+
+
+def _lookup_root(lookup) -> str:
+    path = lookup if isinstance(lookup, str) else lookup.prefetch_through
+    return path.split('__')[0]
+
+
+def optimize_queryset(queryset, serializer_class, request, keep: tuple[str, ...] = ()):
+    """
+    Prune a queryset to the fields a sparse fieldset request will render.
+
+    ``keep`` names model attributes the caller reads itself. Returns the
+    queryset unchanged when no fieldset was requested.
+    """
+    attributes = get_field_attributes(serializer_class)
+    selected = select_fields(request, list(attributes))
+    if selected is None:
+        return queryset
+
+    required = set(keep).union(*(attributes[name] for name in selected))
+    model = queryset.model
+    ordering = list(queryset.query.order_by) or list(model._meta.ordering)
+    required.update(item.lstrip('-').split('__')[0] for item in ordering if isinstance(item, str))
+
+    if isinstance(queryset.query.select_related, dict):
+        related = [
+            lookup for lookup in _select_related_lookups(queryset.query.select_related)
+            if _lookup_root(lookup) in required
+        ]
+        queryset = queryset.select_related(None)
+        if related:
+            queryset = queryset.select_related(*related)
+    prefetches = [
+        lookup for lookup in queryset._prefetch_related_lookups
+        if _lookup_root(lookup) in required
+    ]
+    columns = [
+        field.name for field in model._meta.concrete_fields
+        if field.primary_key or field.name in required
+    ]
+    return queryset.prefetch_related(None).prefetch_related(*prefetches).only(*columns)
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin applying ?fields= / ?omit= to the top-level fields.
+
+    Nested serializers always render in full.
+    """
+
+    # Model attributes read by fields that are not plain model fields
+    field_sources: dict[str, tuple[str, ...]] = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_top_level():
+            return fields
+        selected = select_fields(self.context.get('request'), list(fields))
+        if selected is None:
+            return fields
+        return {name: fields[name] for name in selected}
+
+    def _is_top_level(self) -> bool:
+        parent = self.parent
+        if parent is None:
+            return True
+        return isinstance(parent, serializers.ListSerializer) and parent.parent is None
@@ -0,0 +1,136 @@
+"""
+Filter backends for catalog endpoints.
+
+These replace DRF's SearchFilter/OrderingFilter on the product endpoints so
+that search goes through the indexed full-text backend and results are
+ordered by relevance (or distance, with ?near=) unless the client asks for
+another ordering. Price and rating ranges are validated with
+ProductSearchSerializer and applied through the product service; unit
+filters likewise go through SponsorshipUnitSearchSerializer.
+"""
+
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter, SearchFilter
+
+from .geo import annotate_distance, filter_radius
+from .search import get_search_backend
+from .serializers import ProductSearchSerializer, SponsorshipUnitSearchSerializer
+from .services import product_service, unit_service
+
+
+class CatalogSearchFilter(SearchFilter):
+    """Full-text search using the configured search backend."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return get_search_backend().search(queryset, ' '.join(terms))
+
+
+class CatalogOrderingFilter(OrderingFilter):
+    """Ordering filter that defaults to relevance for search results."""
+
+    def get_ordering(self, request, queryset, view):
+        explicit = request.query_params.get(self.ordering_param)
+        if not explicit and 'distance_km' in queryset.query.annotations:
+            return ['distance_km', *(self.get_default_ordering(view) or [])]
+        if not explicit and 'search_rank' in queryset.query.annotations:
+            return ['-search_rank', *(self.get_default_ordering(view) or [])]
+        return super().get_ordering(request, queryset, view)
+
+
+class ProximityFilter(BaseFilterBackend):
+    """
+    Distance annotation and radius filter.
+
+    ``?near=lat,lng`` keeps rows with coordinates and annotates
+    ``distance_km``; ``&radius_km=`` limits them to that radius. The view
+    names its coordinate fields in ``geo_fields``.
+    """
+
+    near_param = 'near'
+    radius_param = 'radius_km'
+    max_radius_km = 20000.0
+
+    def parse_near(self, value: str) -> tuple[float, float]:
+        try:
+            lat, lng = (float(part) for part in value.split(','))
+        except ValueError:
+            raise ValidationError({self.near_param: ['Expected "lat,lng".']})
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValidationError({self.near_param: ['Coordinates out of range.']})
+        return lat, lng
+
+    def parse_radius(self, value: str | None) -> float | None:
+        if value in (None, ''):
+            return None
+        try:
+            radius = float(value)
+        except ValueError:
+            raise ValidationError({self.radius_param: ['Expected a number.']})
+        if not 0 < radius <= self.max_radius_km:
+            raise ValidationError({self.radius_param: [f'Must be between 0 and {self.max_radius_km:g}.']})
+        return radius
+
+    def filter_queryset(self, request, queryset, view):
+        near = request.query_params.get(self.near_param)
+        if not near:
+            return queryset
+        lat, lng = self.parse_near(near)
+        radius = self.parse_radius(request.query_params.get(self.radius_param))
+        lat_field, lng_field = view.geo_fields
+        if radius is not None:
+            return filter_radius(queryset, lat, lng, radius, lat_field, lng_field)
+        queryset = queryset.exclude(geohash='')
+        return annotate_distance(queryset, lat, lng, lat_field, lng_field)
+
+
+class RangeFilter(BaseFilterBackend):
+    """
+    Price and rating range filter.
+
+    ``?min_price=&max_price=&min_rating=&max_rating=`` (bounds inclusive).
+    Range queries are served by the partial (product_type, price) and
+    (rating) indexes on active products.
+    """
+
+    range_params = ('min_price', 'max_price', 'min_rating', 'max_rating')
+
+    def filter_queryset(self, request, queryset, view):
+        data = {
+            name: request.query_params[name]
+            for name in self.range_params
+            if request.query_params.get(name, '') != ''
+        }
+        if not data:
+            return queryset
+        params = ProductSearchSerializer(data=data)
+        params.is_valid(raise_exception=True)
+        bounds = {name: params.validated_data.get(name) for name in self.range_params}
+        return product_service.filter_by_ranges(queryset, **bounds)
+
+
+class UnitSearchFilter(BaseFilterBackend):
+    """
+    Sponsorship unit filters.
+
+    ``?q=&product_type=&status=&min_price=&max_price=&location=&min_rating=
+    &max_rating=&is_featured=&ordering=`` are validated with
+    SponsorshipUnitSearchSerializer; prices and ratings are the product's.
+    Without ?ordering= results keep the view ordering, or are sorted by
+    distance with ?near=.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        params = SponsorshipUnitSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        # Only apply what was sent (query-string booleans default to False)
+        filters = {
+            name: value for name, value in params.validated_data.items()
+            if request.query_params.get(name, '') != ''
+        }
+        queryset = unit_service.search_units(queryset, **filters)
+        if 'ordering' not in filters and 'distance_km' in queryset.query.annotations:
+            queryset = queryset.order_by('distance_km', 'id')
+        return queryset
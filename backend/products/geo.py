@@ -0,0 +1,193 @@
+"""
+Spatial lookups without PostGIS.
+
+Locations are indexed with a geohash column computed on save. A bounding
+box is covered by a small set of geohash prefixes, so viewport and
+proximity queries become indexed ``LIKE 'prefix%'`` range scans on both
+PostgreSQL and SQLite, refined with exact coordinate and haversine
+distance filters.
+"""
+
+import math
+
+from django.db.models import F, FloatField, Q, QuerySet, Value
+from django.db.models.functions import ASin, Cast, Cos, Power, Radians, Sin, Sqrt
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+# Stored precision: 9 characters ~ 5m x 5m cells
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+# Upper bound on prefixes used to cover a bounding box
+MAX_COVERING_CELLS = 32
+
+BBox = tuple[float, float, float, float]
+
+
+def encode_geohash(lat: float, lng: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Encode a coordinate as a geohash string."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        target, value = (lng_range, lng) if even else (lat_range, lat)
+        middle = (target[0] + target[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return ''.join(chars)
+
+
+def geohash_for(lat, lng) -> str:
+    """Geohash of a (possibly missing) coordinate; empty when unknown."""
+    if lat is None or lng is None:
+        return ''
+    return encode_geohash(float(lat), float(lng))
+
+
+def cell_size(precision: int) -> tuple[float, float]:
+    """(height, width) in degrees of a geohash cell at this precision."""
+    total_bits = 5 * precision
+    lng_bits = (total_bits + 1) // 2
+    lat_bits = total_bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lng_bits)
+
+
+def _cell_indexes(low: float, high: float, size: float, offset: float) -> range:
+    return range(int((low + offset) // size), int((high + offset) // size) + 1)
+
+
+def covering_cells(bbox: BBox, max_cells: int = MAX_COVERING_CELLS) -> list[str]:
+    """
+    Get geohash prefixes covering a (min_lat, min_lng, max_lat, max_lng) box.
+
+    Picks the finest precision whose covering stays within max_cells.
+    """
+    min_lat, min_lng, max_lat, max_lng = bbox
+    cells = ['']
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size(precision)
+        rows = _cell_indexes(min_lat, max_lat, height, 90.0)
+        columns = _cell_indexes(min_lng, max_lng, width, 180.0)
+        if len(rows) * len(columns) > max_cells:
+            break
+        cells = sorted({
+            encode_geohash(
+                min((row + 0.5) * height - 90.0, 90.0),
+                min((column + 0.5) * width - 180.0, 180.0),
+                precision,
+            )
+            for row in rows
+            for column in columns
+        })
+    return cells
+
+
+def split_bbox(bbox: BBox) -> list[BBox]:
+    """Split a box crossing the antimeridian (min_lng > max_lng) in two."""
+    min_lat, min_lng, max_lat, max_lng = bbox
+    if min_lng <= max_lng:
+        return [bbox]
+    return [(min_lat, min_lng, max_lat, 180.0), (min_lat, -180.0, max_lat, max_lng)]
+
+
+def bbox_around(lat: float, lng: float, radius_km: float) -> BBox:
+    """Bounding box enclosing a circle of radius_km around a point."""
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    min_lat = max(lat - lat_delta, -90.0)
+    max_lat = min(lat + lat_delta, 90.0)
+    cos_lat = math.cos(math.radians(max(abs(min_lat), abs(max_lat))))
+    if cos_lat <= 1e-6 or radius_km / (KM_PER_DEGREE_LAT * cos_lat) >= 180.0:
+        return (min_lat, -180.0, max_lat, 180.0)
+    lng_delta = radius_km / (KM_PER_DEGREE_LAT * cos_lat)
+    min_lng = (lng - lng_delta + 180.0) % 360.0 - 180.0
+    max_lng = (lng + lng_delta + 180.0) % 360.0 - 180.0
+    return (min_lat, min_lng, max_lat, max_lng)
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometers."""
+    dlat = math.radians(lat2 - lat1)
+    dlng = math.radians(lng2 - lng1)
+    a = (
+        math.sin(dlat / 2) ** 2
+        + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlng / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def filter_bbox(queryset: QuerySet, bbox: BBox, lat_field: str, lng_field: str,
+                geohash_field: str = 'geohash') -> QuerySet:
+    """Restrict a queryset to rows inside a bounding box."""
+    condition = Q()
+    for part in split_bbox(bbox):
+        min_lat, min_lng, max_lat, max_lng = part
+        prefixes = Q()
+        for cell in covering_cells(part):
+            prefixes |= Q(**{f'{geohash_field}__startswith': cell})
+        condition |= prefixes & Q(**{
+            f'{lat_field}__gte': min_lat,
+            f'{lat_field}__lte': max_lat,
+            f'{lng_field}__gte': min_lng,
+            f'{lng_field}__lte': max_lng,
+        })
+    return queryset.exclude(**{geohash_field: ''}).filter(condition)
+
+
+def annotate_distance(queryset: QuerySet, lat: float, lng: float,
+                      lat_field: str, lng_field: str) -> QuerySet:
+    """Annotate ``distance_km`` (haversine) from a point."""
+    row_lat = Radians(Cast(F(lat_field), FloatField()))
+    row_lng = Radians(Cast(F(lng_field), FloatField()))
+    origin_lat = math.radians(lat)
+    a = (
+        Power(Sin((row_lat - Value(origin_lat)) / 2), 2)
+        + Value(math.cos(origin_lat)) * Cos(row_lat)
+        * Power(Sin((row_lng - Value(math.radians(lng))) / 2), 2)
+    )
+    return queryset.annotate(
+        distance_km=Value(2 * EARTH_RADIUS_KM) * ASin(Sqrt(a))
+    )
+
+
+def filter_radius(queryset: QuerySet, lat: float, lng: float, radius_km: float,
+                  lat_field: str, lng_field: str, geohash_field: str = 'geohash') -> QuerySet:
+    """Rows within radius_km of a point, annotated with ``distance_km``."""
+    queryset = filter_bbox(
+        queryset, bbox_around(lat, lng, radius_km), lat_field, lng_field, geohash_field
+    )
+    return annotate_distance(queryset, lat, lng, lat_field, lng_field).filter(
+        distance_km__lte=radius_km
+    )
+
+
+def nearest(queryset: QuerySet, lat: float, lng: float, limit: int, max_radius_km: float,
+            lat_field: str, lng_field: str, geohash_field: str = 'geohash',
+            initial_radius_km: float = 10.0) -> list:
+    """
+    Get up to ``limit`` rows nearest to a point, closest first.
+
+    Searches a growing radius (x4 per step) so dense areas only touch a few
+    geohash cells; stops at max_radius_km.
+    """
+    radius = min(initial_radius_km, max_radius_km)
+    while True:
+        rows = list(
+            filter_radius(queryset, lat, lng, radius, lat_field, lng_field, geohash_field)
+            .order_by('distance_km', 'pk')[:limit]
+        )
+        if len(rows) >= limit or radius >= max_radius_km:
+            return rows
+        radius = min(radius * 4, max_radius_km)
@@ -0,0 +1,189 @@
+"""
+Resized image variants for gallery and update photos.
+
+Uploaded originals are re-encoded as WebP and JPEG at a few fixed widths
+with Pillow and stored next to the original through the field's storage
+(S3/MinIO in production), e.g. ``products/2026/10/oak.jpg`` gets
+``products/2026/10/oak_w320.webp``, ``products/2026/10/oak_w320.jpg``...
+The stored names are recorded in the model's ``image_variants`` JSON field:
+
+    {"source": "products/2026/10/oak.jpg",
+     "webp": {"320": "products/2026/10/oak_w320.webp", ...},
+     "jpeg": {"320": "products/2026/10/oak_w320.jpg", ...}}
+
+Variants are generated after the upload commits on a small background
+thread pool (see signals.py), so saving a photo never waits for Pillow.
+"""
+
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Target widths in pixels; originals are never upscaled
+IMAGE_VARIANT_WIDTHS = (320, 640, 1024, 1600)
+
+# Output format -> (Pillow format, file extension, save options)
+IMAGE_VARIANT_FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-variants')
+
+
+def variant_name(name: str, width: int, extension: str) -> str:
+    """Storage name of a variant, next to the original."""
+    root, _ = os.path.splitext(name)
+    return f'{root}_w{width}.{extension}'
+
+
+def variant_widths(original_width: int, widths=IMAGE_VARIANT_WIDTHS) -> list[int]:
+    """Widths to render for an original: smaller targets plus the capped original width."""
+    largest = min(original_width, max(widths))
+    return sorted({width for width in widths if width < largest} | {largest})
+
+
+def _prepare(image: Image.Image, pillow_format: str) -> Image.Image:
+    """Convert an image to a mode the target format can encode."""
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    if pillow_format == 'JPEG':
+        if has_alpha:
+            rgba = image.convert('RGBA')
+            background = Image.new('RGB', rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.getchannel('A'))
+            return background
+        return image.convert('RGB')
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _encode(image: Image.Image, pillow_format: str, options: dict) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def _store(storage, name: str, data: bytes) -> str:
+    """Save a variant under its exact name, replacing any previous file."""
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(data))
+
+
+def generate_variants(field_file) -> dict:
+    """
+    Render and store the variants of an image field file.
+
+    Returns the ``image_variants`` map for the stored files.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        original = Image.open(source)
+        original.load()
+    original = ImageOps.exif_transpose(original)
+
+    variants = {'source': field_file.name}
+    for width in variant_widths(original.width):
+        height = max(1, round(original.height * width / original.width))
+        resized = original if width == original.width else original.resize(
+            (width, height), Image.Resampling.LANCZOS
+        )
+        for key, (pillow_format, extension, options) in IMAGE_VARIANT_FORMATS.items():
+            data = _encode(_prepare(resized, pillow_format), pillow_format, options)
+            name = _store(storage, variant_name(field_file.name, width, extension), data)
+            variants.setdefault(key, {})[str(width)] = name
+    return variants
+
+
+def variant_files(variants: dict) -> set[str]:
+    """All stored file names listed in an ``image_variants`` map."""
+    return {
+        name
+        for key in IMAGE_VARIANT_FORMATS
+        for name in (variants or {}).get(key, {}).values()
+    }
+
+
+def delete_variants(storage, variants: dict, keep: set[str] = frozenset()) -> None:
+    """Delete the variant files of an ``image_variants`` map (best effort)."""
+    for name in variant_files(variants) - set(keep):
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning('Could not delete image variant %s', name, exc_info=True)
+
+
+def build_srcset(storage, name: str | None, variants: dict) -> dict[str, str]:
+    """
+    Build ``{"webp": "<url> 320w, ...", "jpeg": ...}`` for an image.
+
+    Empty until the variants of the current file ``name`` exist.
+    """
+    if not name or not variants or variants.get('source') != name:
+        return {}
+    return {
+        key: ', '.join(
+            f'{storage.url(file_name)} {width}w'
+            for width, file_name in sorted(variants[key].items(), key=lambda item: int(item[0]))
+        )
+        for key in IMAGE_VARIANT_FORMATS
+        if variants.get(key)
+    }
+
+
+def needs_variants(instance) -> bool:
+    """Whether an instance has an uploaded image without current variants."""
+    return bool(instance.image) and (instance.image_variants or {}).get('source') != instance.image.name
+
+
+def refresh_variants(instance, force: bool = False) -> bool:
+    """
+    Generate and record the variants of an instance's image.
+
+    The row is only updated if it still points at the same file, so a
+    concurrent replacement never gets the old image's variants. Returns
+    True when new variants were stored.
+    """
+    if not (force and instance.image) and not needs_variants(instance):
+        return False
+    storage = instance.image.storage
+    variants = generate_variants(instance.image)
+    updated = (
+        type(instance).objects
+        .filter(pk=instance.pk, image=instance.image.name)
+        .update(image_variants=variants)
+    )
+    if not updated:
+        delete_variants(storage, variants)
+        return False
+    delete_variants(storage, instance.image_variants, keep=variant_files(variants))
+    instance.image_variants = variants
+    return True
+
+
+def _run_and_close(func, *args) -> None:
+    try:
+        func(*args)
+    except Exception:
+        logger.exception('Image variant task %s failed', getattr(func, '__name__', func))
+    finally:
+        connection.close()
+
+
+def run_in_background(func, *args) -> None:
+    """
+    Run a variant task on the background pool.
+
+    Runs inline when IMAGE_VARIANTS_ASYNC is off (tests, one-off scripts).
+    """
+    if settings.IMAGE_VARIANTS_ASYNC:
+        _executor.submit(_run_and_close, func, *args)
+    else:
+        func(*args)
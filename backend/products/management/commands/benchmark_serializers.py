@@ -0,0 +1,106 @@
+"""
+Management command to benchmark product list serialization.
+
+Creates temporary products inside a transaction that is rolled back at the
+end, then measures how many rows per second are fetched and rendered for
+each requested payload size and language, by ProductListSerializer (model
+instances) and by ProductListProjection (values() rows).
+
+Run with: python manage.py benchmark_serializers --rows 20 100 1000
+"""
+
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from products.models import Category, Product, ProductImage
+from products.projections import ProductListProjection
+from products.repositories import ProductRepository
+from products.serializers import ProductListSerializer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark product list serialization throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[100],
+            help='Payload sizes to benchmark (default: 100)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=20,
+            help='Timed runs per payload size (best run is reported)',
+        )
+
+    def handle(self, *args, **options):
+        sizes = options['rows']
+        with transaction.atomic():
+            self.create_products(max(sizes))
+            for size in sizes:
+                for language in ('es', 'en'):
+                    self.report(size, language, options['repeat'])
+            transaction.set_rollback(True)
+
+    def create_products(self, count: int) -> None:
+        category = Category.objects.create(
+            name='Benchmark', name_en='Benchmark EN', slug='benchmark-serializers'
+        )
+        products = Product.objects.bulk_create([
+            Product(
+                title=f'Árbol {index}',
+                title_en=f'Tree {index}',
+                slug=f'benchmark-serializers-{index}',
+                description='Descripción',
+                short_description='Descripción corta',
+                short_description_en='Short description',
+                category=category,
+                product_type=Product.ProductType.TREE,
+                price=Decimal('49.00'),
+                compare_at_price=Decimal('59.00'),
+                co2_offset_kg=Decimal('22.50'),
+            )
+            for index in range(count)
+        ])
+        ProductImage.objects.bulk_create([
+            ProductImage(
+                product=product,
+                image_url=f'https://example.com/{product.slug}.jpg',
+                is_primary=True,
+            )
+            for product in products
+        ])
+
+    def report(self, size: int, language: str, repeat: int) -> None:
+        request = APIRequestFactory().get('/api/products/', HTTP_ACCEPT_LANGUAGE=language)
+        context = {'request': request}
+        queryset = (
+            ProductRepository.get_all_active()
+            .filter(category__slug='benchmark-serializers')
+            .order_by('-created_at')
+        )
+
+        def serializer():
+            ProductListSerializer(list(queryset[:size]), many=True, context=context).data
+
+        def projection():
+            renderer = ProductListProjection(context=context)
+            renderer.render(renderer.values(queryset)[:size])
+
+        for name, render in (('serializer', serializer), ('projection', projection)):
+            best = float('inf')
+            for _ in range(repeat):
+                start = time.perf_counter()
+                render()
+                best = min(best, time.perf_counter() - start)
+            self.stdout.write(
+                f'{size:>6} rows [{language}] {name:<10}  {best * 1000:8.2f} ms  '
+                f'{size / best:>10,.0f} rows/s'
+            )
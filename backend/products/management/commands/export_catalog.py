@@ -0,0 +1,48 @@
+"""
+Management command to export the catalog as NDJSON or CSV.
+
+Streams every active product or sponsorship unit through a server-side
+cursor, so memory use is flat for any catalog size. Same output as
+/api/export/<resource>.<format>.
+
+Run with: python manage.py export_catalog products --format csv --output products.csv
+"""
+
+from django.core.management.base import BaseCommand
+
+from products.exports import EXPORT_CHUNK_SIZE, EXPORT_CONTENT_TYPES, EXPORT_RESOURCES, stream_export
+
+
+class Command(BaseCommand):
+    help = 'Stream all active products or units as NDJSON or CSV'
+
+    def add_arguments(self, parser):
+        parser.add_argument('resource', choices=sorted(EXPORT_RESOURCES))
+        parser.add_argument(
+            '--format',
+            dest='export_format',
+            choices=sorted(EXPORT_CONTENT_TYPES),
+            default='ndjson',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write (default: stdout)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=EXPORT_CHUNK_SIZE,
+            help='Rows fetched per database round trip',
+        )
+
+    def handle(self, *args, **options):
+        chunks = stream_export(options['resource'], options['export_format'], options['chunk_size'])
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            for chunk in chunks:
+                output.write(chunk)
+        self.stderr.write(self.style.SUCCESS(f"Wrote {options['output']}"))
@@ -0,0 +1,61 @@
+"""
+Management command to backfill resized image variants.
+
+New uploads get their WebP/JPEG variants automatically after commit. Run
+this once for images uploaded before variants existed, after changing
+IMAGE_VARIANT_WIDTHS / IMAGE_VARIANT_FORMATS (with --force), or to repair
+missing files.
+
+Run with: python manage.py generate_image_variants [--model product-image] [--force]
+"""
+
+from django.core.management.base import BaseCommand
+
+from products.cache import invalidate_catalog
+from products.images import refresh_variants
+from products.models import ProductImage, ProductUpdate, UnitImage, UnitUpdate
+
+MODELS = {
+    'product-image': ProductImage,
+    'product-update': ProductUpdate,
+    'unit-image': UnitImage,
+    'unit-update': UnitUpdate,
+}
+
+
+class Command(BaseCommand):
+    help = 'Generate resized WebP/JPEG variants for uploaded images'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model',
+            choices=sorted(MODELS),
+            action='append',
+            help='Only process these models (repeatable; default: all)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Regenerate variants that already exist',
+        )
+
+    def handle(self, *args, **options):
+        names = options['model'] or list(MODELS)
+        total = 0
+        for name in names:
+            model = MODELS[name]
+            generated = failed = 0
+            queryset = model.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+            for instance in queryset.iterator(chunk_size=200):
+                try:
+                    if refresh_variants(instance, force=options['force']):
+                        generated += 1
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'{name} #{instance.pk} ({instance.image.name}): {exc}')
+            total += generated
+            self.stdout.write(f'{name}: {generated} generated, {failed} failed')
+
+        if total:
+            invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f'{total} images processed'))
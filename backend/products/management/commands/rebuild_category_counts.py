@@ -0,0 +1,23 @@
+"""
+Management command to rebuild denormalized category product counts.
+
+Category.active_product_count is kept current by model signals. Run this
+after bulk operations that bypass them (queryset.update(), bulk_create(),
+loaddata) or to repair drift.
+
+Run with: python manage.py rebuild_category_counts
+"""
+
+from django.core.management.base import BaseCommand
+
+from products.cache import invalidate_catalog
+from products.services import category_service
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the active product count of every category'
+
+    def handle(self, *args, **options):
+        updated = category_service.rebuild_product_counts()
+        invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(f'{updated} categories updated'))
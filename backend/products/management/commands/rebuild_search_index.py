@@ -0,0 +1,24 @@
+"""
+Management command to rebuild the product full-text search index.
+
+Only needed on SQLite (FTS5 shadow table), e.g. after bulk updates that
+bypass model signals. On PostgreSQL the search vector is a generated
+column and is always current.
+
+Run with: python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand
+
+from products.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product full-text search index'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        indexed = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'{type(backend).__name__}: {indexed} products indexed'
+        ))
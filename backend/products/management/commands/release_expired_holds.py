@@ -0,0 +1,21 @@
+"""
+Management command to release expired stock holds.
+
+Expired holds already stop counting against availability; this sweep
+marks them released in one UPDATE so the active-hold indexes stay small.
+Schedule it every few minutes (cron, Celery beat, ...).
+
+Run with: python manage.py release_expired_holds
+"""
+
+from django.core.management.base import BaseCommand
+
+from products.services import product_service
+
+
+class Command(BaseCommand):
+    help = 'Release stock holds whose checkout expired'
+
+    def handle(self, *args, **options):
+        released = product_service.release_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f'{released} expired holds released'))
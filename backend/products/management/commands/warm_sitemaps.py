@@ -0,0 +1,20 @@
+"""
+Management command to precompute the cached sitemaps.
+
+Sitemaps are built on the first crawler request after a catalog change. Run this after deploys or bulk imports so even that first request
+is served from the cache.
+
+Run with: python manage.py warm_sitemaps
+"""
+
+from django.core.management.base import BaseCommand
+
+from products.sitemaps import warm_sitemaps
+
+
+class Command(BaseCommand):
+    help = 'Build and cache the sitemap index and all sitemap shards'
+
+    def handle(self, *args, **options):
+        files = warm_sitemaps()
+        self.stdout.write(self.style.SUCCESS(f'{files} sitemap files cached'))
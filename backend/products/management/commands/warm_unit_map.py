@@ -0,0 +1,22 @@
+"""
+Management command to precompute the unit map cluster layers.
+
+Cluster layers are built on the first map request after a unit change.
+Run this after deploys or bulk imports so even that first request is
+served from the cache.
+
+Run with: python manage.py warm_unit_map
+"""
+
+from django.core.management.base import BaseCommand
+
+from products.clusters import warm_cluster_layers
+
+
+class Command(BaseCommand):
+    help = 'Build and cache the sponsorship unit map clusters for every zoom level'
+
+    def handle(self, *args, **options):
+        layers = warm_cluster_layers()
+        clusters = sum(len(layer) for layer in layers.values())
+        self.stdout.write(self.style.SUCCESS(f'{len(layers)} cluster layers cached ({clusters} clusters)'))
@@ -0,0 +1,59 @@
+from django.db import migrations
+
+
+FTS_COLUMNS = [
+    'title', 'title_en', 'species',
+    'short_description', 'short_description_en',
+    'description', 'description_en',
+]
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute("""
+            ALTER TABLE products_product ADD COLUMN search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('spanish'::regconfig, coalesce(title, '')), 'A') ||
+                setweight(to_tsvector('english'::regconfig, coalesce(title_en, '')), 'A') ||
+                setweight(to_tsvector('simple'::regconfig, coalesce(species, '')), 'A') ||
+                setweight(to_tsvector('spanish'::regconfig, coalesce(short_description, '')), 'B') ||
+                setweight(to_tsvector('english'::regconfig, coalesce(short_description_en, '')), 'B') ||
+                setweight(to_tsvector('spanish'::regconfig, coalesce(description, '')), 'C') ||
+                setweight(to_tsvector('english'::regconfig, coalesce(description_en, '')), 'C')
+            ) STORED
+        """)
+        schema_editor.execute(
+            'CREATE INDEX products_product_search_gin '
+            'ON products_product USING gin (search_vector)'
+        )
+    elif vendor == 'sqlite':
+        columns = ', '.join(FTS_COLUMNS)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE products_product_fts USING fts5("
+            f"{columns}, tokenize='unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(
+            f'INSERT INTO products_product_fts (rowid, {columns}) '
+            f'SELECT id, {columns} FROM products_product'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS products_product_search_gin')
+        schema_editor.execute('ALTER TABLE products_product DROP COLUMN IF EXISTS search_vector')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS products_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_alter_productimage_image_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
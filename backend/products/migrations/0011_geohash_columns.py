@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:26
+
+from django.db import migrations, models
+
+# Frozen copy of products.geo.geohash_for at the time of this migration
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+
+
+def geohash_for(lat, lng):
+    if lat is None or lng is None:
+        return ""
+    lat, lng = float(lat), float(lng)
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < GEOHASH_PRECISION:
+        target, value = (lng_range, lng) if even else (lat_range, lat)
+        middle = (target[0] + target[1]) / 2
+        bits <<= 1
+        if value >= middle:
+            bits |= 1
+            target[0] = middle
+        else:
+            target[1] = middle
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(GEOHASH_ALPHABET[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+
+def backfill_geohashes(apps, schema_editor):
+    for model_name, lat_field, lng_field in (
+        ("Product", "location_lat", "location_lng"),
+        ("SponsorshipUnit", "location_lat_approx", "location_lng_approx"),
+    ):
+        model = apps.get_model("products", model_name)
+        rows = list(
+            model.objects.exclude(**{f"{lat_field}__isnull": True})
+            .exclude(**{f"{lng_field}__isnull": True})
+            .only("id", lat_field, lng_field)
+        )
+        for row in rows:
+            row.geohash = geohash_for(getattr(row, lat_field), getattr(row, lng_field))
+        model.objects.bulk_update(rows, ["geohash"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0010_category_active_product_count"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="geohash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Geohash of the coordinates (computed on save)",
+                max_length=12,
+            ),
+        ),
+        migrations.AddField(
+            model_name="sponsorshipunit",
+            name="geohash",
+            field=models.CharField(
+                blank=True,
+                db_index=True,
+                editable=False,
+                help_text="Geohash de la ubicación aproximada (calculado al guardar)",
+                max_length=12,
+            ),
+        ),
+        migrations.RunPython(backfill_geohashes, migrations.RunPython.noop),
+    ]
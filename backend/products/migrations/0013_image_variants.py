@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("products", "0012_price_rating_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productimage",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="Variantes redimensionadas (WebP/JPEG) generadas al subir la imagen",
+            ),
+        ),
+        migrations.AddField(
+            model_name="productupdate",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="Variantes redimensionadas (WebP/JPEG) generadas al subir la imagen",
+            ),
+        ),
+        migrations.AddField(
+            model_name="unitimage",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="Variantes redimensionadas (WebP/JPEG) generadas al subir la imagen",
+            ),
+        ),
+        migrations.AddField(
+            model_name="unitupdate",
+            name="image_variants",
+            field=models.JSONField(
+                blank=True,
+                default=dict,
+                editable=False,
+                help_text="Variantes redimensionadas (WebP/JPEG) generadas al subir la imagen",
+            ),
+        ),
+    ]
@@ -0,0 +1,95 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:54
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0002_keyset_pagination_indexes"),
+        ("products", "0013_image_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockHold",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "quantity",
+                    models.PositiveIntegerField(
+                        help_text="Units held",
+                        validators=[django.core.validators.MinValueValidator(1)],
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("active", "Active"),
+                            ("converted", "Converted"),
+                            ("released", "Released"),
+                        ],
+                        default="active",
+                        help_text="Current hold status",
+                        max_length=10,
+                    ),
+                ),
+                (
+                    "expires_at",
+                    models.DateTimeField(
+                        help_text="When an active hold stops counting against stock"
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "order",
+                    models.ForeignKey(
+                        help_text="The order holding the stock",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_holds",
+                        to="orders.order",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        help_text="The held product",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_holds",
+                        to="products.product",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Stock Hold",
+                "verbose_name_plural": "Stock Holds",
+                "ordering": ["-created_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["order", "status"],
+                        name="products_st_order_i_151480_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("status", "active")),
+                        fields=["product", "expires_at"],
+                        name="stock_holds_active_product_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("status", "active")),
+                        fields=["expires_at"],
+                        name="stock_holds_active_expiry_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("orders", "0002_keyset_pagination_indexes"),
+        ("products", "0014_stock_holds"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="sponsorshipunit",
+            name="sponsor_order",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Pedido con el que se apadrinó (se libera si se cancela)",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="sponsorship_units",
+                to="orders.order",
+            ),
+        ),
+    ]
@@ -5,10 +5,123 @@ This module defines Category and Product models for the marketplace catalog.
 Products can be trees for adoption, wellness retreats, or physical/digital goods.
 """
 
+from typing import Optional
+
 from django.conf import settings
 from django.db import models
+from django.db.models import OuterRef, Subquery
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.text import slugify
+
+from .geo import geohash_for
+from .images import build_srcset, delete_variants
+
+
+# Gallery images are ranked primary first, then by display order.
+PRIMARY_IMAGE_ORDERING = ('-is_primary', 'display_order', 'id')
+
+
+def primary_image_subqueries(
+    image_model, fk_name: str, outer_ref: str = 'pk', prefix: str = 'primary_image'
+) -> dict:
+    """
+    Build annotations selecting the primary gallery image of each row.
+    
+    Returns correlated subqueries (stored file name, external URL and
+    resized variants), so a page of any size resolves its images in the
+    same single query.
+    """
+    images = (
+        image_model.objects
+        .filter(**{fk_name: OuterRef(outer_ref)})
+        .order_by(*PRIMARY_IMAGE_ORDERING)
+    )
+    return {
+        f'{prefix}_file': Subquery(images.values('image')[:1]),
+        f'{prefix}_external_url': Subquery(images.values('image_url')[:1]),
+        f'{prefix}_variants': Subquery(images.values('image_variants')[:1]),
+    }
+
+
+def resolve_primary_image(
+    instance, image_model, prefix: str = 'primary_image', gallery: Optional[str] = 'gallery'
+):
+    """
+    Resolve the primary image URL of an instance without extra queries.
+    
+    Reads the prefetched gallery when available, then the subquery
+    annotations. Returns None when neither source is loaded, and '' when
+    the gallery is loaded but empty.
+    """
+    prefetched = None
+    if gallery:
+        prefetched = getattr(instance, '_prefetched_objects_cache', {}).get(gallery)
+    if prefetched is not None:
+        images = sorted(
+            prefetched,
+            key=lambda image: (not image.is_primary, image.display_order, image.id)
+        )
+        return images[0].url if images else ''
+    
+    if hasattr(instance, f'{prefix}_external_url'):
+        image_file = getattr(instance, f'{prefix}_file')
+        if image_file:
+            return image_model._meta.get_field('image').storage.url(image_file)
+        return getattr(instance, f'{prefix}_external_url') or ''
+    
+    return None
+
+
+def resolve_primary_image_srcset(
+    instance, image_model, prefix: str = 'primary_image', gallery: Optional[str] = 'gallery'
+):
+    """
+    Resolve the srcset map of an instance's primary image without extra queries.
+    
+    Same sources as resolve_primary_image(); returns None when neither is
+    loaded.
+    """
+    prefetched = None
+    if gallery:
+        prefetched = getattr(instance, '_prefetched_objects_cache', {}).get(gallery)
+    if prefetched is not None:
+        images = sorted(
+            prefetched,
+            key=lambda image: (not image.is_primary, image.display_order, image.id)
+        )
+        return images[0].srcset if images else {}
+    
+    if hasattr(instance, f'{prefix}_variants'):
+        return build_srcset(
+            image_model._meta.get_field('image').storage,
+            getattr(instance, f'{prefix}_file'),
+            getattr(instance, f'{prefix}_variants'),
+        )
+    
+    return None
+
+
+class ProductQuerySet(models.QuerySet):
+    """QuerySet with catalog-specific helpers."""
+    
+    def with_primary_image(self) -> 'ProductQuerySet':
+        """Annotate each product with its primary gallery image."""
+        return self.annotate(**primary_image_subqueries(ProductImage, 'product'))
+
+
+class SponsorshipUnitQuerySet(models.QuerySet):
+    """QuerySet with sponsorship unit helpers."""
+    
+    def with_primary_image(self) -> 'SponsorshipUnitQuerySet':
+        """Annotate each unit with its own and its product's primary image."""
+        return self.annotate(
+            **primary_image_subqueries(UnitImage, 'unit'),
+            **primary_image_subqueries(
+                ProductImage, 'product', 'product_id', prefix='product_primary_image'
+            ),
+        )
+
+
 class Category(models.Model):
     """
     Product category for organizing the catalog.
@@ -56,6 +169,11 @@ class Category(models.Model):
         default=0,
         help_text='Order in which to display categories'
     )
+    active_product_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text='Number of active products (maintained by signals)'
+    )
     
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
@@ -70,10 +188,22 @@ class Category(models.Model):
         return self.name
     
     def save(self, *args, **kwargs) -> None:
-        """Auto-generate slug from name if not provided."""
+        """
+        Auto-generate slug from name if not provided.
+        
+        Updates never write active_product_count, so a stale in-memory
+        value cannot overwrite the maintained counter.
+        """
         if not self.slug:
             self.slug = slugify(self.name)
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'active_product_count'
+            ]
         super().save(*args, **kwargs)
+
+
 class Product(models.Model):
     """
     Product model representing items in the marketplace.
@@ -276,6 +406,13 @@ class Product(models.Model):
         blank=True,
         help_text='Longitude coordinate'
     )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text='Geohash of the coordinates (computed on save)'
+    )
     
     # Tree-specific fields
     co2_offset_kg = models.DecimalField(
@@ -321,6 +458,8 @@ class Product(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ProductQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
@@ -330,15 +469,32 @@ class Product(models.Model):
             models.Index(fields=['category', 'is_active']),
             models.Index(fields=['product_type', 'is_active']),
             models.Index(fields=['is_featured', 'is_active']),
+            models.Index(fields=['is_active', '-created_at', '-id']),
+            # Partial indexes for price / rating range filters and sorts
+            # over active products
+            models.Index(
+                fields=['product_type', 'price'],
+                condition=models.Q(is_active=True),
+                name='products_active_type_price_idx',
+            ),
+            models.Index(
+                fields=['rating'],
+                condition=models.Q(is_active=True),
+                name='products_active_rating_idx',
+            ),
         ]
     
     def __str__(self) -> str:
         return self.title
     
     def save(self, *args, **kwargs) -> None:
-        """Auto-generate slug from title if not provided."""
+        """Auto-generate slug from title if not provided and refresh the geohash."""
         if not self.slug:
             self.slug = slugify(self.title)
+        self.geohash = geohash_for(self.location_lat, self.location_lng)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'location_lat', 'location_lng'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'geohash'}
         super().save(*args, **kwargs)
     
     @property
@@ -360,16 +516,26 @@ class Product(models.Model):
     
     @property
     def primary_image(self) -> str:
-        """Get the primary image URL from gallery."""
-        # First try to get the primary image
-        primary = self.gallery.filter(is_primary=True).first()
-        if primary:
-            return primary.url
-        # Fallback to first image in gallery
-        first = self.gallery.first()
-        if first:
-            return first.url
-        return ''
+        """
+        Get the primary image URL from gallery.
+        
+        Uses the prefetched gallery or the with_primary_image() annotation
+        when present; otherwise falls back to a single query.
+        """
+        url = resolve_primary_image(self, ProductImage)
+        if url is not None:
+            return url
+        image = self.gallery.order_by(*PRIMARY_IMAGE_ORDERING).first()
+        return image.url if image else ''
+    
+    @property
+    def primary_image_srcset(self) -> dict[str, str]:
+        """Get srcset strings of the primary image's resized variants."""
+        srcset = resolve_primary_image_srcset(self, ProductImage)
+        if srcset is not None:
+            return srcset
+        image = self.gallery.order_by(*PRIMARY_IMAGE_ORDERING).first()
+        return image.srcset if image else {}
     
     @property
     def seo_title(self) -> str:
@@ -412,6 +578,12 @@ class ProductImage(models.Model):
         blank=True,
         help_text='URL externa de imagen (alternativa a subir archivo)'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Variantes redimensionadas (WebP/JPEG) generadas al subir la imagen'
+    )
     alt_text = models.CharField(
         max_length=200,
         blank=True,
@@ -447,7 +619,9 @@ class ProductImage(models.Model):
             try:
                 old_instance = ProductImage.objects.get(pk=self.pk)
                 if old_instance.image and self.image != old_instance.image:
+                    delete_variants(old_instance.image.storage, old_instance.image_variants)
                     old_instance.image.delete(save=False)
+                    self.image_variants = {}
             except ProductImage.DoesNotExist:
                 pass
         super().save(*args, **kwargs)
@@ -456,6 +630,7 @@ class ProductImage(models.Model):
         """Delete image file from storage when deleting the record."""
         if self.image:
             try:
+                delete_variants(self.image.storage, self.image_variants)
                 self.image.delete(save=False)
             except Exception:
                 pass
@@ -467,6 +642,11 @@ class ProductImage(models.Model):
         if self.image:
             return self.image.url
         return self.image_url
+    
+    @property
+    def srcset(self) -> dict[str, str]:
+        """Get srcset strings of the resized variants, keyed by format."""
+        return build_srcset(self.image.storage, self.image.name, self.image_variants)
 
 
 class ProductUpdate(models.Model):
@@ -513,6 +693,12 @@ class ProductUpdate(models.Model):
         blank=True,
         help_text='URL externa de imagen'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Variantes redimensionadas (WebP/JPEG) generadas al subir la imagen'
+    )
     
     # Metrics (optional, for growth/impact updates)
     co2_absorbed = models.DecimalField(
@@ -555,7 +741,9 @@ class ProductUpdate(models.Model):
             try:
                 old_instance = ProductUpdate.objects.get(pk=self.pk)
                 if old_instance.image and self.image != old_instance.image:
+                    delete_variants(old_instance.image.storage, old_instance.image_variants)
                     old_instance.image.delete(save=False)
+                    self.image_variants = {}
             except ProductUpdate.DoesNotExist:
                 pass
         super().save(*args, **kwargs)
@@ -564,6 +752,7 @@ class ProductUpdate(models.Model):
         """Delete image file from storage when deleting the record."""
         if self.image:
             try:
+                delete_variants(self.image.storage, self.image_variants)
                 self.image.delete(save=False)
             except Exception:
                 pass
@@ -575,6 +764,11 @@ class ProductUpdate(models.Model):
         if self.image:
             return self.image.url
         return self.image_url
+    
+    @property
+    def srcset(self) -> dict[str, str]:
+        """Get srcset strings of the resized variants, keyed by format."""
+        return build_srcset(self.image.storage, self.image.name, self.image_variants)
 
 
 class SponsorshipUnit(models.Model):
@@ -678,6 +872,13 @@ class SponsorshipUnit(models.Model):
         blank=True,
         help_text='Longitud aproximada (3 decimales = ~100m de precisión)'
     )
+    geohash = models.CharField(
+        max_length=12,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text='Geohash de la ubicación aproximada (calculado al guardar)'
+    )
     location_radius_km = models.DecimalField(
         max_digits=5,
         decimal_places=2,
@@ -745,6 +946,14 @@ class SponsorshipUnit(models.Model):
         blank=True,
         help_text='Fecha de expiración del apadrinamiento'
     )
+    sponsor_order = models.ForeignKey(
+        'orders.Order',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='sponsorship_units',
+        help_text='Pedido con el que se apadrinó (se libera si se cancela)'
+    )
     
     # Visibilidad
     is_active = models.BooleanField(
@@ -760,6 +969,8 @@ class SponsorshipUnit(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = SponsorshipUnitQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Unidad de Apadrinamiento'
         verbose_name_plural = 'Unidades de Apadrinamiento'
@@ -785,13 +996,18 @@ class SponsorshipUnit(models.Model):
     
     @property
     def primary_image(self) -> str:
-        """Get primary image from gallery."""
-        primary = self.gallery.filter(is_primary=True).first()
-        if primary:
-            return primary.url
-        first = self.gallery.first()
-        if first:
-            return first.url
+        """Get primary image from gallery, falling back to the product's."""
+        url = resolve_primary_image(self, UnitImage)
+        if url is None:
+            image = self.gallery.order_by(*PRIMARY_IMAGE_ORDERING).first()
+            url = image.url if image else ''
+        if url:
+            return url
+        product_url = resolve_primary_image(
+            self, ProductImage, prefix='product_primary_image', gallery=None
+        )
+        if product_url is not None:
+            return product_url
         return self.product.primary_image
     
     def get_location_for_user(self, user) -> dict:
@@ -839,6 +1055,14 @@ class SponsorshipUnit(models.Model):
             # Usar el nombre de ubicación como área si no hay área definida
             self.location_area = self.location_name
         
+        # Geohash de la ubicación pública (aproximada) para búsquedas espaciales
+        self.geohash = geohash_for(self.location_lat_approx, self.location_lng_approx)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            location_fields = {'location_lat', 'location_lng', 'location_lat_approx', 'location_lng_approx'}
+            if location_fields & set(update_fields):
+                kwargs['update_fields'] = {*update_fields, 'geohash', 'location_lat_approx', 'location_lng_approx'}
+        
         if not self.slug:
             self.slug = slugify(f"{self.code}-{self.name}")
         super().save(*args, **kwargs)
@@ -863,6 +1087,12 @@ class UnitImage(models.Model):
         blank=True,
         help_text='URL externa de imagen'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Variantes redimensionadas (WebP/JPEG) generadas al subir la imagen'
+    )
     alt_text = models.CharField(
         max_length=200,
         blank=True,
@@ -903,7 +1133,9 @@ class UnitImage(models.Model):
             try:
                 old_instance = UnitImage.objects.get(pk=self.pk)
                 if old_instance.image and self.image != old_instance.image:
+                    delete_variants(old_instance.image.storage, old_instance.image_variants)
                     old_instance.image.delete(save=False)
+                    self.image_variants = {}
             except UnitImage.DoesNotExist:
                 pass
         super().save(*args, **kwargs)
@@ -912,6 +1144,7 @@ class UnitImage(models.Model):
         """Delete image file from storage when deleting the record."""
         if self.image:
             try:
+                delete_variants(self.image.storage, self.image_variants)
                 self.image.delete(save=False)
             except Exception:
                 pass
@@ -922,6 +1155,11 @@ class UnitImage(models.Model):
         if self.image:
             return self.image.url
         return self.image_url
+    
+    @property
+    def srcset(self) -> dict[str, str]:
+        """Get srcset strings of the resized variants, keyed by format."""
+        return build_srcset(self.image.storage, self.image.name, self.image_variants)
 
 
 class UnitUpdate(models.Model):
@@ -971,6 +1209,12 @@ class UnitUpdate(models.Model):
         blank=True,
         help_text='URL externa de imagen'
     )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        help_text='Variantes redimensionadas (WebP/JPEG) generadas al subir la imagen'
+    )
     
     # Métricas
     height_cm = models.PositiveIntegerField(
@@ -1032,7 +1276,9 @@ class UnitUpdate(models.Model):
             try:
                 old_instance = UnitUpdate.objects.get(pk=self.pk)
                 if old_instance.image and self.image != old_instance.image:
+                    delete_variants(old_instance.image.storage, old_instance.image_variants)
                     old_instance.image.delete(save=False)
+                    self.image_variants = {}
             except UnitUpdate.DoesNotExist:
                 pass
         super().save(*args, **kwargs)
@@ -1041,6 +1287,7 @@ class UnitUpdate(models.Model):
         """Delete image file from storage when deleting the record."""
         if self.image:
             try:
+                delete_variants(self.image.storage, self.image_variants)
                 self.image.delete(save=False)
             except Exception:
                 pass
@@ -1051,3 +1298,73 @@ class UnitUpdate(models.Model):
         if self.image:
             return self.image.url
         return self.image_url
+    
+    @property
+    def srcset(self) -> dict[str, str]:
+        """Get srcset strings of the resized variants, keyed by format."""
+        return build_srcset(self.image.storage, self.image.name, self.image_variants)
+
+
+class StockHold(models.Model):
+    """
+    Temporary claim on limited stock while an order is being paid.
+    
+    Holds are placed when checkout starts and count against availability
+    until they expire. A successful payment converts them into a permanent
+    stock decrement; abandoned or cancelled checkouts release them.
+    """
+    
+    class HoldStatus(models.TextChoices):
+        ACTIVE = 'active', 'Active'
+        CONVERTED = 'converted', 'Converted'
+        RELEASED = 'released', 'Released'
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_holds',
+        help_text='The held product'
+    )
+    order = models.ForeignKey(
+        'orders.Order',
+        on_delete=models.CASCADE,
+        related_name='stock_holds',
+        help_text='The order holding the stock'
+    )
+    quantity = models.PositiveIntegerField(
+        validators=[MinValueValidator(1)],
+        help_text='Units held'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=HoldStatus.choices,
+        default=HoldStatus.ACTIVE,
+        help_text='Current hold status'
+    )
+    expires_at = models.DateTimeField(
+        help_text='When an active hold stops counting against stock'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        verbose_name = 'Stock Hold'
+        verbose_name_plural = 'Stock Holds'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['order', 'status']),
+            # Held quantity per product and the expiry sweep only read
+            # active holds
+            models.Index(
+                fields=['product', 'expires_at'],
+                condition=models.Q(status='active'),
+                name='stock_holds_active_product_idx',
+            ),
+            models.Index(
+                fields=['expires_at'],
+                condition=models.Q(status='active'),
+                name='stock_holds_active_expiry_idx',
+            ),
+        ]
+    
+    def __str__(self) -> str:
+        return f"{self.quantity}x {self.product_id} for order {self.order_id} ({self.status})"
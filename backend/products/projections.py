@@ -0,0 +1,168 @@
+"""
+values()-based projections for product list payloads.
+
+ProductListProjection renders the same JSON as ProductListSerializer, but
+reads only the needed columns with .values() (category name and primary
+image come from joins/annotations) and computes the derived fields in a
+tight loop instead of building model instances and walking DRF fields.
+"""
+
+from rest_framework.response import Response
+
+from .fieldsets import select_fields
+from .images import build_srcset
+from .models import Product, ProductImage
+from .serializers import ProductListSerializer, get_request_language
+
+# Columns (values() keys) read by each output field
+PRODUCT_LIST_COLUMNS = {
+    'id': ('id',),
+    'title': ('title', 'title_en'),
+    'slug': ('slug',),
+    'short_description': ('short_description', 'short_description_en'),
+    'price': ('price',),
+    'price_label': ('pricing_type',),
+    'pricing_type': ('pricing_type',),
+    'currency': ('currency',),
+    'compare_at_price': ('compare_at_price',),
+    'is_on_sale': ('price', 'compare_at_price'),
+    'discount_percentage': ('price', 'compare_at_price'),
+    'category_name': ('category__name', 'category__name_en'),
+    'category_slug': ('category__slug',),
+    'product_type': ('product_type',),
+    'primary_image': ('primary_image_file', 'primary_image_external_url'),
+    'primary_image_srcset': ('primary_image_file', 'primary_image_variants'),
+    'rating': ('rating',),
+    'reviews_count': ('reviews_count',),
+    'is_featured': ('is_featured',),
+    'is_new': ('is_new',),
+    'location_name': ('location_name',),
+    'co2_offset_kg': ('co2_offset_kg',),
+    'area_size': ('area_size',),
+    'duration': ('duration',),
+    'distance_km': ('distance_km',),
+}
+
+
+def _is_on_sale(row) -> bool:
+    compare_at_price = row['compare_at_price']
+    return compare_at_price is not None and compare_at_price > row['price']
+
+
+def _discount_percentage(row) -> int:
+    compare_at_price = row['compare_at_price']
+    if not _is_on_sale(row) or not compare_at_price:
+        return 0
+    return int(((compare_at_price - row['price']) / compare_at_price) * 100)
+
+
+class ProductListProjection:
+    """
+    Render product list payloads from values() rows.
+
+    Output is identical to ProductListSerializer, including ?fields= /
+    ?omit= and the request language.
+    """
+
+    serializer_class = ProductListSerializer
+    columns = PRODUCT_LIST_COLUMNS
+
+    def __init__(self, context: dict | None = None):
+        self.context = context or {}
+        self.language = self.context.get('language') or get_request_language(self.context.get('request'))
+        self.serializer_fields = self.serializer_class().fields
+        self.field_names = (
+            select_fields(self.context.get('request'), list(self.serializer_fields))
+            or list(self.serializer_fields)
+        )
+
+    def values(self, queryset):
+        """Project a product queryset to the columns the response needs."""
+        names = list(self.field_names)
+        if 'distance_km' not in queryset.query.annotations and 'distance_km' in names:
+            names.remove('distance_km')
+        self.output_names = names
+
+        columns = {'id'}
+        for name in names:
+            columns.update(self.columns[name])
+        ordering = list(queryset.query.order_by) or list(Product._meta.ordering)
+        columns.update(item.lstrip('-') for item in ordering if isinstance(item, str))
+
+        queryset = queryset.prefetch_related(None)
+        uses_image = {'primary_image', 'primary_image_srcset'} & set(names)
+        if uses_image and 'primary_image_file' not in queryset.query.annotations:
+            queryset = queryset.with_primary_image()
+        return queryset.values(*sorted(columns))
+
+    def get_renderers(self) -> list:
+        """Build (name, row -> value) pairs for the output fields, in order."""
+        english = self.language == 'en'
+        image_storage = ProductImage._meta.get_field('image').storage
+        fields = self.serializer_fields
+
+        def translated(name):
+            if english:
+                en_name = f'{name}_en'
+                return lambda row: row[en_name] or row[name]
+            return lambda row: row[name]
+
+        def decimal(name):
+            to_representation = fields[name].to_representation
+            return lambda row: None if row[name] is None else to_representation(row[name])
+
+        def primary_image(row):
+            if row['primary_image_file']:
+                return image_storage.url(row['primary_image_file'])
+            return row['primary_image_external_url'] or ''
+
+        def category_name(row):
+            if english and row['category__name_en']:
+                return row['category__name_en']
+            return row['category__name']
+
+        renderers = {
+            'title': translated('title'),
+            'short_description': translated('short_description'),
+            'price': decimal('price'),
+            'compare_at_price': decimal('compare_at_price'),
+            'rating': decimal('rating'),
+            'co2_offset_kg': decimal('co2_offset_kg'),
+            'price_label': lambda row: '/año' if row['pricing_type'] == Product.PricingType.ANNUAL else '',
+            'is_on_sale': _is_on_sale,
+            'discount_percentage': _discount_percentage,
+            'category_name': category_name,
+            'category_slug': lambda row: row['category__slug'],
+            'primary_image': primary_image,
+            'primary_image_srcset': lambda row: build_srcset(
+                image_storage, row['primary_image_file'], row['primary_image_variants']
+            ),
+            'distance_km': lambda row: float(row['distance_km']),
+        }
+        return [
+            (name, renderers.get(name) or (lambda row, key=name: row[key]))
+            for name in self.output_names
+        ]
+
+    def render(self, rows) -> list[dict]:
+        """Render values() rows as list payload items."""
+        renderers = self.get_renderers()
+        return [{name: render(row) for name, render in renderers} for row in rows]
+
+
+class ProjectedListMixin:
+    """
+    ViewSet mixin serving ``list`` from a values() projection.
+
+    Pagination runs on the projected rows, so no model instances are built.
+    """
+
+    list_projection_class = None
+
+    def list(self, request, *args, **kwargs):
+        projection = self.list_projection_class(context=self.get_serializer_context())
+        rows = projection.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(projection.render(page))
+        return Response(projection.render(rows))
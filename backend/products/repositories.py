@@ -6,9 +6,28 @@ Services should use repositories instead of accessing models directly.
 """
 
 from typing import Optional
-from django.db.models import QuerySet, Q
+from django.db import connection, transaction
+from django.db.models import (
+    Case, CharField, Count, F, FloatField, IntegerField, OuterRef, PositiveIntegerField, Q, QuerySet, Subquery,
+    Sum, Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Substr
+from django.utils import timezone
 
-from .models import Product, Category
+from .geo import BBox, filter_bbox, nearest
+from .models import (
+    Product, Category, ProductImage, ProductUpdate, SponsorshipUnit, StockHold, UnitImage, UnitUpdate,
+)
+from .search import get_search_backend
+
+# Price facet buckets as (label, lower bound inclusive, upper bound exclusive)
+PRICE_BUCKETS = [
+    ('0-25', 0, 25),
+    ('25-50', 25, 50),
+    ('50-100', 50, 100),
+    ('100-250', 100, 250),
+    ('250+', 250, None),
+]
 
 
 class CategoryRepository:
@@ -34,6 +53,34 @@ class CategoryRepository:
             return Category.objects.get(id=category_id)
         except Category.DoesNotExist:
             return None
+    
+    @staticmethod
+    def adjust_active_product_count(category_id: int, delta: int) -> None:
+        """Atomically add delta to a category's active product count (never below zero)."""
+        queryset = Category.objects.filter(id=category_id)
+        if delta < 0:
+            queryset = queryset.filter(active_product_count__gte=-delta)
+        queryset.update(active_product_count=F('active_product_count') + delta)
+    
+    @staticmethod
+    def rebuild_active_product_counts() -> int:
+        """
+        Recompute every category's active product count.
+        
+        Runs a single UPDATE with a grouped COUNT subquery and returns the
+        number of categories updated.
+        """
+        counts = (
+            Product.objects
+            .filter(category=OuterRef('pk'), is_active=True)
+            .order_by()
+            .values('category')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return Category.objects.update(
+            active_product_count=Coalesce(Subquery(counts), Value(0))
+        )
 
 
 class ProductRepository:
@@ -42,7 +89,17 @@ class ProductRepository:
     @staticmethod
     def get_all_active() -> QuerySet[Product]:
         """Get all active products."""
-        return Product.objects.filter(is_active=True).select_related('category')
+        return (
+            Product.objects
+            .filter(is_active=True)
+            .select_related('category')
+            .with_primary_image()
+        )
+    
+    @staticmethod
+    def get_for_export() -> QuerySet[Product]:
+        """Get all active products in primary key order, without joins or annotations."""
+        return Product.objects.filter(is_active=True).order_by('pk')
     
     @staticmethod
     def get_by_id(product_id: int) -> Optional[Product]:
@@ -70,6 +127,7 @@ class ProductRepository:
             Product.objects
             .filter(is_active=True, is_featured=True)
             .select_related('category')
+            .with_primary_image()
             .order_by('-created_at')[:limit]
         )
     
@@ -80,6 +138,7 @@ class ProductRepository:
             Product.objects
             .filter(is_active=True, is_new=True)
             .select_related('category')
+            .with_primary_image()
             .order_by('-created_at')[:limit]
         )
     
@@ -90,6 +149,7 @@ class ProductRepository:
             Product.objects
             .filter(is_active=True, category__slug=category_slug)
             .select_related('category')
+            .with_primary_image()
             .order_by('-created_at')
         )
     
@@ -100,25 +160,27 @@ class ProductRepository:
             Product.objects
             .filter(is_active=True, product_type=product_type)
             .select_related('category')
+            .with_primary_image()
             .order_by('-created_at')
         )
     
     @staticmethod
     def search(query: str) -> QuerySet[Product]:
-        """Search products by title, description, or features."""
-        return (
+        """
+        Full-text search over Spanish and English titles, descriptions and species.
+        
+        Results are ordered by relevance, newest first on ties.
+        """
+        queryset = (
             Product.objects
-            .filter(
-                is_active=True
-            )
-            .filter(
-                Q(title__icontains=query) |
-                Q(description__icontains=query) |
-                Q(short_description__icontains=query) |
-                Q(species__icontains=query)
-            )
+            .filter(is_active=True)
             .select_related('category')
-            .order_by('-created_at')
+            .with_primary_image()
+        )
+        return (
+            get_search_backend()
+            .search(queryset, query)
+            .order_by('-search_rank', '-created_at')
         )
     
     @staticmethod
@@ -128,24 +190,497 @@ class ProductRepository:
     
     @staticmethod
     def get_retreats() -> QuerySet[Product]:
-        """Get all active retreat products."""
-        return ProductRepository.get_by_type(Product.ProductType.RETREAT)
+        """Get all active retreat (experience) products."""
+        return ProductRepository.get_by_type(Product.ProductType.EXPERIENCE)
+    
+    @staticmethod
+    def get_within_bbox(bbox: BBox) -> QuerySet[Product]:
+        """Get active products located inside a (min_lat, min_lng, max_lat, max_lng) box."""
+        return filter_bbox(
+            ProductRepository.get_all_active(), bbox, 'location_lat', 'location_lng'
+        )
+    
+    @staticmethod
+    def get_nearest(lat: float, lng: float, limit: int, max_radius_km: float) -> list[Product]:
+        """Get the active products nearest to a point, annotated with distance_km."""
+        return nearest(
+            ProductRepository.get_all_active(), lat, lng, limit, max_radius_km,
+            'location_lat', 'location_lng'
+        )
+    
+    @staticmethod
+    def filter_by_keys(queryset: QuerySet[Product], field: str, keys: list) -> QuerySet[Product]:
+        """Restrict a product queryset to the given ids or slugs (one IN query)."""
+        return queryset.filter(**{f'{field}__in': keys})
+    
+    @staticmethod
+    def filter_by_ranges(queryset: QuerySet[Product], min_price=None, max_price=None,
+                         min_rating=None, max_rating=None) -> QuerySet[Product]:
+        """Restrict a product queryset to inclusive price and rating ranges."""
+        bounds = {
+            'price__gte': min_price,
+            'price__lte': max_price,
+            'rating__gte': min_rating,
+            'rating__lte': max_rating,
+        }
+        return queryset.filter(**{lookup: value for lookup, value in bounds.items() if value is not None})
+    
+    @staticmethod
+    def get_facet_rows(queryset: QuerySet[Product]) -> list[dict]:
+        """
+        Count products per combination of facet values in one grouped query.
+        
+        Each row holds category slug/names, product_type, pricing_type,
+        price_bucket, is_featured, is_new and a count.
+        """
+        price_bucket = Case(
+            *[
+                When(price__lt=upper, then=Value(label))
+                for label, _, upper in PRICE_BUCKETS if upper is not None
+            ],
+            default=Value(PRICE_BUCKETS[-1][0]),
+            output_field=CharField(),
+        )
+        return list(
+            queryset
+            .prefetch_related(None)
+            .order_by()
+            .annotate(price_bucket=price_bucket)
+            .values(
+                'category__slug', 'category__name', 'category__name_en',
+                'product_type', 'pricing_type', 'price_bucket',
+                'is_featured', 'is_new',
+            )
+            .annotate(count=Count('id'))
+        )
+    
+    @staticmethod
+    def get_gallery(product_id: int) -> QuerySet[ProductImage]:
+        """Get the gallery images of a product."""
+        return ProductImage.objects.filter(product_id=product_id)
+    
+    @staticmethod
+    def get_updates(product_id: int) -> QuerySet[ProductUpdate]:
+        """Get the timeline updates of a product, newest first."""
+        return ProductUpdate.objects.filter(product_id=product_id)
+    
+    @staticmethod
+    def get_stock_levels(product_ids, lock: bool = False) -> dict[int, dict]:
+        """
+        Get is_active, stock, is_unlimited_stock and held (units under active
+        stock holds) of many products with one query, keyed by id.
+        
+        With lock=True the product rows are locked (in id order) until the
+        surrounding transaction ends.
+        """
+        queryset = Product.objects.filter(id__in=product_ids).annotate(
+            held=StockHoldRepository.held_quantity()
+        )
+        if lock:
+            queryset = queryset.select_for_update().order_by('id')
+        rows = queryset.values('id', 'is_active', 'stock', 'is_unlimited_stock', 'held')
+        return {row['id']: row for row in rows}
     
     @staticmethod
     def decrement_stock(product_id: int, quantity: int = 1) -> bool:
         """
         Decrement product stock by quantity.
         
+        Runs a single conditional UPDATE (stock = stock - quantity WHERE
+        stock >= quantity), so concurrent checkouts cannot oversell.
         Returns True if successful, False if insufficient stock.
         """
-        try:
-            product = Product.objects.get(id=product_id)
-            if product.is_unlimited_stock:
-                return True
-            if product.stock >= quantity:
-                product.stock -= quantity
-                product.save(update_fields=['stock'])
-                return True
-            return False
-        except Product.DoesNotExist:
-            return False
+        updated = (
+            Product.objects
+            .filter(id=product_id, is_unlimited_stock=False, stock__gte=quantity)
+            .update(stock=F('stock') - quantity)
+        )
+        if updated:
+            return True
+        return Product.objects.filter(id=product_id, is_unlimited_stock=True).exists()
+    
+    @staticmethod
+    def increment_stock_many(quantities: dict[int, int]) -> int:
+        """Give stock back to limited-stock products with one UPDATE; returns rows updated."""
+        if not quantities:
+            return 0
+        return (
+            Product.objects
+            .filter(id__in=list(quantities), is_unlimited_stock=False)
+            .update(stock=Case(
+                *[When(id=product_id, then=F('stock') + quantity) for product_id, quantity in quantities.items()],
+                default=F('stock'),
+                output_field=PositiveIntegerField(),
+            ))
+        )
+    
+    @staticmethod
+    def decrement_stock_many(quantities: dict[int, int]) -> list[int]:
+        """
+        Decrement the stock of several products, all or nothing.
+        
+        Every limited-stock product is decremented by one conditional
+        UPDATE; if any of them lacks stock the statement is rolled back.
+        Returns the ids that could not be reserved (empty on success).
+        """
+        levels = ProductRepository.get_stock_levels(list(quantities))
+        missing = [product_id for product_id in quantities if product_id not in levels]
+        if missing:
+            return missing
+        limited = {
+            product_id: quantity
+            for product_id, quantity in quantities.items()
+            if not levels[product_id]['is_unlimited_stock']
+        }
+        if not limited:
+            return []
+        
+        enough_stock = Q()
+        new_stock = []
+        for product_id, quantity in limited.items():
+            enough_stock |= Q(id=product_id, stock__gte=quantity)
+            new_stock.append(When(id=product_id, then=F('stock') - quantity))
+        with transaction.atomic():
+            updated = (
+                Product.objects
+                .filter(enough_stock, is_unlimited_stock=False)
+                .update(stock=Case(*new_stock, default=F('stock'), output_field=PositiveIntegerField()))
+            )
+            if updated == len(limited):
+                return []
+            transaction.set_rollback(True)
+        
+        levels = ProductRepository.get_stock_levels(list(limited))
+        return [
+            product_id
+            for product_id, quantity in limited.items()
+            if product_id not in levels or levels[product_id]['stock'] < quantity
+        ] or list(limited)
+
+
+# SponsorshipUnitSearchSerializer ordering -> order_by() arguments
+UNIT_ORDERINGS = {
+    'price': ('product__price', 'id'),
+    '-price': ('-product__price', '-id'),
+    '-co2_per_year': (F('co2_per_year').desc(nulls_last=True), '-id'),
+    '-created_at': ('-created_at', '-id'),
+    'name': ('name', 'id'),
+}
+
+
+class SponsorshipUnitRepository:
+    """Repository for SponsorshipUnit data access operations."""
+    
+    @staticmethod
+    def get_all_active() -> QuerySet[SponsorshipUnit]:
+        """Get active units of active products, with product and sponsor joined."""
+        return (
+            SponsorshipUnit.objects
+            .filter(is_active=True, product__is_active=True)
+            .select_related('product', 'sponsor')
+        )
+    
+    @staticmethod
+    def get_by_slug(slug: str) -> Optional[SponsorshipUnit]:
+        """Get an active unit by its slug."""
+        return SponsorshipUnitRepository.get_all_active().filter(slug=slug).first()
+    
+    @staticmethod
+    def search(queryset: QuerySet[SponsorshipUnit], q: Optional[str] = None,
+               product_type: Optional[str] = None, status: Optional[str] = None,
+               min_price=None, max_price=None, location: Optional[str] = None,
+               min_rating=None, max_rating=None, is_featured: Optional[bool] = None,
+               ordering: Optional[str] = None) -> QuerySet[SponsorshipUnit]:
+        """Apply SponsorshipUnitSearchSerializer filters (bounds inclusive)."""
+        if q:
+            queryset = queryset.filter(
+                Q(name__icontains=q)
+                | Q(code__icontains=q)
+                | Q(species__icontains=q)
+                | Q(location_name__icontains=q)
+                | Q(product__title__icontains=q)
+            )
+        queryset = SponsorshipUnitRepository._filter_by_product(
+            queryset, product_type, min_price, max_price, min_rating, max_rating
+        )
+        if status:
+            queryset = queryset.filter(status=status)
+        if location:
+            queryset = queryset.filter(
+                Q(location_name__icontains=location) | Q(location_area__icontains=location)
+            )
+        if is_featured is not None:
+            queryset = queryset.filter(is_featured=is_featured)
+        if ordering:
+            queryset = queryset.order_by(*UNIT_ORDERINGS[ordering])
+        return queryset
+    
+    @staticmethod
+    def _filter_by_product(queryset: QuerySet[SponsorshipUnit], product_type: Optional[str],
+                           min_price, max_price, min_rating, max_rating) -> QuerySet[SponsorshipUnit]:
+        """Filter units on the type, price and rating of their product (bounds inclusive)."""
+        if product_type:
+            queryset = queryset.filter(product__product_type=product_type)
+        if min_price is not None:
+            queryset = queryset.filter(product__price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(product__price__lte=max_price)
+        if min_rating is not None:
+            queryset = queryset.filter(product__rating__gte=min_rating)
+        if max_rating is not None:
+            queryset = queryset.filter(product__rating__lte=max_rating)
+        return queryset
+    
+    @staticmethod
+    def get_gallery(unit_id: int) -> QuerySet[UnitImage]:
+        """Get the gallery images of a unit."""
+        return UnitImage.objects.filter(unit_id=unit_id)
+    
+    @staticmethod
+    def get_public_updates(unit_id: int) -> QuerySet[UnitUpdate]:
+        """Get the public timeline updates of a unit."""
+        return UnitUpdate.objects.filter(unit_id=unit_id, is_public=True)
+    
+    @staticmethod
+    def get_map_cells(precision: int) -> QuerySet:
+        """
+        Count located active units per geohash prefix of ``precision`` chars.
+
+        Rows hold ``cell``, ``count``, the coordinate sums ``lat_sum`` /
+        ``lng_sum`` (for centroids) and one ``status_<value>`` count per
+        status. Approximate coordinates only.
+        """
+        statuses = {
+            f'status_{value}': Count('id', filter=Q(status=value))
+            for value in SponsorshipUnit.Status.values
+        }
+        return (
+            SponsorshipUnit.objects
+            .filter(is_active=True, product__is_active=True)
+            .exclude(geohash='')
+            .annotate(cell=Substr('geohash', 1, precision))
+            .values('cell')
+            .annotate(
+                count=Count('id'),
+                lat_sum=Sum(Cast('location_lat_approx', FloatField())),
+                lng_sum=Sum(Cast('location_lng_approx', FloatField())),
+                **statuses,
+            )
+            .order_by('cell')
+        )
+    
+    @staticmethod
+    def get_map_points(bbox: BBox) -> QuerySet:
+        """Get map marker rows of active units inside a bounding box (approximate coordinates)."""
+        queryset = SponsorshipUnit.objects.filter(is_active=True, product__is_active=True)
+        return (
+            filter_bbox(queryset, bbox, 'location_lat_approx', 'location_lng_approx')
+            .values('id', 'code', 'name', 'slug', 'status', 'location_lat_approx', 'location_lng_approx')
+            .order_by('id')
+        )
+    
+    @staticmethod
+    def get_product_ids_with_units(product_ids) -> set[int]:
+        """Get which of the given products have sponsorship units."""
+        return set(
+            SponsorshipUnit.objects.filter(product_id__in=product_ids)
+            .values_list('product_id', flat=True).distinct()
+        )
+    
+    @staticmethod
+    def claim_available(product_id: int, quantity: int, **values) -> list[int]:
+        """
+        Move up to ``quantity`` available units of a product to ``values``.
+        
+        Where the database supports it (PostgreSQL), candidates are read
+        with ``SELECT ... FOR UPDATE SKIP LOCKED``: concurrent buyers get
+        disjoint rows without waiting on each other's locks, and the rows
+        are moved with one bulk UPDATE. Elsewhere (SQLite) each candidate
+        is claimed with an UPDATE conditional on ``status = available``,
+        skipping rows another buyer took first.
+        
+        ``values`` must change ``status``. Call inside a transaction.
+        Returns the ids of the claimed units, lowest first.
+        """
+        available = SponsorshipUnit.objects.filter(
+            product_id=product_id, status=SponsorshipUnit.Status.AVAILABLE, is_active=True
+        ).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            ids = list(
+                available.select_for_update(skip_locked=True).values_list('id', flat=True)[:quantity]
+            )
+            if ids:
+                SponsorshipUnit.objects.filter(id__in=ids).update(**values)
+            return ids
+        
+        claimed = []
+        while len(claimed) < quantity:
+            candidates = list(available.values_list('id', flat=True)[:quantity - len(claimed)])
+            if not candidates:
+                break
+            for unit_id in candidates:
+                if available.filter(id=unit_id).update(**values):
+                    claimed.append(unit_id)
+        return sorted(claimed)
+    
+    @staticmethod
+    def release_for_order(order) -> int:
+        """Make the units an order sponsored available again; returns the count."""
+        return SponsorshipUnit.objects.filter(sponsor_order=order).update(
+            status=SponsorshipUnit.Status.AVAILABLE,
+            sponsor=None,
+            sponsored_at=None,
+            sponsorship_expires_at=None,
+            sponsor_order=None,
+            updated_at=timezone.now(),
+        )
+    
+    @staticmethod
+    def get_by_product(product_id: int) -> QuerySet[SponsorshipUnit]:
+        """Get every unit of a product, active or not, in primary key order."""
+        return SponsorshipUnit.objects.filter(product_id=product_id).order_by('pk')
+    
+    @staticmethod
+    def get_for_export() -> QuerySet[SponsorshipUnit]:
+        """Get active units of active products in primary key order, without annotations."""
+        return SponsorshipUnit.objects.filter(is_active=True, product__is_active=True).order_by('pk')
+
+
+class StockHoldRepository:
+    """Repository for StockHold data access operations."""
+    
+    @staticmethod
+    def held_quantity(outer_ref: str = 'pk') -> Coalesce:
+        """Annotation summing the unexpired active holds of each product."""
+        holds = (
+            StockHold.objects
+            .filter(
+                product=OuterRef(outer_ref),
+                status=StockHold.HoldStatus.ACTIVE,
+                expires_at__gt=timezone.now(),
+            )
+            .order_by()
+            .values('product')
+            .annotate(total=Sum('quantity'))
+            .values('total')
+        )
+        return Coalesce(Subquery(holds[:1]), 0, output_field=IntegerField())
+    
+    @staticmethod
+    def place(order, quantities: dict[int, int], expires_at) -> list[int]:
+        """
+        Hold stock of several products for an order, all or nothing.
+        
+        Replaces the order's unconverted holds. The product rows stay locked
+        while stock minus other active holds is checked and the new holds are
+        written, so concurrent checkouts cannot hold the same units. Returns
+        the ids that are unknown, inactive or short (empty on success).
+        """
+        with transaction.atomic():
+            StockHold.objects.filter(order=order).exclude(status=StockHold.HoldStatus.CONVERTED).delete()
+            levels = ProductRepository.get_stock_levels(list(quantities), lock=True)
+            failed = [
+                product_id
+                for product_id, quantity in quantities.items()
+                if product_id not in levels
+                or not levels[product_id]['is_active']
+                or (
+                    not levels[product_id]['is_unlimited_stock']
+                    and levels[product_id]['stock'] - levels[product_id]['held'] < quantity
+                )
+            ]
+            if failed:
+                transaction.set_rollback(True)
+                return failed
+            StockHold.objects.bulk_create([
+                StockHold(order=order, product_id=product_id, quantity=quantity, expires_at=expires_at)
+                for product_id, quantity in quantities.items()
+                if not levels[product_id]['is_unlimited_stock']
+            ])
+        return []
+    
+    @staticmethod
+    def convert(order) -> tuple[int, list[int]]:
+        """
+        Turn an order's unconverted holds into permanent stock decrements.
+        
+        Holds are converted even if they already expired, since the order
+        was paid. Holds of products whose stock could no longer cover them
+        are left released (a retry converts them if stock came back), so
+        releasing the order only gives back what was taken. Returns the
+        number of holds converted and the ids that could not be covered.
+        """
+        with transaction.atomic():
+            holds = list(
+                StockHold.objects
+                .select_for_update()
+                .filter(order=order)
+                .exclude(status=StockHold.HoldStatus.CONVERTED)
+                .values_list('id', 'product_id', 'quantity')
+            )
+            if not holds:
+                return 0, []
+            quantities = {}
+            for _, product_id, quantity in holds:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+            failed = ProductRepository.decrement_stock_many(quantities)
+            if failed:
+                # Some units were sold after the hold lapsed. The batch is all
+                # or nothing, so decrement product by product: each product is
+                # taken in full or reported as failed
+                failed = [
+                    product_id
+                    for product_id, quantity in quantities.items()
+                    if not ProductRepository.decrement_stock(product_id, quantity)
+                ]
+            converted = [hold_id for hold_id, product_id, _ in holds if product_id not in failed]
+            StockHold.objects.filter(id__in=converted).update(status=StockHold.HoldStatus.CONVERTED)
+            if failed:
+                StockHold.objects.filter(
+                    id__in=[hold_id for hold_id, product_id, _ in holds if product_id in failed]
+                ).update(status=StockHold.HoldStatus.RELEASED)
+        return len(converted), failed
+    
+    @staticmethod
+    def release(order) -> int:
+        """
+        Release all holds of an order.
+        
+        Active holds simply stop counting; converted holds give their units
+        back to stock. Returns the number of units returned to stock.
+        """
+        with transaction.atomic():
+            converted = (
+                StockHold.objects
+                .select_for_update()
+                .filter(order=order, status=StockHold.HoldStatus.CONVERTED)
+                .values_list('product_id', 'quantity')
+            )
+            quantities = {}
+            for product_id, quantity in converted:
+                quantities[product_id] = quantities.get(product_id, 0) + quantity
+            ProductRepository.increment_stock_many(quantities)
+            StockHold.objects.filter(
+                order=order,
+                status__in=[StockHold.HoldStatus.ACTIVE, StockHold.HoldStatus.CONVERTED],
+            ).update(status=StockHold.HoldStatus.RELEASED)
+        return sum(quantities.values())
+    
+    @staticmethod
+    def release_expired(now=None) -> int:
+        """Release every expired active hold with one UPDATE; returns the count."""
+        return StockHold.objects.filter(
+            status=StockHold.HoldStatus.ACTIVE,
+            expires_at__lte=now or timezone.now(),
+        ).update(status=StockHold.HoldStatus.RELEASED)
+    
+    @staticmethod
+    def get_expiry(order):
+        """Earliest expiry of an order's active holds (None without holds)."""
+        return (
+            StockHold.objects
+            .filter(order=order, status=StockHold.HoldStatus.ACTIVE)
+            .order_by('expires_at')
+            .values_list('expires_at', flat=True)
+            .first()
+        )
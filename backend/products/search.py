@@ -0,0 +1,167 @@
+"""
+Full-text search backends for the product catalog.
+
+PostgreSQL keeps a weighted ``search_vector`` generated column (Spanish and
+English fields) with a GIN index; SQLite keeps an FTS5 shadow table that is
+synced on save. Both rank results by relevance and treat the last word of
+the query as a prefix (search-as-you-type: "sol" finds "solar"). Other
+databases fall back to ``icontains`` over the same fields.
+
+The column, table and index are created by migration 0008.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, QuerySet, Value
+from django.db.models.expressions import RawSQL
+
+# Searchable fields and their relative weights (higher is more relevant).
+SEARCH_FIELDS = {
+    'title': 10.0,
+    'title_en': 10.0,
+    'species': 8.0,
+    'short_description': 4.0,
+    'short_description_en': 4.0,
+    'description': 1.0,
+    'description_en': 1.0,
+}
+
+FTS_TABLE = 'products_product_fts'
+
+
+def split_terms(query: str) -> list[str]:
+    """Split user input into plain word terms (no search syntax survives)."""
+    return re.findall(r'\w+', query)
+
+
+class PostgresSearchBackend:
+    """Search the stored, GIN-indexed ``search_vector`` column."""
+
+    TSQUERY = "(to_tsquery('spanish', %s) || to_tsquery('english', %s))"
+
+    def build_tsquery(self, query: str) -> str:
+        """AND the words of the query, the last one as a prefix (``roble & sol:*``)."""
+        terms = split_terms(query)
+        if not terms:
+            return ''
+        return ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        tsquery = self.build_tsquery(query)
+        if not tsquery:
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        table = queryset.model._meta.db_table
+        params = [tsquery, tsquery]
+        return (
+            queryset
+            .filter(RawSQL(
+                f'"{table}"."search_vector" @@ {self.TSQUERY}', params,
+                output_field=BooleanField()
+            ))
+            .annotate(search_rank=RawSQL(
+                f'ts_rank("{table}"."search_vector", {self.TSQUERY})', params,
+                output_field=FloatField()
+            ))
+        )
+
+    def index_product(self, product) -> None:
+        """Nothing to do: the generated column is maintained by PostgreSQL."""
+
+    def remove_product(self, product_id: int) -> None:
+        """Nothing to do: the generated column is removed with the row."""
+
+    def rebuild(self) -> int:
+        """Nothing to rebuild: the generated column is always current."""
+        return 0
+
+
+class SQLiteSearchBackend:
+    """Search the FTS5 shadow table ``products_product_fts``."""
+
+    def build_match(self, query: str) -> str:
+        """Quote each word as an FTS5 term, the last one as a prefix, so input is never parsed as syntax."""
+        terms = [f'"{term}"' for term in split_terms(query)]
+        if terms:
+            terms[-1] += '*'
+        return ' '.join(terms)
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        match = self.build_match(query)
+        if not match:
+            return queryset.none().annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+        table = queryset.model._meta.db_table
+        weights = ', '.join(str(weight) for weight in SEARCH_FIELDS.values())
+        return (
+            queryset
+            .filter(id__in=RawSQL(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+            ))
+            .annotate(search_rank=RawSQL(
+                f'SELECT -bm25({FTS_TABLE}, {weights}) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"', [match],
+                output_field=FloatField()
+            ))
+        )
+
+    def index_product(self, product) -> None:
+        """Replace the FTS row of a product with its current field values."""
+        columns = ', '.join(SEARCH_FIELDS)
+        placeholders = ', '.join(['%s'] * len(SEARCH_FIELDS))
+        values = [getattr(product, field) or '' for field in SEARCH_FIELDS]
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product.id])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES (%s, {placeholders})',
+                [product.id, *values]
+            )
+
+    def remove_product(self, product_id: int) -> None:
+        """Delete the FTS row of a product."""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [product_id])
+
+    def rebuild(self) -> int:
+        """Repopulate the FTS table from the product table."""
+        columns = ', '.join(SEARCH_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, {columns}) '
+                f'SELECT id, {columns} FROM products_product'
+            )
+            return cursor.rowcount
+
+
+class BasicSearchBackend:
+    """Unindexed ``icontains`` search for databases without full-text support."""
+
+    def search(self, queryset: QuerySet, query: str) -> QuerySet:
+        condition = Q()
+        for field in SEARCH_FIELDS:
+            condition |= Q(**{f'{field}__icontains': query})
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    def index_product(self, product) -> None:
+        pass
+
+    def remove_product(self, product_id: int) -> None:
+        pass
+
+    def rebuild(self) -> int:
+        return 0
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend():
+    """Get the search backend for the default database."""
+    return BACKENDS.get(connection.vendor, BasicSearchBackend)()
@@ -5,13 +5,78 @@ These serializers handle data transformation between Python objects and JSON.
 """
 
 from rest_framework import serializers
+from rest_framework.fields import SkipField
+from rest_framework.relations import PKOnlyObject
 import bleach
 
+from .fields import BoundedNestedField, BoundedNextLinkField, BoundedSinceCursorField, bounded_prefetch
+from .fieldsets import SparseFieldsetMixin
 from .models import (
     Category, Product, ProductImage, ProductUpdate,
     SponsorshipUnit, UnitImage, UnitUpdate
 )
 
+# Items embedded in product detail; the rest are linked with a cursor
+DETAIL_GALLERY_LIMIT = 12
+DETAIL_UPDATES_LIMIT = 5
+
+# Model attributes read by computed product fields (see fieldsets.py)
+PRODUCT_FIELD_SOURCES = {
+    'category_name': ('category',),
+    'is_on_sale': ('price', 'compare_at_price'),
+    'discount_percentage': ('price', 'compare_at_price'),
+    'is_in_stock': ('stock', 'is_unlimited_stock'),
+    'primary_image': ('gallery',),
+    'primary_image_srcset': ('gallery',),
+    'price_label': ('pricing_type',),
+    'seo_title': ('meta_title', 'title'),
+    'seo_description': ('meta_description', 'short_description'),
+}
+
+# Model attributes read by computed unit fields (see fieldsets.py)
+UNIT_FIELD_SOURCES = {
+    'primary_image': ('gallery', 'product'),
+    'is_available': ('status',),
+    'sponsor_name': ('sponsor',),
+    'is_user_sponsor': ('sponsor',),
+    'location': (
+        'sponsor', 'location_name', 'location_lat', 'location_lng', 'location_area',
+        'location_lat_approx', 'location_lng_approx', 'location_radius_km',
+    ),
+}
+
+
+# Languages the catalog is served in
+CATALOG_LANGUAGES = ('es', 'en')
+
+
+def get_request_language(request) -> str:
+    """Resolve the catalog language ('en' or 'es') from the Accept-Language header."""
+    if request:
+        accept_lang = request.headers.get('Accept-Language', 'es')
+        if accept_lang.startswith('en'):
+            return 'en'
+    return 'es'
+
+
+def _base_getter(field_name: str, default):
+    """Build a getter returning the base (Spanish) value of a field."""
+    def getter(obj):
+        return getattr(obj, field_name, default)
+    return getter
+
+
+def _english_getter(field_name: str, default):
+    """Build a getter returning the '{field}_en' value, falling back to the base value."""
+    en_field = f'{field_name}_en'
+    
+    def getter(obj):
+        en_value = getattr(obj, en_field, None)
+        if en_value:
+            return en_value
+        return getattr(obj, field_name, default)
+    return getter
+
 
 # i18n Mixin for translated fields
 class TranslatedFieldsMixin:
@@ -20,67 +85,83 @@ class TranslatedFieldsMixin:
     
     For each translatable field (e.g., 'title'), checks if '{field}_en' exists
     and returns the appropriate value based on the request language.
+    
+    Per-language getters are compiled once per serializer class, and the
+    language is resolved once per request (stored in the context as
+    'language'), so each translated field is read exactly once per row.
     """
     
     # Define which fields have translations
     translated_fields = []
+    translated_json_fields = []
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        getters = {'es': {}, 'en': {}}
+        for fields, default in ((cls.translated_fields, ''), (cls.translated_json_fields, [])):
+            for field_name in fields:
+                getters['es'][field_name] = _base_getter(field_name, default)
+                getters['en'][field_name] = _english_getter(field_name, default)
+        cls._translation_getters = getters
     
     def get_language(self):
-        """Get language from request header."""
-        request = self.context.get('request')
-        if request:
-            accept_lang = request.headers.get('Accept-Language', 'es')
-            if accept_lang.startswith('en'):
-                return 'en'
-        return 'es'
+        """Get language from the context, resolving it from the request once."""
+        context = self.context
+        language = context.get('language')
+        if language is None:
+            language = get_request_language(context.get('request'))
+            context['language'] = language
+        return language
     
     def get_translated_value(self, obj, field_name):
         """Get translated value for a field."""
-        lang = self.get_language()
-        
-        if lang == 'en':
-            en_field = f'{field_name}_en'
-            en_value = getattr(obj, en_field, None)
-            if en_value:
-                return en_value
-        
+        if self.get_language() == 'en':
+            return _english_getter(field_name, '')(obj)
         return getattr(obj, field_name, '')
     
     def get_translated_json_value(self, obj, field_name):
         """Get translated value for a JSON field (list)."""
-        lang = self.get_language()
-        
-        if lang == 'en':
-            en_field = f'{field_name}_en'
-            en_value = getattr(obj, en_field, None)
-            if en_value and len(en_value) > 0:
-                return en_value
-        
+        if self.get_language() == 'en':
+            return _english_getter(field_name, [])(obj)
         return getattr(obj, field_name, [])
     
     def to_representation(self, instance):
-        """Override to replace translated fields with correct language."""
-        data = super().to_representation(instance)
+        """
+        Serialize the instance, reading translated fields in the request language.
         
-        # Handle regular text fields
-        for field in self.translated_fields:
-            if field in data:
-                data[field] = self.get_translated_value(instance, field)
+        Mirrors Serializer.to_representation, but translated fields are taken
+        straight from the precompiled getters instead of being rendered by the
+        field and then overwritten.
+        """
+        getters = self._translation_getters[self.get_language()]
+        ret = {}
         
-        # Handle JSON fields (lists)
-        translated_json_fields = getattr(self, 'translated_json_fields', [])
-        for field in translated_json_fields:
-            if field in data:
-                data[field] = self.get_translated_json_value(instance, field)
+        for field in self._readable_fields:
+            field_name = field.field_name
+            getter = getters.get(field_name)
+            if getter is not None:
+                ret[field_name] = getter(instance)
+                continue
+            
+            try:
+                attribute = field.get_attribute(instance)
+            except SkipField:
+                continue
+            
+            check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+            if check_for_none is None:
+                ret[field_name] = None
+            else:
+                ret[field_name] = field.to_representation(attribute)
         
-        return data
+        return ret
 
 
 class CategorySerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
     """Serializer for Category model with i18n support."""
     
     translated_fields = ['name', 'description']
-    product_count = serializers.SerializerMethodField()
+    product_count = serializers.IntegerField(source='active_product_count', read_only=True)
     
     class Meta:
         model = Category
@@ -96,10 +177,6 @@ class CategorySerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
             'product_count',
         ]
         read_only_fields = ['id', 'slug', 'product_count']
-    
-    def get_product_count(self, obj) -> int:
-        """Get the number of active products in this category."""
-        return obj.products.filter(is_active=True).count()
 
 
 class CategoryListSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
@@ -116,12 +193,14 @@ class ProductImageSerializer(serializers.ModelSerializer):
     """Serializer for product gallery images."""
     
     url = serializers.CharField(read_only=True)
+    srcset = serializers.DictField(child=serializers.CharField(), read_only=True)
     
     class Meta:
         model = ProductImage
         fields = [
             'id',
             'url',
+            'srcset',
             'alt_text',
             'caption',
             'is_primary',
@@ -133,6 +212,7 @@ class ProductUpdateSerializer(serializers.ModelSerializer):
     """Serializer for product updates/timeline."""
     
     image_display_url = serializers.CharField(read_only=True)
+    srcset = serializers.DictField(child=serializers.CharField(), read_only=True)
     update_type_display = serializers.CharField(source='get_update_type_display', read_only=True)
     
     class Meta:
@@ -144,6 +224,7 @@ class ProductUpdateSerializer(serializers.ModelSerializer):
             'title',
             'content',
             'image_display_url',
+            'srcset',
             'co2_absorbed',
             'height_cm',
             'is_public',
@@ -151,17 +232,21 @@ class ProductUpdateSerializer(serializers.ModelSerializer):
         ]
 
 
-class ProductListSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
+class ProductListSerializer(SparseFieldsetMixin, TranslatedFieldsMixin, serializers.ModelSerializer):
     """Lightweight serializer for product lists and cards with i18n support."""
     
     translated_fields = ['title', 'short_description']
+    field_sources = PRODUCT_FIELD_SOURCES
     
     category_name = serializers.SerializerMethodField()
     category_slug = serializers.CharField(source='category.slug', read_only=True)
     is_on_sale = serializers.BooleanField(read_only=True)
     discount_percentage = serializers.IntegerField(read_only=True)
     primary_image = serializers.CharField(read_only=True)
+    primary_image_srcset = serializers.DictField(child=serializers.CharField(), read_only=True)
     price_label = serializers.CharField(read_only=True)
+    # Only present on proximity queries (annotated distance)
+    distance_km = serializers.FloatField(read_only=True)
     
     class Meta:
         model = Product
@@ -181,6 +266,7 @@ class ProductListSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
             'category_slug',
             'product_type',
             'primary_image',
+            'primary_image_srcset',
             'rating',
             'reviews_count',
             'is_featured',
@@ -189,6 +275,7 @@ class ProductListSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
             'co2_offset_kg',
             'area_size',
             'duration',
+            'distance_km',
         ]
     
     def get_category_name(self, obj):
@@ -199,16 +286,28 @@ class ProductListSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
         return obj.category.name
 
 
-class ProductDetailSerializer(TranslatedFieldsMixin, serializers.ModelSerializer):
-    """Full serializer for product detail pages with i18n support."""
+class ProductDetailSerializer(SparseFieldsetMixin, TranslatedFieldsMixin, serializers.ModelSerializer):
+    """
+    Full serializer for product detail pages with i18n support.
+    
+    Gallery and updates are capped; gallery_next / updates_next link to
+    the remaining items.
+    """
     
     translated_fields = ['title', 'description', 'short_description', 'purpose', 'impact_description', 'duration']
     # JSON fields that need special handling
     translated_json_fields = ['includes', 'features']
+    field_sources = PRODUCT_FIELD_SOURCES
     
     category = CategoryListSerializer(read_only=True)
-    gallery = ProductImageSerializer(many=True, read_only=True)
-    updates = ProductUpdateSerializer(many=True, read_only=True)
+    gallery = BoundedNestedField(ProductImageSerializer, limit=DETAIL_GALLERY_LIMIT)
+    gallery_next = BoundedNextLinkField(
+        'gallery', limit=DETAIL_GALLERY_LIMIT, url_name='products:product-gallery'
+    )
+    updates = BoundedNestedField(ProductUpdateSerializer, limit=DETAIL_UPDATES_LIMIT)
+    updates_next = BoundedNextLinkField(
+        'updates', limit=DETAIL_UPDATES_LIMIT, url_name='products:product-updates'
+    )
     is_on_sale = serializers.BooleanField(read_only=True)
     discount_percentage = serializers.IntegerField(read_only=True)
     is_in_stock = serializers.BooleanField(read_only=True)
@@ -236,7 +335,9 @@ class ProductDetailSerializer(TranslatedFieldsMixin, serializers.ModelSerializer
             'category',
             'product_type',
             'gallery',
+            'gallery_next',
             'updates',
+            'updates_next',
             'stock',
             'is_in_stock',
             'rating',
@@ -260,6 +361,14 @@ class ProductDetailSerializer(TranslatedFieldsMixin, serializers.ModelSerializer
             'updated_at',
         ]
         read_only_fields = ['id', 'slug', 'created_at', 'updated_at']
+    
+    @staticmethod
+    def get_prefetches() -> list:
+        """Prefetches loading only the embedded gallery and updates items."""
+        return [
+            bounded_prefetch(Product, 'gallery', DETAIL_GALLERY_LIMIT),
+            bounded_prefetch(Product, 'updates', DETAIL_UPDATES_LIMIT),
+        ]
 
 
 class ProductCreateSerializer(serializers.ModelSerializer):
@@ -327,6 +436,20 @@ class ProductSearchSerializer(serializers.Serializer):
         decimal_places=2,
         required=False
     )
+    min_rating = serializers.DecimalField(
+        max_digits=2,
+        decimal_places=1,
+        min_value=0,
+        max_value=5,
+        required=False
+    )
+    max_rating = serializers.DecimalField(
+        max_digits=2,
+        decimal_places=1,
+        min_value=0,
+        max_value=5,
+        required=False
+    )
     is_featured = serializers.BooleanField(required=False)
     ordering = serializers.ChoiceField(
         choices=[
@@ -338,6 +461,124 @@ class ProductSearchSerializer(serializers.Serializer):
         required=False,
         default='-created_at'
     )
+    
+    def validate(self, attrs):
+        for low, high in (('min_price', 'max_price'), ('min_rating', 'max_rating')):
+            if attrs.get(low) is not None and attrs.get(high) is not None and attrs[low] > attrs[high]:
+                raise serializers.ValidationError({low: [f'Must not exceed {high}.']})
+        return attrs
+
+
+class BatchQuerySerializer(serializers.Serializer):
+    """Query parameters for batch product lookups (exactly one of ids / slugs)."""
+    
+    max_items = 200
+    
+    ids = serializers.CharField(required=False)
+    slugs = serializers.CharField(required=False)
+    
+    def _split(self, value: str) -> list[str]:
+        items = [item.strip() for item in value.split(',') if item.strip()]
+        if not items:
+            raise serializers.ValidationError('Provide at least one value.')
+        if len(items) > self.max_items:
+            raise serializers.ValidationError(f'At most {self.max_items} values per request.')
+        return items
+    
+    def validate_ids(self, value: str) -> list[int]:
+        items = self._split(value)
+        try:
+            return [int(item) for item in items]
+        except ValueError:
+            raise serializers.ValidationError('IDs must be integers.')
+    
+    def validate_slugs(self, value: str) -> list[str]:
+        return self._split(value)
+    
+    def validate(self, attrs):
+        if ('ids' in attrs) == ('slugs' in attrs):
+            raise serializers.ValidationError('Provide either ids or slugs.')
+        return attrs
+
+
+class AvailabilityLineSerializer(serializers.Serializer):
+    """One (product_id, quantity) line of a batch availability check."""
+    
+    product_id = serializers.IntegerField(min_value=1)
+    quantity = serializers.IntegerField(min_value=1, default=1)
+
+
+class AvailabilityBatchSerializer(serializers.Serializer):
+    """Request body for batch availability checks."""
+    
+    items = serializers.ListField(
+        child=AvailabilityLineSerializer(),
+        min_length=1,
+        max_length=BatchQuerySerializer.max_items,
+    )
+
+
+class AvailabilityResultSerializer(serializers.Serializer):
+    """Availability of one line (stock is null when unlimited or unknown)."""
+    
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField()
+    is_available = serializers.BooleanField()
+    stock = serializers.IntegerField(allow_null=True)
+
+
+class NearestQuerySerializer(serializers.Serializer):
+    """Query parameters for nearest-N lookups."""
+    
+    lat = serializers.FloatField(min_value=-90, max_value=90)
+    lng = serializers.FloatField(min_value=-180, max_value=180)
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+    max_radius_km = serializers.FloatField(min_value=0.1, max_value=20000, default=500)
+
+
+class BBoxQuerySerializer(serializers.Serializer):
+    """Query parameters for bounding-box lookups (GeoJSON order: west,south,east,north)."""
+    
+    bbox = serializers.CharField()
+    
+    def validate_bbox(self, value: str) -> tuple:
+        """Parse 'min_lng,min_lat,max_lng,max_lat' into (min_lat, min_lng, max_lat, max_lng)."""
+        try:
+            min_lng, min_lat, max_lng, max_lat = (float(part) for part in value.split(','))
+        except ValueError:
+            raise serializers.ValidationError('Expected "min_lng,min_lat,max_lng,max_lat".')
+        if not (-90 <= min_lat <= max_lat <= 90):
+            raise serializers.ValidationError('Latitudes must satisfy -90 <= min_lat <= max_lat <= 90.')
+        if not (-180 <= min_lng <= 180 and -180 <= max_lng <= 180):
+            raise serializers.ValidationError('Longitudes must be between -180 and 180.')
+        return (min_lat, min_lng, max_lat, max_lng)
+
+
+class SuggestQuerySerializer(serializers.Serializer):
+    """Query parameters for search-as-you-type suggestions."""
+    
+    q = serializers.CharField(max_length=100)
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=8)
+    type = serializers.ChoiceField(choices=['product', 'unit'], required=False)
+
+
+class SuggestionSerializer(serializers.Serializer):
+    """One suggestion (category_slug is set for products, code for units)."""
+    
+    type = serializers.CharField()
+    id = serializers.IntegerField()
+    slug = serializers.CharField()
+    label = serializers.CharField()
+    matched = serializers.CharField()
+    category_slug = serializers.CharField(allow_null=True)
+    code = serializers.CharField(allow_null=True)
+
+
+class SuggestResponseSerializer(serializers.Serializer):
+    """Suggestions for a query."""
+    
+    query = serializers.CharField()
+    results = SuggestionSerializer(many=True)
 
 
 # Serializers para SponsorshipUnit
@@ -346,11 +587,12 @@ class UnitImageSerializer(serializers.ModelSerializer):
     """Serializer para imágenes de unidades."""
     
     url = serializers.CharField(read_only=True)
+    srcset = serializers.DictField(child=serializers.CharField(), read_only=True)
     
     class Meta:
         model = UnitImage
         fields = [
-            'id', 'url', 'alt_text', 'caption',
+            'id', 'url', 'srcset', 'alt_text', 'caption',
             'taken_at', 'is_primary', 'display_order'
         ]
 
@@ -359,21 +601,24 @@ class UnitUpdateSerializer(serializers.ModelSerializer):
     """Serializer para actualizaciones de unidades."""
     
     image_display_url = serializers.CharField(read_only=True)
+    srcset = serializers.DictField(child=serializers.CharField(), read_only=True)
     update_type_display = serializers.CharField(source='get_update_type_display', read_only=True)
     
     class Meta:
         model = UnitUpdate
         fields = [
             'id', 'update_type', 'update_type_display',
-            'title', 'content', 'image_display_url',
+            'title', 'content', 'image_display_url', 'srcset',
             'height_cm', 'co2_absorbed', 'health_status',
             'is_public', 'created_at'
         ]
 
 
-class SponsorshipUnitListSerializer(serializers.ModelSerializer):
+class SponsorshipUnitListSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     """Serializer ligero para listados de unidades."""
     
+    field_sources = UNIT_FIELD_SOURCES
+    
     product_title = serializers.CharField(source='product.title', read_only=True)
     product_type = serializers.CharField(source='product.product_type', read_only=True)
     price = serializers.DecimalField(source='product.price', max_digits=10, decimal_places=2, read_only=True)
@@ -394,12 +639,32 @@ class SponsorshipUnitListSerializer(serializers.ModelSerializer):
         ]
 
 
-class SponsorshipUnitDetailSerializer(serializers.ModelSerializer):
-    """Serializer completo para detalle de unidad."""
+class SponsorshipUnitDetailSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    """
+    Serializer completo para detalle de unidad.
+    
+    Galería y actualizaciones (solo públicas) van acotadas; gallery_next /
+    updates_next enlazan al resto. updates_cursor sirve como ?since= para
+    consultar solo las actualizaciones nuevas.
+    """
+    
+    field_sources = UNIT_FIELD_SOURCES
     
     product = ProductListSerializer(read_only=True)
-    gallery = UnitImageSerializer(many=True, read_only=True)
-    updates = UnitUpdateSerializer(many=True, read_only=True)
+    gallery = BoundedNestedField(UnitImageSerializer, limit=DETAIL_GALLERY_LIMIT)
+    gallery_next = BoundedNextLinkField(
+        'gallery', limit=DETAIL_GALLERY_LIMIT, url_name='products:unit-gallery'
+    )
+    updates = BoundedNestedField(
+        UnitUpdateSerializer, limit=DETAIL_UPDATES_LIMIT, filters={'is_public': True}
+    )
+    updates_next = BoundedNextLinkField(
+        'updates', limit=DETAIL_UPDATES_LIMIT, url_name='products:unit-updates',
+        filters={'is_public': True}
+    )
+    updates_cursor = BoundedSinceCursorField(
+        'updates', limit=DETAIL_UPDATES_LIMIT, filters={'is_public': True}
+    )
     primary_image = serializers.CharField(read_only=True)
     is_available = serializers.BooleanField(read_only=True)
     sponsor_name = serializers.SerializerMethodField()
@@ -419,10 +684,19 @@ class SponsorshipUnitDetailSerializer(serializers.ModelSerializer):
             'co2_per_year', 'co2_absorbed_total',
             'sponsor_name', 'sponsored_at', 'sponsorship_expires_at',
             'is_active', 'is_featured',
-            'gallery', 'updates', 'primary_image',
+            'gallery', 'gallery_next', 'updates', 'updates_next', 'updates_cursor', 'primary_image',
             'created_at', 'updated_at'
         ]
     
+    @staticmethod
+    def get_prefetches() -> list:
+        """Prefetches loading only the embedded gallery and public updates."""
+        return [
+            bounded_prefetch(SponsorshipUnit, 'gallery', DETAIL_GALLERY_LIMIT),
+            bounded_prefetch(SponsorshipUnit, 'updates', DETAIL_UPDATES_LIMIT, is_public=True),
+            'product__gallery',
+        ]
+    
     def get_sponsor_name(self, obj) -> str | None:
         """Obtener nombre del padrino (solo primeras letras por privacidad)."""
         if obj.sponsor:
@@ -469,6 +743,20 @@ class SponsorshipUnitSearchSerializer(serializers.Serializer):
         max_digits=10, decimal_places=2, required=False
     )
     location = serializers.CharField(required=False)
+    min_rating = serializers.DecimalField(
+        max_digits=2,
+        decimal_places=1,
+        min_value=0,
+        max_value=5,
+        required=False
+    )
+    max_rating = serializers.DecimalField(
+        max_digits=2,
+        decimal_places=1,
+        min_value=0,
+        max_value=5,
+        required=False
+    )
     is_featured = serializers.BooleanField(required=False)
     ordering = serializers.ChoiceField(
         choices=[
@@ -481,3 +769,41 @@ class SponsorshipUnitSearchSerializer(serializers.Serializer):
         required=False,
         default='-created_at'
     )
+
+
+class UnitMapQuerySerializer(BBoxQuerySerializer):
+    """Parámetros del mapa de unidades: viewport (bbox) y nivel de zoom."""
+    
+    zoom = serializers.IntegerField(min_value=0, max_value=22)
+
+
+class UnitMapClusterSerializer(serializers.Serializer):
+    """Cluster de unidades en una celda geohash (centroide aproximado)."""
+    
+    geohash = serializers.CharField()
+    lat = serializers.FloatField()
+    lng = serializers.FloatField()
+    count = serializers.IntegerField()
+    statuses = serializers.DictField(child=serializers.IntegerField())
+
+
+class UnitMapPointSerializer(serializers.Serializer):
+    """Marcador individual de unidad (ubicación aproximada)."""
+    
+    id = serializers.IntegerField()
+    code = serializers.CharField()
+    name = serializers.CharField()
+    slug = serializers.CharField()
+    status = serializers.CharField()
+    lat = serializers.FloatField()
+    lng = serializers.FloatField()
+
+
+class UnitMapResponseSerializer(serializers.Serializer):
+    """Clusters (zoom bajo) o unidades individuales (zoom alto) de un viewport."""
+    
+    zoom = serializers.IntegerField()
+    precision = serializers.IntegerField(allow_null=True)
+    clusters = UnitMapClusterSerializer(many=True)
+    units = UnitMapPointSerializer(many=True)
+    truncated = serializers.BooleanField()
@@ -5,11 +5,28 @@ This module contains business logic for product-related operations.
 Services orchestrate repositories and apply business rules.
 """
 
+import logging
+from collections import defaultdict
+from datetime import timedelta
 from typing import Optional
-from django.db.models import QuerySet
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, IntegerField, QuerySet, Value, When
+from django.utils import timezone
 
-from .models import Product, Category
-from .repositories import ProductRepository, CategoryRepository
+from ecosystems.services import ecosystem_service
+from .cache import build_home_cache_key, invalidate_catalog, invalidate_units
+from .clusters import get_unit_map
+from .models import Product, Category, SponsorshipUnit, UnitImage, UnitUpdate
+from .projections import ProductListProjection
+from .repositories import (
+    PRICE_BUCKETS, ProductRepository, CategoryRepository, SponsorshipUnitRepository, StockHoldRepository,
+)
+from .serializers import CATALOG_LANGUAGES, CategoryListSerializer
+from .suggest import get_suggest_index, render_suggestion
+
+logger = logging.getLogger(__name__)
 
 
 class ProductService:
@@ -18,6 +35,7 @@ class ProductService:
     def __init__(self):
         self.product_repo = ProductRepository
         self.category_repo = CategoryRepository
+        self.hold_repo = StockHoldRepository
     
     def get_all_products(self) -> QuerySet[Product]:
         """Get all active products."""
@@ -51,29 +69,154 @@ class ProductService:
         """Get all retreat products."""
         return self.product_repo.get_retreats()
     
+    def get_products_within(self, bbox: tuple) -> QuerySet[Product]:
+        """Get active products inside a (min_lat, min_lng, max_lat, max_lng) box."""
+        return self.product_repo.get_within_bbox(bbox)
+    
+    def get_nearest_products(self, lat: float, lng: float, limit: int = 10,
+                             max_radius_km: float = 500) -> list[Product]:
+        """Get the active products nearest to a point, closest first."""
+        return self.product_repo.get_nearest(lat, lng, limit, max_radius_km)
+    
+    def filter_by_ranges(self, queryset: QuerySet[Product], min_price=None, max_price=None,
+                         min_rating=None, max_rating=None) -> QuerySet[Product]:
+        """Restrict products to price and rating ranges (bounds inclusive, None = open)."""
+        return self.product_repo.filter_by_ranges(
+            queryset, min_price, max_price, min_rating, max_rating
+        )
+    
+    def get_products_batch(self, queryset: QuerySet[Product], keys: list,
+                           field: str = 'id') -> tuple[list[Product], list]:
+        """
+        Resolve many products by id or slug with a single query.
+        
+        Returns the products in request order (duplicates removed) and the
+        keys that matched no active product.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {
+            getattr(product, field): product
+            for product in self.product_repo.filter_by_keys(queryset, field, keys)
+        }
+        products = [found[key] for key in keys if key in found]
+        missing = [key for key in keys if key not in found]
+        return products, missing
+    
+    def get_facets(self, queryset: QuerySet[Product], language: str = 'es') -> dict:
+        """
+        Get filter facet counts for a (filtered) product queryset.
+        
+        Rolls the rows of a single grouped query up into per-facet counts.
+        """
+        rows = self.product_repo.get_facet_rows(queryset)
+        facets = {
+            'category': {},
+            'product_type': {},
+            'pricing_type': {},
+            'price': {},
+            'is_featured': {},
+            'is_new': {},
+        }
+        
+        def add(facet, value, count, **extra):
+            entry = facets[facet].setdefault(value, {'value': value, **extra, 'count': 0})
+            entry['count'] += count
+        
+        product_types = dict(Product.ProductType.choices)
+        pricing_types = dict(Product.PricingType.choices)
+        for row in rows:
+            count = row['count']
+            category_name = row['category__name']
+            if language == 'en' and row['category__name_en']:
+                category_name = row['category__name_en']
+            add('category', row['category__slug'], count, label=category_name)
+            add('product_type', row['product_type'], count,
+                label=product_types.get(row['product_type'], row['product_type']))
+            add('pricing_type', row['pricing_type'], count,
+                label=pricing_types.get(row['pricing_type'], row['pricing_type']))
+            add('price', row['price_bucket'], count)
+            add('is_featured', row['is_featured'], count)
+            add('is_new', row['is_new'], count)
+        
+        bucket_order = {label: index for index, (label, _, _) in enumerate(PRICE_BUCKETS)}
+        result = {'total': sum(row['count'] for row in rows)}
+        for facet, entries in facets.items():
+            values = list(entries.values())
+            if facet == 'price':
+                values.sort(key=lambda entry: bucket_order[entry['value']])
+            else:
+                values.sort(key=lambda entry: -entry['count'])
+            result[facet] = values
+        return result
+    
+    def get_product_gallery(self, product: Product) -> QuerySet:
+        """Get all gallery images of a product."""
+        return self.product_repo.get_gallery(product.id)
+    
+    def get_product_updates(self, product: Product) -> QuerySet:
+        """Get the full update timeline of a product."""
+        return self.product_repo.get_updates(product.id)
+    
     def search_products(self, query: str) -> QuerySet[Product]:
         """Search products by query string."""
         if not query or len(query) < 2:
             return Product.objects.none()
         return self.product_repo.search(query)
     
+    def suggest(self, query: str, limit: int = 8, kind: Optional[str] = None,
+                language: str = 'es') -> list[dict]:
+        """
+        Search-as-you-type suggestions from the in-memory prefix index.
+        
+        Only rebuilds from the database when the catalog changed in another
+        process since the last lookup.
+        """
+        index = get_suggest_index()
+        return [
+            render_suggestion(payload, matched, language)
+            for payload, matched in index.search(query, limit, kind)
+        ]
+    
     def check_availability(self, product_id: int, quantity: int = 1) -> bool:
         """
         Check if a product is available in the requested quantity.
         
         Returns True if product is available, False otherwise.
         """
-        product = self.product_repo.get_by_id(product_id)
-        if not product:
-            return False
-        
-        if not product.is_active:
-            return False
+        return self.check_availability_batch([(product_id, quantity)])[0]['is_available']
+    
+    def check_availability_batch(self, lines: list[tuple[int, int]]) -> list[dict]:
+        """
+        Check many (product_id, quantity) lines with a single query.
         
-        if product.is_unlimited_stock:
-            return True
+        Lines for the same product are checked against their combined
+        quantity, and units under other checkouts' active holds are not
+        available. Returns, in line order, dicts with product_id, quantity,
+        is_available and stock (available units; None when unlimited or the
+        product is unknown or inactive).
+        """
+        demand = defaultdict(int)
+        for product_id, quantity in lines:
+            demand[product_id] += quantity
+        levels = self.product_repo.get_stock_levels(list(demand))
         
-        return product.stock >= quantity
+        results = []
+        for product_id, quantity in lines:
+            level = levels.get(product_id)
+            if level is None or not level['is_active']:
+                is_available, stock = False, None
+            elif level['is_unlimited_stock']:
+                is_available, stock = True, None
+            else:
+                stock = max(level['stock'] - level['held'], 0)
+                is_available = stock >= demand[product_id]
+            results.append({
+                'product_id': product_id,
+                'quantity': quantity,
+                'is_available': is_available,
+                'stock': stock,
+            })
+        return results
     
     def reserve_stock(self, product_id: int, quantity: int = 1) -> bool:
         """
@@ -81,7 +224,67 @@ class ProductService:
         
         Returns True if successful, False if insufficient stock.
         """
-        return self.product_repo.decrement_stock(product_id, quantity)
+        reserved = self.product_repo.decrement_stock(product_id, quantity)
+        if reserved:
+            # update() bypasses the post_save catalog invalidation
+            invalidate_catalog()
+        return reserved
+    
+    def reserve_stock_many(self, lines: list[tuple[int, int]]) -> list[int]:
+        """
+        Reserve stock for many (product_id, quantity) lines, all or nothing.
+        
+        Lines for the same product are combined. Returns the ids of the
+        products that lacked stock (empty when everything was reserved).
+        """
+        demand = defaultdict(int)
+        for product_id, quantity in lines:
+            demand[product_id] += quantity
+        failed = self.product_repo.decrement_stock_many(dict(demand))
+        if not failed:
+            invalidate_catalog()
+        return failed
+    
+    def hold_stock(self, order, lines: list[tuple[int, int]]) -> list[int]:
+        """
+        Hold stock for an order's (product_id, quantity) lines for STOCK_HOLD_TTL.
+        
+        Replaces the order's previous holds. Returns the ids of the products
+        that are unavailable (empty when everything was held).
+        """
+        demand = defaultdict(int)
+        for product_id, quantity in lines:
+            demand[product_id] += quantity
+        expires_at = timezone.now() + timedelta(seconds=settings.STOCK_HOLD_TTL)
+        return self.hold_repo.place(order, dict(demand), expires_at)
+    
+    def convert_holds(self, order) -> list[int]:
+        """
+        Permanently decrement the stock held for a paid order.
+        
+        Returns the ids whose stock could not cover an expired hold.
+        """
+        converted, failed = self.hold_repo.convert(order)
+        if converted:
+            invalidate_catalog()
+        if failed:
+            logger.warning('Order %s was paid after its hold lapsed; short stock for products %s', order.pk, failed)
+        return failed
+    
+    def release_holds(self, order) -> int:
+        """Release an order's holds, returning converted units to stock."""
+        restored = self.hold_repo.release(order)
+        if restored:
+            invalidate_catalog()
+        return restored
+    
+    def release_expired_holds(self) -> int:
+        """Mark every expired hold as released; returns the count."""
+        return self.hold_repo.release_expired()
+    
+    def get_hold_expiry(self, order):
+        """When an order's stock holds expire (None without holds)."""
+        return self.hold_repo.get_expiry(order)
 
 
 class CategoryService:
@@ -113,8 +316,161 @@ class CategoryService:
             'category': category,
             'products': products
         }
+    
+    def rebuild_product_counts(self) -> int:
+        """Rebuild the denormalized active product counts of all categories."""
+        return self.category_repo.rebuild_active_product_counts()
+
+
+class SponsorshipUnitService:
+    """Service for sponsorship unit business logic."""
+    
+    def __init__(self):
+        self.unit_repo = SponsorshipUnitRepository
+    
+    def get_units(self) -> QuerySet[SponsorshipUnit]:
+        """Get active units of active products, with product and sponsor joined."""
+        return self.unit_repo.get_all_active()
+    
+    def get_unit_by_slug(self, slug: str) -> Optional[SponsorshipUnit]:
+        """Get an active unit by its slug."""
+        return self.unit_repo.get_by_slug(slug)
+    
+    def search_units(self, queryset: QuerySet[SponsorshipUnit], **params) -> QuerySet[SponsorshipUnit]:
+        """
+        Filter units with validated SponsorshipUnitSearchSerializer params.
+        
+        With a query and no explicit ordering, exact code matches come
+        first, then names starting with the query.
+        """
+        queryset = self.unit_repo.search(queryset, **params)
+        query = params.get('q')
+        if query and not params.get('ordering'):
+            queryset = queryset.annotate(search_rank=Case(
+                When(code__iexact=query, then=Value(2)),
+                When(name__istartswith=query, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            )).order_by('-search_rank', '-created_at', '-id')
+        return queryset
+    
+    def get_unit_gallery(self, unit: SponsorshipUnit) -> QuerySet[UnitImage]:
+        """Get all gallery images of a unit."""
+        return self.unit_repo.get_gallery(unit.id)
+    
+    def get_unit_updates(self, unit: SponsorshipUnit) -> QuerySet[UnitUpdate]:
+        """Get the public update timeline of a unit."""
+        return self.unit_repo.get_public_updates(unit.id)
+    
+    def get_product_ids_with_units(self, product_ids) -> set[int]:
+        """Get which of the given products are sold as sponsorship units."""
+        return self.unit_repo.get_product_ids_with_units(product_ids)
+    
+    def allocate_units(self, product_id: int, quantity: int, sponsor=None,
+                       status: str = SponsorshipUnit.Status.SPONSORED,
+                       expires_at=None, partial: bool = False, order=None) -> list[int]:
+        """
+        Claim available units of a product for a buyer in one transaction.
+        
+        Claimed units move to ``status`` (SPONSORED or RESERVED) with the
+        sponsor set; sponsored units also get ``sponsored_at`` and
+        ``expires_at``, and remember ``order`` so cancelling it frees them. Concurrent buyers never wait on each other's rows
+        (see SponsorshipUnitRepository.claim_available).
+        
+        All or nothing unless ``partial``. Returns the claimed unit ids
+        (empty when none were claimed).
+        """
+        now = timezone.now()
+        values = {'status': status, 'sponsor': sponsor, 'updated_at': now}
+        if status == SponsorshipUnit.Status.SPONSORED:
+            values.update(sponsored_at=now, sponsorship_expires_at=expires_at, sponsor_order=order)
+        with transaction.atomic():
+            unit_ids = self.unit_repo.claim_available(product_id, quantity, **values)
+            if len(unit_ids) < quantity and not partial:
+                transaction.set_rollback(True)
+                return []
+        if unit_ids:
+            # Bulk updates skip post_save
+            invalidate_units()
+        return unit_ids
+    
+    def release_order_units(self, order) -> int:
+        """Make the units sponsored through an order available again."""
+        released = self.unit_repo.release_for_order(order)
+        if released:
+            # Bulk updates skip post_save
+            invalidate_units()
+        return released
+    
+    def get_map(self, bbox: tuple, zoom: int) -> dict:
+        """Get the clusters or unit markers of a (min_lat, min_lng, max_lat, max_lng) viewport."""
+        return get_unit_map(bbox, zoom)
+
+
+class HomeService:
+    """
+    Service assembling the homepage bundle.
+    
+    The bundle holds featured products, new arrivals, categories and the
+    community forest stats, cached as one payload per language.
+    """
+    
+    featured_limit = 8
+    new_arrivals_limit = 8
+    
+    def __init__(self):
+        self.product_repo = ProductRepository
+        self.category_repo = CategoryRepository
+    
+    def build_bundle(self, language: str) -> dict:
+        """
+        Build the homepage bundle for a language.
+        
+        Costs four queries: one per product section (values() projection),
+        one for categories and one aggregate for the forest stats.
+        """
+        projection = ProductListProjection(context={'language': language})
+        categories = CategoryListSerializer(
+            self.category_repo.get_all_active(),
+            many=True,
+            context={'language': language},
+        )
+        return {
+            'featured': projection.render(
+                projection.values(self.product_repo.get_featured(self.featured_limit))
+            ),
+            'new_arrivals': projection.render(
+                projection.values(self.product_repo.get_new_arrivals(self.new_arrivals_limit))
+            ),
+            'categories': categories.data,
+            'forest_stats': ecosystem_service.get_global_forest_stats(),
+        }
+    
+    def get_bundle(self, language: str) -> tuple[dict, bool]:
+        """
+        Get the cached homepage bundle, building it on a miss.
+        
+        Returns the bundle and whether it came from the cache.
+        """
+        key = build_home_cache_key(language)
+        bundle = cache.get(key)
+        if bundle is not None:
+            return bundle, True
+        bundle = self.build_bundle(language)
+        cache.set(key, bundle, timeout=settings.HOME_CACHE_TIMEOUT)
+        return bundle, False
+    
+    def precompute(self) -> None:
+        """Build and cache the bundle for every catalog language."""
+        bundles = {
+            build_home_cache_key(language): self.build_bundle(language)
+            for language in CATALOG_LANGUAGES
+        }
+        cache.set_many(bundles, timeout=settings.HOME_CACHE_TIMEOUT)
 
 
 # Singleton instances for convenience
 product_service = ProductService()
 category_service = CategoryService()
+unit_service = SponsorshipUnitService()
+home_service = HomeService()
@@ -0,0 +1,145 @@
+"""
+Signal handlers for the products app.
+
+Keeps derived catalog data in sync when products, categories, images or
+updates are created, edited or deleted (typically from the admin).
+"""
+
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_catalog, invalidate_units
+from .clusters import warm_cluster_layers
+from .images import needs_variants, refresh_variants, run_in_background
+from .models import Category, Product, ProductImage, ProductUpdate, SponsorshipUnit, UnitImage, UnitUpdate
+from .repositories import CategoryRepository
+from .search import get_search_backend
+from .services import home_service
+from .suggest import index_product, index_unit, invalidate_suggestions, remove_document
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=ProductImage)
+@receiver([post_save, post_delete], sender=ProductUpdate)
+def invalidate_catalog_cache(sender, **kwargs) -> None:
+    """Bump the catalog version so cached responses are rebuilt."""
+    invalidate_catalog()
+    if settings.HOME_PRECOMPUTE and not kwargs.get('raw', False):
+        # Runs after the post-commit version bump registered above
+        transaction.on_commit(home_service.precompute)
+
+
+@receiver([post_save, post_delete], sender=SponsorshipUnit)
+def invalidate_units_cache(sender, **kwargs) -> None:
+    """Bump the units version so cached unit data (sitemaps, map clusters) is rebuilt."""
+    invalidate_units()
+    if settings.UNIT_MAP_PRECOMPUTE and not kwargs.get('raw', False):
+        # Runs after the post-commit version bump registered above
+        transaction.on_commit(warm_cluster_layers)
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_search(sender, instance, **kwargs) -> None:
+    """Keep the full-text index row of a product current."""
+    get_search_backend().index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_product_from_search(sender, instance, **kwargs) -> None:
+    """Drop the full-text index row of a deleted product."""
+    get_search_backend().remove_product(instance.id)
+
+
+@receiver(post_save, sender=Product)
+def index_product_for_suggestions(sender, instance, **kwargs) -> None:
+    """Update the in-memory suggestion index once the save commits."""
+    transaction.on_commit(partial(index_product, instance))
+
+
+@receiver(post_save, sender=SponsorshipUnit)
+def index_unit_for_suggestions(sender, instance, **kwargs) -> None:
+    """Update the in-memory suggestion index once the save commits."""
+    transaction.on_commit(partial(index_unit, instance))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=SponsorshipUnit)
+def remove_from_suggestions(sender, instance, **kwargs) -> None:
+    """Drop a deleted product or unit from the suggestion index."""
+    kind = 'product' if sender is Product else 'unit'
+    transaction.on_commit(partial(remove_document, kind, instance.pk))
+
+
+@receiver(post_save, sender=Category)
+def refresh_suggestion_categories(sender, **kwargs) -> None:
+    """Suggestions carry category slugs: rebuild them after a category edit."""
+    transaction.on_commit(invalidate_suggestions)
+
+
+def _counted_category_id(category_id, is_active):
+    """Category whose active product count includes a product in this state."""
+    return category_id if is_active else None
+
+
+@receiver(pre_save, sender=Product)
+def remember_counted_category(sender, instance, raw=False, **kwargs) -> None:
+    """Remember which category counted the product before this save."""
+    if raw or instance.pk is None:
+        instance._counted_category_id = None
+        return
+    previous = (
+        Product.objects.filter(pk=instance.pk)
+        .values('category_id', 'is_active')
+        .first()
+    )
+    instance._counted_category_id = (
+        _counted_category_id(previous['category_id'], previous['is_active'])
+        if previous else None
+    )
+
+
+@receiver(post_save, sender=Product)
+def update_category_count_on_save(sender, instance, raw=False, **kwargs) -> None:
+    """Move the product between category counts on create, (de)activation or recategorization."""
+    if raw:
+        return
+    before = getattr(instance, '_counted_category_id', None)
+    after = _counted_category_id(instance.category_id, instance.is_active)
+    if before == after:
+        return
+    with transaction.atomic():
+        if before is not None:
+            CategoryRepository.adjust_active_product_count(before, -1)
+        if after is not None:
+            CategoryRepository.adjust_active_product_count(after, 1)
+    instance._counted_category_id = after
+
+
+@receiver(post_delete, sender=Product)
+def update_category_count_on_delete(sender, instance, **kwargs) -> None:
+    """Drop a deleted active product from its category count."""
+    if instance.is_active:
+        CategoryRepository.adjust_active_product_count(instance.category_id, -1)
+
+
+def generate_image_variants(model, pk) -> None:
+    """Generate the resized variants of a stored image (background task)."""
+    instance = model.objects.filter(pk=pk).first()
+    if instance is not None and refresh_variants(instance):
+        invalidate_catalog()
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_save, sender=ProductUpdate)
+@receiver(post_save, sender=UnitImage)
+@receiver(post_save, sender=UnitUpdate)
+def schedule_image_variants(sender, instance, raw=False, **kwargs) -> None:
+    """Queue variant generation once a new upload has been committed."""
+    if raw or not needs_variants(instance):
+        return
+    transaction.on_commit(partial(run_in_background, generate_image_variants, sender, instance.pk))
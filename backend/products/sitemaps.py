@@ -0,0 +1,134 @@
+"""
+XML sitemaps for the public pages of the frontend.
+
+``/sitemap.xml`` is a sitemap index pointing at shards of
+SITEMAP_SHARD_SIZE URLs (``/sitemaps/products-1.xml``, ...). Shards are
+generated from slugs and ``updated_at`` with chunked iteration and
+streamed to the client; the first shard also lists the static pages. The
+finished XML is cached under the catalog version, so crawlers keep
+hitting the cached copy until a product or category changes.
+
+Sponsorship units get a section once the frontend has a page for them.
+"""
+
+from collections.abc import Iterator
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .cache import get_catalog_version
+from .repositories import ProductRepository
+
+# URLs per shard (the protocol allows 50,000; smaller shards keep each
+# cached body well under common cache value limits)
+SITEMAP_SHARD_SIZE = 5000
+SITEMAP_CHUNK_SIZE = 2000
+
+SITEMAP_CONTENT_TYPE = 'application/xml; charset=utf-8'
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+# Frontend pages not backed by a catalog row, listed in the first shard
+SITEMAP_STATIC_PATHS = ('/', '/welcome', '/products')
+
+
+def _product_rows():
+    return ProductRepository.get_for_export().values_list('slug', 'category__slug', 'updated_at')
+
+
+# Section -> (rows in stable order, page path from a row, version getter)
+SITEMAP_SECTIONS = {
+    'products': (
+        _product_rows,
+        lambda row: f'/products/{row[1]}/{row[0]}',
+        get_catalog_version,
+    ),
+}
+
+
+def _absolute(path: str) -> str:
+    return escape(settings.SITE_URL.rstrip('/') + path)
+
+
+def _lastmod(value) -> str:
+    return value.isoformat(timespec='seconds') if value else ''
+
+
+def shard_count(section: str) -> tuple[int, object]:
+    """Number of shards of a section and its latest ``updated_at`` (one query)."""
+    rows, _, _ = SITEMAP_SECTIONS[section]
+    stats = rows().order_by().aggregate(total=Count('pk'), last_modified=Max('updated_at'))
+    return -(-stats['total'] // SITEMAP_SHARD_SIZE), stats['last_modified']
+
+
+def iter_index() -> Iterator[str]:
+    """Stream the sitemap index."""
+    yield XML_HEADER + f'<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    for section in SITEMAP_SECTIONS:
+        shards, last_modified = shard_count(section)
+        for number in range(1, shards + 1):
+            yield (
+                f'<sitemap><loc>{_absolute(f"/sitemaps/{section}-{number}.xml")}</loc>'
+                f'<lastmod>{_lastmod(last_modified)}</lastmod></sitemap>\n'
+            )
+    yield '</sitemapindex>\n'
+
+
+def shard_exists(section: str, number: int) -> bool:
+    """Whether a shard has any URLs (shard 1 always exists)."""
+    rows, _, _ = SITEMAP_SECTIONS[section]
+    start = (number - 1) * SITEMAP_SHARD_SIZE
+    return number == 1 or rows()[start:start + 1].exists()
+
+
+def iter_shard(section: str, number: int) -> Iterator[str]:
+    """Stream one shard of a section (``number`` starts at 1)."""
+    rows, page_path, _ = SITEMAP_SECTIONS[section]
+    start = (number - 1) * SITEMAP_SHARD_SIZE
+    yield XML_HEADER + f'<urlset xmlns="{SITEMAP_NS}">\n'
+    batch = []
+    if number == 1 and section == next(iter(SITEMAP_SECTIONS)):
+        batch.extend(f'<url><loc>{_absolute(path)}</loc></url>\n' for path in SITEMAP_STATIC_PATHS)
+    for row in rows()[start:start + SITEMAP_SHARD_SIZE].iterator(chunk_size=SITEMAP_CHUNK_SIZE):
+        batch.append(
+            f'<url><loc>{_absolute(page_path(row))}</loc>'
+            f'<lastmod>{_lastmod(row[-1])}</lastmod></url>\n'
+        )
+        if len(batch) >= SITEMAP_CHUNK_SIZE:
+            yield ''.join(batch)
+            batch = []
+    yield ''.join(batch) + '</urlset>\n'
+
+
+def index_cache_key() -> str:
+    return f'sitemap:v{get_catalog_version()}:index'
+
+
+def shard_cache_key(section: str, number: int) -> str:
+    _, _, get_version = SITEMAP_SECTIONS[section]
+    return f'sitemap:v{get_version()}:{section}:{number}'
+
+
+def cache_while_streaming(key: str, chunks: Iterator[str]) -> Iterator[str]:
+    """Yield chunks and store the full body once the stream completes."""
+    parts = []
+    for chunk in chunks:
+        parts.append(chunk)
+        yield chunk
+    cache.set(key, ''.join(parts), timeout=settings.CATALOG_CACHE_TIMEOUT)
+
+
+def warm_sitemaps() -> int:
+    """Build and cache the index and every shard; returns the number of files."""
+    files = 1
+    for _ in cache_while_streaming(index_cache_key(), iter_index()):
+        pass
+    for section in SITEMAP_SECTIONS:
+        shards, _ = shard_count(section)
+        for number in range(1, max(shards, 1) + 1):
+            for _ in cache_while_streaming(shard_cache_key(section, number), iter_shard(section, number)):
+                pass
+            files += 1
+    return files
@@ -0,0 +1,305 @@
+"""
+In-memory prefix index for search-as-you-type suggestions.
+
+Each worker process keeps one sorted list of index keys built from product
+titles (Spanish and English), species and location names, and from
+sponsorship unit names, codes, species and location names. Keys are
+case- and accent-folded and there is one key per word start, so "nat"
+finds "Roble Nativo" and "001" finds "TREE-001". A lookup is a bisect plus
+a short scan of the matching range and never touches the database.
+
+Saves and deletes are published once the transaction commits (see
+signals.py): the change is stored in the cache under a newly bumped shared
+version and applied to the index of the process that made it. Other
+processes read the shared version at most every SUGGEST_VERSION_TTL
+seconds and replay the changes they missed; they rebuild from the
+database only when some change is no longer in the cache, or after
+invalidate_suggestions().
+"""
+
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.db.models import F
+
+from .cache import bump_suggest_version, get_suggest_version
+from .repositories import ProductRepository, SponsorshipUnitRepository
+
+SUGGEST_KINDS = ('product', 'unit')
+
+# Indexed text fields of each kind, in match-preference order
+PRODUCT_FIELDS = ('title', 'title_en', 'species', 'location_name')
+UNIT_FIELDS = ('name', 'code', 'species', 'location_name')
+
+# Index keys scanned per lookup; bounds the work for one-letter prefixes
+SUGGEST_SCAN_LIMIT = 256
+
+# Seconds between reads of the shared version by one process
+SUGGEST_VERSION_TTL = 2
+# Published changes are kept this long; a process further behind rebuilds
+SUGGEST_CHANGE_TIMEOUT = 600
+# A process more changes behind than this rebuilds instead of replaying
+SUGGEST_MAX_CHANGES = 500
+
+_WORD = re.compile(r'\w+')
+
+
+def normalize(text: str) -> str:
+    """Casefold, strip accents and collapse whitespace."""
+    decomposed = unicodedata.normalize('NFKD', text.casefold())
+    return ' '.join(''.join(char for char in decomposed if not unicodedata.combining(char)).split())
+
+
+def _product_document(row: dict) -> tuple[dict, tuple]:
+    payload = {
+        'type': 'product',
+        'id': row['id'],
+        'slug': row['slug'],
+        'title': row['title'],
+        'title_en': row['title_en'],
+        'category_slug': row['category_slug'],
+        'code': None,
+    }
+    return payload, tuple(row[field] for field in PRODUCT_FIELDS)
+
+
+def _unit_document(row: dict) -> tuple[dict, tuple]:
+    payload = {
+        'type': 'unit',
+        'id': row['id'],
+        'slug': row['slug'],
+        'title': row['name'],
+        'title_en': '',
+        'category_slug': None,
+        'code': row['code'],
+    }
+    return payload, tuple(row[field] for field in UNIT_FIELDS)
+
+
+def _index_keys(kind: str, pk: int, texts: tuple) -> list[tuple]:
+    """Keys of a document: (folded text from a word start, word position, kind, pk, field)."""
+    keys = []
+    for field_index, text in enumerate(texts):
+        normalized = normalize(text or '')
+        for position, word in enumerate(_WORD.finditer(normalized)):
+            keys.append((normalized[word.start():], position, kind, pk, field_index))
+    return keys
+
+
+class SuggestIndex:
+    """Sorted-array prefix index of one process."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: list[tuple] = []
+        self._documents: dict[tuple, tuple] = {}
+        self.version = None
+        # time.monotonic() of the last shared version check
+        self.checked_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def reset(self) -> None:
+        """Drop everything; the next lookup rebuilds from the database."""
+        with self._lock:
+            self._keys = []
+            self._documents = {}
+            self.version = None
+            self.checked_at = 0.0
+
+    def load(self, documents, version) -> None:
+        """Replace the index with (kind, pk, payload, texts) documents."""
+        keys = []
+        indexed = {}
+        for kind, pk, payload, texts in documents:
+            document_keys = _index_keys(kind, pk, texts)
+            keys.extend(document_keys)
+            indexed[(kind, pk)] = (payload, texts, document_keys)
+        keys.sort()
+        with self._lock:
+            self._keys = keys
+            self._documents = indexed
+            self.version = version
+
+    def put(self, kind: str, pk: int, payload: dict, texts: tuple) -> None:
+        """Add or replace one document."""
+        with self._lock:
+            self._discard(kind, pk)
+            document_keys = _index_keys(kind, pk, texts)
+            for key in document_keys:
+                insort(self._keys, key)
+            self._documents[(kind, pk)] = (payload, texts, document_keys)
+
+    def remove(self, kind: str, pk: int) -> None:
+        """Remove one document if present."""
+        with self._lock:
+            self._discard(kind, pk)
+
+    def apply(self, changes, since, version) -> bool:
+        """
+        Replay published changes on top of version ``since``.
+
+        Each change is a list of (kind, pk, payload, texts) documents; a
+        None payload removes the document. Returns False, leaving the index
+        as it is, when the index is no longer at ``since``.
+        """
+        with self._lock:
+            if self.version != since:
+                return False
+            for change in changes:
+                for kind, pk, payload, texts in change:
+                    if payload is None:
+                        self._discard(kind, pk)
+                    else:
+                        self.put(kind, pk, payload, texts)
+            self.version = version
+        return True
+
+    def _discard(self, kind: str, pk: int) -> None:
+        document = self._documents.pop((kind, pk), None)
+        if document is None:
+            return
+        for key in document[2]:
+            index = bisect_left(self._keys, key)
+            if index < len(self._keys) and self._keys[index] == key:
+                del self._keys[index]
+
+    def search(self, query: str, limit: int = 8, kind: str | None = None) -> list[tuple[dict, str]]:
+        """
+        Documents with a word starting with ``query``, best first.
+
+        Matches at the start of a text rank before matches on later words,
+        then titles/names before other fields, then shorter texts first.
+        Returns (payload, matched text) pairs.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        best = {}
+        with self._lock:
+            keys = self._keys
+            start = bisect_left(keys, (prefix,))
+            for key in keys[start:start + SUGGEST_SCAN_LIMIT]:
+                text, position, key_kind, pk, field_index = key
+                if not text.startswith(prefix):
+                    break
+                if kind and key_kind != kind:
+                    continue
+                rank = (position, field_index, len(text))
+                document_id = (key_kind, pk)
+                if document_id not in best or rank < best[document_id][0]:
+                    best[document_id] = (rank, field_index)
+            ranked = sorted(best.items(), key=lambda item: item[1][0])[:limit]
+            return [
+                (self._documents[document_id][0], self._documents[document_id][1][field_index])
+                for document_id, (_, field_index) in ranked
+            ]
+
+
+suggest_index = SuggestIndex()
+
+
+def build_documents():
+    """Read every active product and unit as index documents (two queries)."""
+    products = ProductRepository.get_for_export().values(
+        'id', 'slug', *PRODUCT_FIELDS, category_slug=F('category__slug')
+    )
+    for row in products.iterator():
+        payload, texts = _product_document(row)
+        yield 'product', row['id'], payload, texts
+    units = SponsorshipUnitRepository.get_for_export().values('id', 'slug', *UNIT_FIELDS)
+    for row in units.iterator():
+        payload, texts = _unit_document(row)
+        yield 'unit', row['id'], payload, texts
+
+
+def _change_key(version: int) -> str:
+    return f'suggest:change:{version}'
+
+
+def _catch_up(version: int) -> bool:
+    """Replay the published changes up to ``version``; False if any is missing."""
+    since = suggest_index.version
+    if since is None or not 0 <= version - since <= SUGGEST_MAX_CHANGES:
+        return False
+    keys = [_change_key(number) for number in range(since + 1, version + 1)]
+    changes = cache.get_many(keys) if keys else {}
+    if len(changes) < len(keys):
+        return False
+    return suggest_index.apply([changes[key] for key in keys], since, version)
+
+
+def get_suggest_index() -> SuggestIndex:
+    """The process index, caught up with other processes' changes first."""
+    now = time.monotonic()
+    if suggest_index.version is None or now - suggest_index.checked_at >= SUGGEST_VERSION_TTL:
+        version = get_suggest_version()
+        if not _catch_up(version):
+            suggest_index.load(build_documents(), version)
+        suggest_index.checked_at = now
+    return suggest_index
+
+
+def _apply(change: list[tuple]) -> None:
+    """Publish a change for other processes and apply it locally."""
+    version = bump_suggest_version()
+    cache.set(_change_key(version), change, timeout=SUGGEST_CHANGE_TIMEOUT)
+    if suggest_index.version is not None and not _catch_up(version):
+        # A change in between is missing: rebuild on the next lookup
+        suggest_index.reset()
+
+
+def index_product(product) -> None:
+    """Add, replace or drop a product and its units after it was saved."""
+    if product.is_active:
+        row = {field: getattr(product, field) for field in ('id', 'slug', *PRODUCT_FIELDS)}
+        row['category_slug'] = product.category.slug if product.category_id else None
+        change = [('product', product.pk, *_product_document(row))]
+    else:
+        change = [('product', product.pk, None, None)]
+    # Units are only suggested while their product is active
+    units = SponsorshipUnitRepository.get_by_product(product.pk).values('id', 'slug', 'is_active', *UNIT_FIELDS)
+    for row in units:
+        if product.is_active and row['is_active']:
+            change.append(('unit', row['id'], *_unit_document(row)))
+        else:
+            change.append(('unit', row['id'], None, None))
+    _apply(change)
+
+
+def index_unit(unit) -> None:
+    """Add, replace or drop a sponsorship unit after it was saved."""
+    if not unit.is_active or not unit.product.is_active:
+        return remove_document('unit', unit.pk)
+    row = {field: getattr(unit, field) for field in ('id', 'slug', *UNIT_FIELDS)}
+    _apply([('unit', unit.pk, *_unit_document(row))])
+
+
+def remove_document(kind: str, pk: int) -> None:
+    """Drop a product or unit from the index."""
+    _apply([(kind, pk, None, None)])
+
+
+def invalidate_suggestions() -> None:
+    """Make every process rebuild (e.g. after a category slug change)."""
+    bump_suggest_version()
+    suggest_index.reset()
+
+
+def render_suggestion(payload: dict, matched: str, language: str) -> dict:
+    """Public JSON of a suggestion in the request language."""
+    label = (payload['title_en'] or payload['title']) if language == 'en' else payload['title']
+    return {
+        'type': payload['type'],
+        'id': payload['id'],
+        'slug': payload['slug'],
+        'label': label,
+        'matched': matched,
+        'category_slug': payload['category_slug'],
+        'code': payload['code'],
+    }
@@ -4,14 +4,39 @@ Tests for products app.
 Tests cover models, services, and API endpoints.
 """
 
+import io
+import shutil
+import tempfile
+import csv
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from decimal import Decimal
-from django.test import TestCase
+from unittest import mock
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.cache import cache
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework import status
 
-from .models import Category, Product
-from .services import ProductService, CategoryService
+from .cache import get_cache_stats, reset_cache_stats
+from .geo import encode_geohash, haversine_km
+from .models import (
+    Category, Product, ProductImage, ProductUpdate, SponsorshipUnit, StockHold, UnitImage, UnitUpdate
+)
+from .projections import ProductListProjection
+from .repositories import ProductRepository, StockHoldRepository
+from .serializers import ProductDetailSerializer, ProductListSerializer
+from .services import ProductService, CategoryService, SponsorshipUnitService
+from .suggest import SUGGEST_VERSION_TTL, SuggestIndex, suggest_index
 
 
 class CategoryModelTest(TestCase):
@@ -71,6 +96,90 @@ class ProductModelTest(TestCase):
         self.assertTrue(self.product.is_in_stock)
 
 
+class CategoryProductCountTest(TestCase):
+    """Tests for the denormalized Category.active_product_count."""
+
+    def setUp(self):
+        self.trees = Category.objects.create(name='Trees', slug='trees')
+        self.retreats = Category.objects.create(name='Retreats', slug='retreats')
+        self.product = Product.objects.create(
+            title='Oak Tree',
+            slug='oak-tree',
+            category=self.trees,
+            product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'),
+        )
+
+    def counts(self):
+        return dict(Category.objects.values_list('slug', 'active_product_count'))
+
+    def test_counts_follow_product_lifecycle(self):
+        """Test create, deactivate, reactivate, move and delete."""
+        self.assertEqual(self.counts(), {'trees': 1, 'retreats': 0})
+        self.product.is_active = False
+        self.product.save()
+        self.assertEqual(self.counts(), {'trees': 0, 'retreats': 0})
+        self.product.is_active = True
+        self.product.category = self.retreats
+        self.product.save()
+        self.assertEqual(self.counts(), {'trees': 0, 'retreats': 1})
+        self.product.delete()
+        self.assertEqual(self.counts(), {'trees': 0, 'retreats': 0})
+
+    def test_category_save_keeps_counter(self):
+        """Test that saving a stale category instance does not reset the count."""
+        self.trees.active_product_count = 0
+        self.trees.save()
+        self.assertEqual(self.counts()['trees'], 1)
+
+    def test_rebuild_after_bulk_update(self):
+        """Test that rebuilding repairs counts after a bulk update."""
+        Product.objects.update(category=self.retreats)
+        self.assertEqual(CategoryService().rebuild_product_counts(), 2)
+        self.assertEqual(self.counts(), {'trees': 0, 'retreats': 1})
+
+
+class ProductListProjectionTest(TestCase):
+    """Tests that ProductListProjection matches ProductListSerializer byte for byte."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Árboles', name_en='Trees', slug='trees')
+        plain = Category.objects.create(name='Retiros', slug='retreats')
+        sale = Product.objects.create(
+            title='Roble', title_en='Oak', slug='oak', short_description='Nativo',
+            category=category, product_type=Product.ProductType.TREE,
+            pricing_type=Product.PricingType.ANNUAL, price=Decimal('45.5'),
+            compare_at_price=Decimal('59.99'), co2_offset_kg=Decimal('22.5'),
+            rating=Decimal('4.5'), location_name='Andes', duration='1 año',
+        )
+        Product.objects.create(
+            title='Yoga', slug='yoga', category=plain,
+            product_type=Product.ProductType.EXPERIENCE, price=Decimal('300'),
+        )
+        ProductImage.objects.create(product=sale, image_url='https://example.com/b.jpg', display_order=2)
+        ProductImage.objects.create(product=sale, image='products/a.jpg', display_order=1)
+
+    def assert_identical(self, language, query=''):
+        request = Request(APIRequestFactory().get(f'/api/products/{query}', HTTP_ACCEPT_LANGUAGE=language))
+        context = {'request': request}
+        queryset = ProductRepository.get_all_active().order_by('-created_at')
+        expected = ProductListSerializer(list(queryset), many=True, context=context).data
+        projection = ProductListProjection(context=context)
+        actual = projection.render(projection.values(queryset))
+        self.assertEqual(JSONRenderer().render(actual), JSONRenderer().render(expected))
+
+    def test_output_is_byte_identical(self):
+        """Test both languages, sale prices, image files/URLs and missing images."""
+        for language in ('es', 'en'):
+            with self.subTest(language=language):
+                self.assert_identical(language)
+
+    def test_sparse_fieldsets_are_identical(self):
+        """Test ?fields= and ?omit= produce the same payload."""
+        self.assert_identical('en', '?fields=title,discount_percentage,primary_image')
+        self.assert_identical('es', '?omit=category_name,price')
+
+
 class ProductServiceTest(TestCase):
     """Tests for ProductService."""
 
@@ -146,3 +255,1576 @@ class ProductAPITest(APITestCase):
         url = reverse('products:category-list')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TranslatedSerializationTest(TestCase):
+    """Tests for language-resolved serialization in TranslatedFieldsMixin."""
+
+    def setUp(self):
+        self.category = Category.objects.create(
+            name='Árboles', name_en='Trees', slug='trees'
+        )
+        self.product = Product.objects.create(
+            title='Roble',
+            title_en='Oak',
+            slug='oak-tree',
+            short_description='Árbol nativo',
+            description='Descripción',
+            includes=['Certificado'],
+            includes_en=['Certificate'],
+            category=self.category,
+            product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'),
+        )
+        self.factory = APIRequestFactory()
+
+    def serialize(self, serializer_class, language, **kwargs):
+        request = self.factory.get('/', HTTP_ACCEPT_LANGUAGE=language)
+        return serializer_class(self.product, context={'request': request}, **kwargs).data
+
+    def test_english_uses_translations_with_fallback(self):
+        """Test that English reads '_en' fields and falls back when empty."""
+        data = self.serialize(ProductDetailSerializer, 'en-US')
+        self.assertEqual(data['title'], 'Oak')
+        self.assertEqual(data['short_description'], 'Árbol nativo')
+        self.assertEqual(data['includes'], ['Certificate'])
+        self.assertEqual(data['features'], [])
+        self.assertEqual(data['category']['name'], 'Trees')
+
+    def test_spanish_uses_base_fields(self):
+        """Test that Spanish reads the base fields."""
+        data = self.serialize(ProductDetailSerializer, 'es')
+        self.assertEqual(data['title'], 'Roble')
+        self.assertEqual(data['includes'], ['Certificado'])
+        self.assertEqual(data['category']['name'], 'Árboles')
+
+    def test_language_resolved_once_per_list(self):
+        """Test that the language is resolved once for a whole list."""
+        request = self.factory.get('/', HTTP_ACCEPT_LANGUAGE='en')
+        products = [self.product] * 5
+        with mock.patch(
+            'products.serializers.get_request_language', return_value='en'
+        ) as resolve:
+            data = ProductListSerializer(products, many=True, context={'request': request}).data
+        self.assertEqual(resolve.call_count, 1)
+        self.assertEqual([item['title'] for item in data], ['Oak'] * 5)
+
+
+class CatalogCacheTest(APITestCase):
+    """Tests for the versioned catalog response cache."""
+
+    def setUp(self):
+        cache.clear()
+        reset_cache_stats()
+        self.category = Category.objects.create(
+            name='Trees',
+            slug='trees',
+            is_active=True
+        )
+        self.product = Product.objects.create(
+            title='Oak Tree',
+            slug='oak-tree',
+            category=self.category,
+            product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'),
+            is_active=True
+        )
+        self.list_url = reverse('products:product-list')
+        self.detail_url = reverse('products:product-detail', kwargs={'slug': 'oak-tree'})
+
+    def test_second_request_is_a_hit(self):
+        """Test that repeated list requests are served from cache."""
+        first = self.client.get(self.list_url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.list_url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.data, second.data)
+        # Counts stay in the process until the stats are read
+        self.assertIsNone(cache.get('catalog:stats:hits'))
+        stats = get_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_language_and_params_are_part_of_key(self):
+        """Test that language and query params produce separate entries."""
+        self.client.get(self.list_url)
+        response = self.client.get(self.list_url, HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        response = self.client.get(self.list_url, {'page': 1})
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_product_save_invalidates_detail(self):
+        """Test that editing a product bumps the catalog version."""
+        self.client.get(self.detail_url)
+        self.product.title = 'Renamed Oak'
+        self.product.save()
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['title'], 'Renamed Oak')
+
+    def test_admin_stock_actions_invalidate_cache(self):
+        """Test that bulk stock actions in the admin bump the catalog version."""
+        from django.contrib.admin.sites import site
+        from .admin import ProductAdmin
+
+        Product.objects.filter(pk=self.product.pk).update(stock=5, is_unlimited_stock=False)
+        product_admin = ProductAdmin(Product, site)
+        queryset = Product.objects.filter(pk=self.product.pk)
+        for action, in_stock in (
+            (product_admin.set_out_of_stock, False),
+            (product_admin.set_unlimited_stock, True),
+            (product_admin.remove_unlimited_stock, False),
+        ):
+            self.client.get(self.list_url)
+            self.client.get(self.detail_url)
+            with mock.patch.object(product_admin, 'message_user'):
+                action(None, queryset)
+            self.assertEqual(self.client.get(self.list_url)['X-Cache'], 'MISS')
+            response = self.client.get(self.detail_url)
+            self.assertEqual(response['X-Cache'], 'MISS')
+            self.assertEqual(response.data['is_in_stock'], in_stock)
+
+    def test_image_delete_invalidates_list(self):
+        """Test that gallery changes invalidate cached lists."""
+        image = ProductImage.objects.create(
+            product=self.product,
+            image_url='https://example.com/oak.jpg',
+            is_primary=True
+        )
+        self.client.get(self.list_url)
+        image.delete()
+        response = self.client.get(self.list_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['primary_image'], '')
+
+
+class PrimaryImageQueryTest(APITestCase):
+    """Tests that primary image resolution costs a constant number of queries."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Trees', slug='trees')
+
+    def create_products(self, count):
+        for index in range(count):
+            product = Product.objects.create(
+                title=f'Tree {index}',
+                slug=f'tree-{index}-{Product.objects.count()}',
+                category=self.category,
+                product_type=Product.ProductType.TREE,
+                price=Decimal('10.00'),
+                is_featured=True
+            )
+            ProductImage.objects.create(
+                product=product, image_url=f'https://example.com/{index}-a.jpg'
+            )
+            ProductImage.objects.create(
+                product=product, image_url=f'https://example.com/{index}-b.jpg', is_primary=True
+            )
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context)
+
+    def test_list_query_count_is_constant(self):
+        """Test that the list page does not issue a query per product."""
+        url = reverse('products:product-list')
+        self.create_products(2)
+        small = self.count_queries(url)
+        self.create_products(10)
+        self.assertEqual(self.count_queries(url), small)
+
+    def test_featured_uses_annotation(self):
+        """Test that featured products resolve images in a single query."""
+        self.create_products(5)
+        cache.clear()
+        # One aggregate for the ETag validators, one for the products
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('products:product-featured'))
+        self.assertTrue(
+            all(item['primary_image'].endswith('-b.jpg') for item in response.data)
+        )
+
+    def test_unit_falls_back_to_product_image(self):
+        """Test that units without a gallery use the annotated product image."""
+        self.create_products(1)
+        product = Product.objects.get()
+        SponsorshipUnit.objects.create(code='TREE-001', name='Oak', product=product)
+        unit = SponsorshipUnit.objects.with_primary_image().get()
+        with self.assertNumQueries(0):
+            self.assertEqual(unit.primary_image, 'https://example.com/0-b.jpg')
+
+
+class ProductSearchTest(APITestCase):
+    """Tests for the indexed full-text product search."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Árboles', slug='arboles')
+        self.oak = Product.objects.create(
+            title='Roble Andino',
+            title_en='Andean Oak',
+            slug='roble-andino',
+            category=self.category,
+            product_type=Product.ProductType.TREE,
+            price=Decimal('49.00'),
+            description='Árbol nativo',
+            short_description='Roble de montaña',
+            species='Quercus humboldtii'
+        )
+        self.palm = Product.objects.create(
+            title='Palma de Cera',
+            slug='palma-de-cera',
+            category=self.category,
+            product_type=Product.ProductType.TREE,
+            price=Decimal('59.00'),
+            description='Crece junto al roble en el valle',
+            short_description='Árbol nacional'
+        )
+
+    def test_search_matches_english_fields(self):
+        """Test that English translations are searchable."""
+        results = ProductService().search_products('oak')
+        self.assertEqual(list(results), [self.oak])
+
+    def test_search_ranks_title_above_description(self):
+        """Test that title matches rank above description matches."""
+        results = list(ProductService().search_products('roble'))
+        self.assertEqual(results, [self.oak, self.palm])
+
+    def test_index_follows_saves_and_deletes(self):
+        """Test that the index is kept in sync with the product table."""
+        self.palm.title_en = 'Wax Palm'
+        self.palm.save()
+        self.assertEqual(list(ProductService().search_products('wax')), [self.palm])
+        self.palm.delete()
+        self.assertEqual(list(ProductService().search_products('wax')), [])
+
+    def test_last_word_matches_as_prefix(self):
+        """Test that the last word is a prefix on the active backend (SQLite or PostgreSQL)."""
+        service = ProductService()
+        self.assertEqual(list(service.search_products('rob')), [self.oak, self.palm])
+        self.assertEqual(list(service.search_products('roble andi')), [self.oak])
+        # Only the last word is a prefix
+        self.assertEqual(list(service.search_products('andi roble')), [])
+
+    def test_query_builders_agree(self):
+        """Test that both backends prefix only the last word and drop syntax."""
+        from .search import PostgresSearchBackend, SQLiteSearchBackend
+
+        query = 'roble "sol&!'
+        self.assertEqual(PostgresSearchBackend().build_tsquery(query), 'roble & sol:*')
+        self.assertEqual(SQLiteSearchBackend().build_match(query), '"roble" "sol"*')
+        self.assertEqual(PostgresSearchBackend().build_tsquery(' & '), '')
+
+    def test_search_param_on_product_list(self):
+        """Test that the list endpoint searches by relevance and ignores FTS syntax."""
+        url = reverse('products:product-list')
+        response = self.client.get(url, {'search': 'roble'})
+        slugs = [item['slug'] for item in response.data['results']]
+        self.assertEqual(slugs, ['roble-andino', 'palma-de-cera'])
+        response = self.client.get(url, {'search': 'quercus" *'})
+        self.assertEqual(response.data['count'], 1)
+
+
+class KeysetPaginationTest(APITestCase):
+    """Tests for opt-in keyset (cursor) pagination on the product list."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Trees', slug='trees')
+        for index in range(5):
+            Product.objects.create(
+                title=f'Tree {index}',
+                slug=f'tree-{index}',
+                category=category,
+                product_type=Product.ProductType.TREE,
+                price=Decimal('10.00') + index % 2
+            )
+        # Same timestamp for every row so only the id tiebreaker orders them
+        Product.objects.update(created_at=Product.objects.first().created_at)
+        self.url = reverse('products:product-list')
+
+    def collect(self, params):
+        slugs, url = [], self.url
+        response = self.client.get(url, {**params, 'pagination': 'cursor', 'page_size': 2})
+        while True:
+            self.assertNotIn('count', response.data)
+            slugs.extend(item['slug'] for item in response.data['results'])
+            if not response.data['next']:
+                return slugs
+            response = self.client.get(response.data['next'])
+
+    def test_pages_cover_all_rows_once(self):
+        """Test that walking the cursor returns every product exactly once."""
+        slugs = self.collect({})
+        self.assertEqual(slugs, [f'tree-{index}' for index in reversed(range(5))])
+
+    def test_cursor_follows_requested_ordering(self):
+        """Test that keyset pages respect explicit ordering with ties."""
+        slugs = self.collect({'ordering': 'price'})
+        self.assertEqual(slugs, ['tree-0', 'tree-2', 'tree-4', 'tree-1', 'tree-3'])
+
+    def test_page_number_mode_is_default(self):
+        """Test that page-number pagination remains the default."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 5)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor returns 404."""
+        response = self.client.get(self.url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SparseFieldsetTest(APITestCase):
+    """Tests for ?fields= / ?omit= and bounded nested collections."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Trees', slug='trees')
+        self.product = Product.objects.create(
+            title='Oak Tree',
+            slug='oak-tree',
+            description='A very long description',
+            category=self.category,
+            product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'),
+        )
+        for index in range(7):
+            ProductUpdate.objects.create(product=self.product, title=f'Update {index}')
+
+    def test_list_fields_prunes_json_and_sql(self):
+        """Test that ?fields= limits both the payload and the selected columns."""
+        url = reverse('products:product-list')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'fields': 'id,title,primary_image'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'title', 'primary_image'})
+        product_sql = [q['sql'] for q in queries if 'FROM "products_product"' in q['sql']]
+        self.assertTrue(product_sql)
+        self.assertFalse(any('"description"' in sql for sql in product_sql))
+        self.assertFalse(any('"products_category"' in sql for sql in product_sql))
+
+    def test_detail_omit_skips_prefetches(self):
+        """Test that omitted nested collections are not queried."""
+        url = reverse('products:product-detail', kwargs={'slug': 'oak-tree'})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'omit': 'gallery,gallery_next,updates,updates_next'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('updates', response.data)
+        self.assertEqual(response.data['title'], 'Oak Tree')
+        self.assertFalse(any('products_productupdate' in q['sql'] for q in queries))
+        self.assertFalse(any('products_productimage' in q['sql'] for q in queries))
+
+    def test_unknown_field_is_rejected(self):
+        """Test that unknown field names return 400."""
+        response = self.client.get(reverse('products:product-list'), {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_updates_capped_with_cursor_link(self):
+        """Test that detail embeds the latest updates and links to the rest."""
+        url = reverse('products:product-detail', kwargs={'slug': 'oak-tree'})
+        response = self.client.get(url)
+        titles = [update['title'] for update in response.data['updates']]
+        self.assertEqual(titles, [f'Update {index}' for index in range(6, 1, -1)])
+        self.assertIsNone(response.data['gallery_next'])
+
+        rest = self.client.get(response.data['updates_next'])
+        self.assertEqual(rest.status_code, status.HTTP_200_OK)
+        self.assertEqual([update['title'] for update in rest.data['results']], ['Update 1', 'Update 0'])
+        self.assertIsNone(rest.data['next'])
+
+
+class GeoQueryTest(APITestCase):
+    """Tests for geohash indexing and proximity endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Retreats', slug='retreats')
+        for slug, lat, lng in [
+            ('bogota', '4.711000', '-74.072100'),
+            ('medellin', '6.244200', '-75.581200'),
+            ('madrid', '40.416800', '-3.703800'),
+            ('nowhere', None, None),
+        ]:
+            Product.objects.create(
+                title=slug.title(),
+                slug=slug,
+                category=self.category,
+                product_type=Product.ProductType.EXPERIENCE,
+                price=Decimal('100.00'),
+                location_lat=lat,
+                location_lng=lng,
+            )
+
+    def test_geohash_computed_on_save(self):
+        """Test that the geohash follows the coordinates."""
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        product = Product.objects.get(slug='bogota')
+        self.assertEqual(product.geohash, encode_geohash(4.7110, -74.0721))
+        self.assertEqual(Product.objects.get(slug='nowhere').geohash, '')
+
+    def test_within_bbox(self):
+        """Test the bounding-box endpoint."""
+        response = self.client.get(
+            reverse('products:product-within'), {'bbox': '-80,-5,-66,13'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        slugs = {item['slug'] for item in response.data['results']}
+        self.assertEqual(slugs, {'bogota', 'medellin'})
+
+    def test_nearest(self):
+        """Test nearest-N ordering and distances."""
+        response = self.client.get(
+            reverse('products:product-nearest'), {'lat': 4.6, 'lng': -74.1, 'limit': 2}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['slug'] for item in response.data], ['bogota', 'medellin'])
+        self.assertAlmostEqual(
+            response.data[1]['distance_km'], haversine_km(4.6, -74.1, 6.2442, -75.5812), places=3
+        )
+
+    def test_list_sorted_by_distance(self):
+        """Test ?near= on the product list."""
+        response = self.client.get(
+            reverse('products:product-list'), {'near': '40.4,-3.7', 'radius_km': 9000}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [item['slug'] for item in response.data['results']], ['madrid', 'bogota', 'medellin']
+        )
+        invalid = self.client.get(reverse('products:product-list'), {'near': 'north'})
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FacetCountsTest(APITestCase):
+    """Tests for the catalog facet counts endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.trees = Category.objects.create(name='Árboles', name_en='Trees', slug='trees')
+        self.retreats = Category.objects.create(name='Retiros', slug='retreats')
+        for slug, category, product_type, price, featured in [
+            ('oak', self.trees, Product.ProductType.TREE, '20.00', True),
+            ('pine', self.trees, Product.ProductType.TREE, '45.00', False),
+            ('yoga', self.retreats, Product.ProductType.EXPERIENCE, '300.00', True),
+        ]:
+            Product.objects.create(
+                title=slug.title(),
+                slug=slug,
+                category=category,
+                product_type=product_type,
+                price=Decimal(price),
+                is_featured=featured,
+            )
+        self.url = reverse('products:product-facets')
+
+    def counts(self, data, facet):
+        return {entry['value']: entry['count'] for entry in data[facet]}
+
+    def test_facet_counts_single_query(self):
+        """Test facet counts are computed with one grouped query."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.data['total'], 3)
+        self.assertEqual(self.counts(response.data, 'category'), {'trees': 2, 'retreats': 1})
+        self.assertEqual(response.data['category'][0]['label'], 'Trees')
+        self.assertEqual(self.counts(response.data, 'price'), {'0-25': 1, '25-50': 1, '250+': 1})
+        self.assertEqual(self.counts(response.data, 'is_featured'), {True: 2, False: 1})
+
+    def test_facets_follow_filters_and_invalidation(self):
+        """Test facets honour filters and are rebuilt after product changes."""
+        response = self.client.get(self.url, {'category': 'trees'})
+        self.assertEqual(self.counts(response.data, 'product_type'), {'tree': 2})
+        cached = self.client.get(self.url, {'category': 'trees'})
+        self.assertEqual(cached['X-Cache'], 'HIT')
+
+        Product.objects.get(slug='pine').delete()
+        response = self.client.get(self.url, {'category': 'trees'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(self.counts(response.data, 'product_type'), {'tree': 1})
+
+
+class BatchLookupTest(APITestCase):
+    """Tests for the batch product lookup endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Trees', slug='trees')
+        self.products = [
+            Product.objects.create(
+                title=f'Tree {index}',
+                slug=f'tree-{index}',
+                category=self.category,
+                product_type=Product.ProductType.TREE,
+                price=Decimal('45.00'),
+                is_active=index != 2,
+            )
+            for index in range(4)
+        ]
+        ProductImage.objects.create(
+            product=self.products[0], image_url='https://example.com/0.jpg', is_primary=True
+        )
+        self.url = reverse('products:product-batch')
+
+    def test_ids_in_request_order_with_missing(self):
+        """Test one query, request order and missing/inactive ids."""
+        ids = [self.products[3].id, self.products[0].id, self.products[2].id, 9999]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual([item['slug'] for item in response.data['results']], ['tree-3', 'tree-0'])
+        self.assertEqual(response.data['results'][1]['primary_image'], 'https://example.com/0.jpg')
+        self.assertEqual(response.data['missing'], [self.products[2].id, 9999])
+
+    def test_slugs_with_sparse_fields(self):
+        """Test slug lookups combined with ?fields=."""
+        response = self.client.get(self.url, {'slugs': 'tree-1,nope', 'fields': 'id,title'})
+        self.assertEqual(response.data['results'], [{'id': self.products[1].id, 'title': 'Tree 1'}])
+        self.assertEqual(response.data['missing'], ['nope'])
+
+    def test_invalid_params(self):
+        """Test validation of ids/slugs."""
+        for params in [{}, {'ids': '1', 'slugs': 'a'}, {'ids': 'a,b'}, {'ids': ','.join(['1'] * 201)}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalGetTest(APITestCase):
+    """Tests for ETag / Last-Modified on catalog endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Trees', slug='trees')
+        self.product = Product.objects.create(
+            title='Oak Tree',
+            slug='oak-tree',
+            category=self.category,
+            product_type=Product.ProductType.EXPERIENCE,
+            price=Decimal('45.00'),
+            is_featured=True
+        )
+        Product.objects.create(
+            title='Ceiba Tree',
+            slug='ceiba-tree',
+            category=self.category,
+            product_type=Product.ProductType.TREE,
+            price=Decimal('55.00')
+        )
+
+    def assert_not_modified(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached.content, b'')
+        return response['ETag']
+
+    def test_catalog_endpoints_return_304(self):
+        """Test that every catalog read honours If-None-Match."""
+        for name, kwargs in [
+            ('products:product-list', {}),
+            ('products:product-detail', {'slug': 'oak-tree'}),
+            ('products:product-featured', {}),
+            ('products:product-new-arrivals', {}),
+            ('products:product-trees', {}),
+            ('products:product-retreats', {}),
+            ('products:category-list', {}),
+            ('products:category-detail', {'slug': 'trees'}),
+        ]:
+            with self.subTest(name=name):
+                self.assert_not_modified(reverse(name, kwargs=kwargs))
+
+    def test_if_modified_since(self):
+        """Test that If-Modified-Since is honoured."""
+        url = reverse('products:product-list')
+        response = self.client.get(url)
+        cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_changes_after_edit_and_language(self):
+        """Test that edits and language produce a new ETag."""
+        url = reverse('products:product-detail', kwargs={'slug': 'oak-tree'})
+        etag = self.assert_not_modified(url)
+        english = self.client.get(url, HTTP_ACCEPT_LANGUAGE='en', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(english.status_code, status.HTTP_200_OK)
+        self.product.price = Decimal('50.00')
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class HomeBundleTest(APITestCase):
+    """Tests for the cached homepage bundle."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(
+            name='Árboles',
+            name_en='Trees',
+            slug='trees',
+            is_active=True
+        )
+        self.product = Product.objects.create(
+            title='Roble',
+            title_en='Oak Tree',
+            slug='oak-tree',
+            category=self.category,
+            product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'),
+            is_active=True,
+            is_featured=True,
+            is_new=True
+        )
+        self.url = reverse('products:home')
+
+    def test_bundle_sections(self):
+        """Test that the bundle matches the individual endpoints."""
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        featured = self.client.get(reverse('products:product-featured'))
+        self.assertEqual(response.data['featured'], featured.data)
+        self.assertEqual(response.data['new_arrivals'][0]['slug'], 'oak-tree')
+        self.assertEqual(response.data['categories'][0]['name'], 'Árboles')
+        self.assertEqual(response.data['forest_stats']['tree_count'], 0)
+
+    def test_cached_per_language(self):
+        """Test that each language is cached separately."""
+        self.client.get(self.url)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        english = self.client.get(self.url, HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(english['X-Cache'], 'MISS')
+        self.assertEqual(english.data['featured'][0]['title'], 'Oak Tree')
+
+    def test_catalog_edit_invalidates_bundle(self):
+        """Test that editing a product rebuilds the bundle."""
+        self.client.get(self.url)
+        self.product.is_featured = False
+        self.product.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['featured'], [])
+
+    @override_settings(HOME_PRECOMPUTE=True)
+    def test_precompute_after_commit(self):
+        """Test that the bundle is rebuilt once the edit commits."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.name = 'Bosque'
+            self.category.save()
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertEqual(response.data['categories'][0]['name'], 'Bosque')
+
+
+class RangeFilterTest(APITestCase):
+    """Tests for price and rating range filters."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Trees', slug='trees', is_active=True)
+        for slug, price, rating, product_type in [
+            ('oak', '20.00', '4.5', Product.ProductType.TREE),
+            ('pine', '45.00', '3.0', Product.ProductType.TREE),
+            ('cedar', '90.00', '5.0', Product.ProductType.TREE),
+            ('wetland', '60.00', '4.0', Product.ProductType.LAGOON),
+        ]:
+            Product.objects.create(
+                title=slug.title(), slug=slug, category=category, product_type=product_type,
+                price=Decimal(price), rating=Decimal(rating), is_active=True
+            )
+        self.url = reverse('products:product-list')
+
+    def slugs(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['slug'] for item in response.data['results']]
+
+    def test_price_range_with_type_and_ordering(self):
+        """Test inclusive price bounds combined with type and price sort."""
+        slugs = self.slugs({
+            'product_type': 'tree', 'min_price': '20', 'max_price': '45', 'ordering': '-price'
+        })
+        self.assertEqual(slugs, ['pine', 'oak'])
+
+    def test_rating_range(self):
+        """Test minimum and maximum rating."""
+        self.assertEqual(self.slugs({'min_rating': '4.5', 'ordering': 'rating'}), ['oak', 'cedar'])
+        self.assertEqual(self.slugs({'max_rating': '3'}), ['pine'])
+
+    def test_invalid_ranges(self):
+        """Test that malformed or inverted bounds are rejected."""
+        for params in [{'min_price': 'cheap'}, {'min_rating': '6'}, {'min_price': '50', 'max_price': '10'}]:
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def make_upload(name='photo.png', size=(2000, 1000), mode='RGBA'):
+    """Build an in-memory image upload."""
+    buffer = io.BytesIO()
+    Image.new(mode, size, (30, 120, 60, 255)[:len(mode)]).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+class ImageVariantTest(APITestCase):
+    """Tests for resized WebP/JPEG image variants."""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_VARIANTS_ASYNC=False)
+        self.settings_override.enable()
+        category = Category.objects.create(name='Trees', slug='trees', is_active=True)
+        self.product = Product.objects.create(
+            title='Oak Tree', slug='oak-tree', category=category,
+            product_type=Product.ProductType.TREE, price=Decimal('45.00'), is_active=True
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            image = ProductImage.objects.create(
+                product=self.product, image=make_upload(**kwargs), is_primary=True
+            )
+        image.refresh_from_db()
+        return image
+
+    def test_variants_generated_after_commit(self):
+        """Test that an upload gets WebP and JPEG variants at each width."""
+        image = self.upload()
+        variants = image.image_variants
+        self.assertEqual(variants['source'], image.image.name)
+        self.assertEqual(sorted(variants['webp'], key=int), ['320', '640', '1024', '1600'])
+        storage = image.image.storage
+        for name in list(variants['webp'].values()) + list(variants['jpeg'].values()):
+            self.assertTrue(storage.exists(name))
+        with storage.open(variants['jpeg']['640']) as variant:
+            self.assertEqual(Image.open(variant).size, (640, 320))
+        self.assertTrue(image.srcset['webp'].endswith('_w1600.webp 1600w'))
+
+    def test_small_image_is_not_upscaled(self):
+        """Test that originals narrower than every target keep their width."""
+        image = self.upload(size=(200, 100), mode='RGB')
+        self.assertEqual(list(image.image_variants['jpeg']), ['200'])
+
+    def test_srcset_in_payloads(self):
+        """Test that list and detail payloads expose the srcset map."""
+        image = self.upload()
+        listing = self.client.get(reverse('products:product-list'))
+        self.assertEqual(listing.data['results'][0]['primary_image_srcset'], image.srcset)
+        detail = self.client.get(reverse('products:product-detail', kwargs={'slug': 'oak-tree'}))
+        self.assertEqual(detail.data['gallery'][0]['srcset'], image.srcset)
+
+    def test_replacing_image_removes_old_variants(self):
+        """Test that replacing the upload deletes the previous variants."""
+        image = self.upload()
+        old_files = list(image.image_variants['webp'].values())
+        image.image = make_upload('other.png', size=(800, 400))
+        with self.captureOnCommitCallbacks(execute=True):
+            image.save()
+        image.refresh_from_db()
+        self.assertFalse(any(image.image.storage.exists(name) for name in old_files))
+        self.assertEqual(image.image_variants['source'], image.image.name)
+        self.assertEqual(list(image.image_variants['webp']), ['320', '640', '800'])
+
+    def test_backfill_command(self):
+        """Test that the command fills in variants for older uploads."""
+        image = self.upload()
+        ProductImage.objects.filter(pk=image.pk).update(image_variants={})
+        call_command('generate_image_variants', '--model', 'product-image', stdout=io.StringIO())
+        image.refresh_from_db()
+        self.assertEqual(image.image_variants['source'], image.image.name)
+
+
+class CatalogExportTest(APITestCase):
+    """Tests for the streaming NDJSON/CSV catalog export."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Trees', slug='trees', is_active=True)
+        self.product = Product.objects.create(
+            title='Roble', title_en='Oak', slug='oak', category=category,
+            product_type=Product.ProductType.TREE, price=Decimal('45.00'), is_active=True
+        )
+        hidden = Product.objects.create(
+            title='Hidden', slug='hidden', category=category,
+            product_type=Product.ProductType.TREE, price=Decimal('10.00'), is_active=False
+        )
+        # Active unit of an inactive product: never exported
+        SponsorshipUnit.objects.create(code='HIDE-001', name='Hidden One', product=hidden)
+        SponsorshipUnit.objects.create(
+            code='TREE-001', name='Oak One', product=self.product,
+            location_lat=Decimal('-33.4489'), location_lng=Decimal('-70.6693'),
+            location_lat_approx=Decimal('-33.45'), location_lng_approx=Decimal('-70.67'),
+        )
+
+    def export(self, resource, export_format, **headers):
+        url = reverse('products:catalog-export', kwargs={
+            'resource': resource, 'export_format': export_format
+        })
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_products_ndjson(self):
+        """Test that active products stream as one JSON object per line."""
+        response, body = self.export('products', 'ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['slug'] for row in rows], ['oak'])
+        self.assertEqual(rows[0]['category_slug'], 'trees')
+        self.assertEqual(rows[0]['price'], '45.00')
+
+    def test_units_csv_hides_exact_location(self):
+        """Test that unit exports use approximate coordinates only."""
+        response, body = self.export('units', 'csv', HTTP_ACCEPT='text/csv')
+        self.assertIn('attachment; filename="units.csv"', response['Content-Disposition'])
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['product_slug'], 'oak')
+        self.assertEqual(Decimal(rows[0]['location_lat_approx']), Decimal('-33.45'))
+        self.assertNotIn('location_lat', rows[0])
+        self.assertNotIn('sponsor', rows[0])
+        self.assertNotIn('-33.4489', body)
+
+    def test_single_query_through_iterator(self):
+        """Test that the export reads rows in one pass."""
+        with self.assertNumQueries(1):
+            self.export('products', 'csv')
+
+    def test_command_matches_endpoint(self):
+        """Test that the management command writes the same export."""
+        out = io.StringIO()
+        call_command('export_catalog', 'products', '--format', 'ndjson', stdout=out)
+        _, body = self.export('products', 'ndjson')
+        self.assertEqual(out.getvalue(), body)
+
+
+@override_settings(SITE_URL='https://example.com')
+class SitemapTest(APITestCase):
+    """Tests for the cached, streamed sitemaps."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Trees', slug='trees', is_active=True)
+        self.product = Product.objects.create(
+            title='Oak', slug='oak', category=self.category,
+            product_type=Product.ProductType.TREE, price=Decimal('45.00'), is_active=True
+        )
+        Product.objects.create(
+            title='Hidden', slug='hidden', category=self.category,
+            product_type=Product.ProductType.TREE, price=Decimal('10.00'), is_active=False
+        )
+        self.unit = SponsorshipUnit.objects.create(code='TREE-001', name='Oak One', product=self.product)
+
+    def get(self, url):
+        response = self.client.get(url)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body.decode('utf-8')
+
+    def test_index_lists_shards(self):
+        """Test that the index links the product shards only."""
+        response, body = self.get('/sitemap.xml')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('<loc>https://example.com/sitemaps/products-1.xml</loc>', body)
+        self.assertNotIn('units', body)
+
+    def test_product_shard(self):
+        """Test that static pages and active product pages are listed."""
+        response, body = self.get('/sitemaps/products-1.xml')
+        self.assertTrue(response.streaming)
+        self.assertIn('<loc>https://example.com/</loc>', body)
+        self.assertIn('<loc>https://example.com/welcome</loc>', body)
+        self.assertIn('<loc>https://example.com/products/trees/oak</loc>', body)
+        self.assertIn(self.product.updated_at.isoformat(timespec='seconds'), body)
+        self.assertNotIn('hidden', body)
+        self.assertNotIn(self.unit.slug, body)
+        response, _ = self.get('/sitemaps/units-1.xml')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cached_until_change(self):
+        """Test that shards are cached until a product changes."""
+        self.get('/sitemaps/products-1.xml')
+        with self.assertNumQueries(0):
+            response, _ = self.get('/sitemaps/products-1.xml')
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.product.save()
+        response, _ = self.get('/sitemaps/products-1.xml')
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_missing_shard(self):
+        """Test that shards past the end are 404."""
+        response, _ = self.get('/sitemaps/products-2.xml')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_warm_command(self):
+        """Test that warming caches every file."""
+        call_command('warm_sitemaps', stdout=io.StringIO())
+        with self.assertNumQueries(0):
+            for url in ['/sitemap.xml', '/sitemaps/products-1.xml']:
+                response, _ = self.get(url)
+                self.assertEqual(response['X-Cache'], 'HIT')
+
+
+class BatchAvailabilityTest(APITestCase):
+    """Tests for batch availability checks."""
+
+    def setUp(self):
+        category = Category.objects.create(name='Trees', slug='trees', is_active=True)
+        self.limited = Product.objects.create(
+            title='Oak', slug='oak', category=category, product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'), stock=3, is_unlimited_stock=False, is_active=True
+        )
+        self.unlimited = Product.objects.create(
+            title='Forest', slug='forest', category=category, product_type=Product.ProductType.FOREST,
+            price=Decimal('90.00'), is_unlimited_stock=True, is_active=True
+        )
+        self.inactive = Product.objects.create(
+            title='Old', slug='old', category=category, product_type=Product.ProductType.TREE,
+            price=Decimal('10.00'), stock=5, is_unlimited_stock=False, is_active=False
+        )
+        self.url = reverse('products:product-availability-batch')
+
+    def test_one_query_for_all_lines(self):
+        """Test that every line is resolved with a single query."""
+        service = ProductService()
+        with self.assertNumQueries(1):
+            results = service.check_availability_batch([
+                (self.limited.id, 2), (self.unlimited.id, 50), (self.inactive.id, 1), (999999, 1)
+            ])
+        self.assertEqual(
+            [(line['is_available'], line['stock']) for line in results],
+            [(True, 3), (True, None), (False, None), (False, None)]
+        )
+
+    def test_repeated_product_uses_combined_quantity(self):
+        """Test that lines for one product share its stock."""
+        results = ProductService().check_availability_batch([(self.limited.id, 2), (self.limited.id, 2)])
+        self.assertEqual([line['is_available'] for line in results], [False, False])
+
+    def test_endpoint(self):
+        """Test that anonymous clients can check a cart's lines."""
+        response = self.client.post(self.url, {'items': [
+            {'product_id': self.limited.id, 'quantity': 4},
+            {'product_id': self.unlimited.id},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['all_available'])
+        self.assertEqual(response.data['items'][0]['stock'], 3)
+        self.assertEqual(response.data['items'][1]['quantity'], 1)
+
+    def test_endpoint_validation(self):
+        """Test that empty or malformed lines are rejected."""
+        for body in [{'items': []}, {'items': [{'product_id': self.limited.id, 'quantity': 0}]}]:
+            response = self.client.post(self.url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StockReservationTest(TestCase):
+    """Tests for conditional stock decrements."""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='Trees', slug='trees', is_active=True)
+        self.oak = Product.objects.create(
+            title='Oak', slug='oak', category=self.category, product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'), stock=3, is_unlimited_stock=False, is_active=True
+        )
+        self.pine = Product.objects.create(
+            title='Pine', slug='pine', category=self.category, product_type=Product.ProductType.TREE,
+            price=Decimal('30.00'), stock=2, is_unlimited_stock=False, is_active=True
+        )
+        self.forest = Product.objects.create(
+            title='Forest', slug='forest', category=self.category, product_type=Product.ProductType.FOREST,
+            price=Decimal('90.00'), stock=0, is_unlimited_stock=True, is_active=True
+        )
+        self.service = ProductService()
+
+    def test_decrement_is_one_update(self):
+        """Test that a successful decrement is a single conditional UPDATE."""
+        with self.assertNumQueries(1):
+            self.assertTrue(ProductRepository.decrement_stock(self.oak.id, 2))
+        self.oak.refresh_from_db()
+        self.assertEqual(self.oak.stock, 1)
+        self.assertFalse(ProductRepository.decrement_stock(self.oak.id, 2))
+        self.assertTrue(ProductRepository.decrement_stock(self.forest.id, 100))
+
+    def test_reserve_many_all_or_nothing(self):
+        """Test that a cart is reserved entirely or not at all."""
+        failed = self.service.reserve_stock_many([(self.oak.id, 2), (self.pine.id, 3), (self.forest.id, 5)])
+        self.assertEqual(failed, [self.pine.id])
+        self.assertEqual(
+            dict(Product.objects.values_list('slug', 'stock')),
+            {'oak': 3, 'pine': 2, 'forest': 0}
+        )
+        self.assertEqual(self.service.reserve_stock_many([(self.oak.id, 1), (self.pine.id, 2), (self.oak.id, 2)]), [])
+        self.assertEqual(
+            dict(Product.objects.values_list('slug', 'stock')),
+            {'oak': 0, 'pine': 0, 'forest': 0}
+        )
+
+    def test_reserve_bumps_catalog_version(self):
+        """Test that reservations invalidate cached stock."""
+        from .cache import get_catalog_version
+        version = get_catalog_version()
+        self.service.reserve_stock(self.oak.id, 1)
+        self.assertNotEqual(get_catalog_version(), version)
+
+
+class ConcurrentStockReservationTest(TransactionTestCase):
+    """Tests that parallel reservations never oversell."""
+
+    def test_no_overselling(self):
+        """Test that 40 parallel reservations of 1 succeed exactly stock times."""
+        category = Category.objects.create(name='Trees', slug='trees', is_active=True)
+        product = Product.objects.create(
+            title='Oak', slug='oak', category=category, product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'), stock=10, is_unlimited_stock=False, is_active=True
+        )
+        workers = 40
+        barrier = threading.Barrier(workers)
+
+        def reserve(_):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        return ProductRepository.decrement_stock_many({product.id: 1}) == []
+                    except OperationalError:
+                        # SQLite's shared in-memory test database reports
+                        # contention as "table is locked"; retry like a client
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(reserve, range(workers)))
+        product.refresh_from_db()
+        self.assertEqual(results.count(True), 10)
+        self.assertEqual(product.stock, 0)
+
+
+class StockHoldTest(TestCase):
+    """Tests for time-limited stock holds."""
+
+    def setUp(self):
+        from datetime import timedelta
+        from django.contrib.auth import get_user_model
+        from django.utils import timezone
+        from orders.models import Order
+
+        self.now = timezone.now()
+        self.later = self.now + timedelta(minutes=30)
+        user = get_user_model().objects.create_user(username='holder', email='holder@example.com', password='x')
+        self.orders = [
+            Order.objects.create(user=user, subtotal=0, total_amount=0, customer_email=user.email)
+            for _ in range(2)
+        ]
+        category = Category.objects.create(name='Trees', slug='trees', is_active=True)
+        self.oak = Product.objects.create(
+            title='Oak', slug='oak', category=category, product_type=Product.ProductType.TREE,
+            price=Decimal('45.00'), stock=3, is_unlimited_stock=False, is_active=True
+        )
+        self.forest = Product.objects.create(
+            title='Forest', slug='forest', category=category, product_type=Product.ProductType.FOREST,
+            price=Decimal('90.00'), is_unlimited_stock=True, is_active=True
+        )
+        self.service = ProductService()
+
+    def test_active_holds_reduce_availability(self):
+        """Test that other checkouts' holds are subtracted from stock."""
+        self.assertEqual(StockHoldRepository.place(self.orders[0], {self.oak.id: 2, self.forest.id: 5}, self.later), [])
+        self.assertEqual(StockHold.objects.count(), 1)
+        with self.assertNumQueries(1):
+            line, = self.service.check_availability_batch([(self.oak.id, 2)])
+        self.assertEqual((line['is_available'], line['stock']), (False, 1))
+        self.assertEqual(StockHoldRepository.place(self.orders[1], {self.oak.id: 2}, self.later), [self.oak.id])
+        self.assertEqual(StockHold.objects.filter(order=self.orders[1]).count(), 0)
+
+    def test_expired_holds_stop_counting(self):
+        """Test that lapsed holds free stock before the sweep runs."""
+        StockHoldRepository.place(self.orders[0], {self.oak.id: 3}, self.now)
+        self.assertTrue(self.service.check_availability(self.oak.id, 3))
+        self.assertEqual(StockHoldRepository.place(self.orders[1], {self.oak.id: 3}, self.later), [])
+
+        out = io.StringIO()
+        call_command('release_expired_holds', stdout=out)
+        self.assertIn('1 expired holds released', out.getvalue())
+        self.assertEqual(
+            StockHold.objects.get(order=self.orders[0]).status, StockHold.HoldStatus.RELEASED
+        )
+
+    def test_replacing_holds_ignores_own_hold(self):
+        """Test that re-holding an order replaces its previous holds."""
+        StockHoldRepository.place(self.orders[0], {self.oak.id: 3}, self.later)
+        self.assertEqual(StockHoldRepository.place(self.orders[0], {self.oak.id: 3}, self.later), [])
+        self.assertEqual(StockHold.objects.filter(order=self.orders[0]).count(), 1)
+
+    def test_convert_and_release(self):
+        """Test that payment decrements held stock once and cancelling gives it back."""
+        StockHoldRepository.place(self.orders[0], {self.oak.id: 2}, self.later)
+        self.assertEqual(self.service.convert_holds(self.orders[0]), [])
+        self.assertEqual(self.service.convert_holds(self.orders[0]), [])
+        self.oak.refresh_from_db()
+        self.assertEqual(self.oak.stock, 1)
+        self.assertTrue(self.service.check_availability(self.oak.id, 1))
+
+        self.assertEqual(self.service.release_holds(self.orders[0]), 2)
+        self.oak.refresh_from_db()
+        self.assertEqual(self.oak.stock, 3)
+
+
+class SearchSuggestTest(APITestCase):
+    """Tests for the in-memory suggestion index."""
+
+    def setUp(self):
+        cache.clear()
+        suggest_index.reset()
+        self.category = Category.objects.create(name='Árboles', slug='arboles')
+        self.oak = Product.objects.create(
+            title='Roble Nativo', title_en='Native Oak', slug='roble-nativo', category=self.category,
+            product_type=Product.ProductType.TREE, price=Decimal('45.00'), species='Nothofagus obliqua',
+            location_name='Región de Los Ríos', is_active=True
+        )
+        self.unit = SponsorshipUnit.objects.create(
+            code='TREE-001', name='Árbol del Amanecer', product=self.oak, species='Roble'
+        )
+        self.url = reverse('products:search-suggest')
+
+    def labels(self, query, **params):
+        response = self.client.get(self.url, {'q': query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(item['type'], item['label'], item['matched']) for item in response.data['results']]
+
+    def test_prefix_matches_any_word_without_accents(self):
+        """Test word-start, accent- and case-insensitive matching across fields."""
+        self.assertEqual(self.labels('rob'), [
+            ('product', 'Roble Nativo', 'Roble Nativo'),
+            ('unit', 'Árbol del Amanecer', 'Roble'),
+        ])
+        self.assertEqual(self.labels('ARBOL'), [('unit', 'Árbol del Amanecer', 'Árbol del Amanecer')])
+        self.assertEqual(self.labels('001'), [('unit', 'Árbol del Amanecer', 'TREE-001')])
+        self.assertEqual(self.labels('los rios'), [('product', 'Roble Nativo', 'Región de Los Ríos')])
+        self.assertEqual(self.labels('rob', type='unit'), [('unit', 'Árbol del Amanecer', 'Roble')])
+        self.assertEqual(self.labels('zz'), [])
+
+    def test_english_label(self):
+        """Test that labels follow the request language."""
+        response = self.client.get(self.url, {'q': 'native'}, HTTP_ACCEPT_LANGUAGE='en')
+        self.assertEqual(response.data['results'][0]['label'], 'Native Oak')
+        self.assertEqual(response.data['results'][0]['category_slug'], 'arboles')
+
+    def test_lookups_do_not_query_after_build(self):
+        """Test that only the first lookup reads the database."""
+        self.labels('rob')
+        with self.assertNumQueries(0):
+            self.labels('nat')
+
+    def test_saves_update_the_index_incrementally(self):
+        """Test that edits are applied in place, without a rebuild."""
+        self.labels('rob')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oak.title = 'Coihue'
+            self.oak.save()
+            self.unit.is_active = False
+            self.unit.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.labels('rob'), [])
+            self.assertEqual(self.labels('coi'), [('product', 'Coihue', 'Coihue')])
+
+    def after_ttl(self):
+        """Pretend the shared version check interval has passed."""
+        return mock.patch('products.suggest.time.monotonic', return_value=time.monotonic() + SUGGEST_VERSION_TTL)
+
+    def test_version_is_read_once_per_ttl(self):
+        """Test that lookups within the interval skip the shared version."""
+        self.labels('rob')
+        with mock.patch('products.suggest.get_suggest_version') as get_version:
+            self.labels('nat')
+        get_version.assert_not_called()
+
+    def test_other_process_changes_are_replayed(self):
+        """Test that changes published elsewhere are applied without a rebuild."""
+        self.labels('rob')
+        # Another process, with an index of its own, saves the product
+        with mock.patch('products.suggest.suggest_index', SuggestIndex()):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.oak.title = 'Coihue'
+                self.oak.save()
+        self.assertEqual(self.labels('coi'), [])
+        with self.after_ttl(), self.assertNumQueries(0):
+            self.assertEqual(self.labels('coi'), [('product', 'Coihue', 'Coihue')])
+
+    def test_missing_change_triggers_rebuild(self):
+        """Test that a version bump without a published change rebuilds the index."""
+        from .cache import bump_suggest_version
+        self.labels('rob')
+        Product.objects.filter(pk=self.oak.pk).update(title='Coihue')
+        bump_suggest_version()
+        with self.after_ttl():
+            self.assertEqual(self.labels('coi'), [('product', 'Coihue', 'Coihue')])
+
+    def test_units_follow_their_product(self):
+        """Test that units of an inactive product are not suggested."""
+        self.labels('rob')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oak.is_active = False
+            self.oak.save()
+        self.assertEqual(self.labels('rob'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.unit.save()
+        self.assertEqual(self.labels('arbol'), [])
+        suggest_index.reset()
+        self.assertEqual(self.labels('arbol'), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.oak.is_active = True
+            self.oak.save()
+        self.assertEqual(self.labels('arbol'), [('unit', 'Árbol del Amanecer', 'Árbol del Amanecer')])
+
+    def test_requires_query(self):
+        """Test that q is required."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SponsorshipUnitAPITest(APITestCase):
+    """Tests for the sponsorship unit list, detail and search endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.category = Category.objects.create(name='Trees', slug='trees')
+        self.oak = Product.objects.create(
+            title='Roble', slug='roble', category=self.category,
+            product_type=Product.ProductType.TREE, price=Decimal('20.00'),
+        )
+        self.lenga = Product.objects.create(
+            title='Lenga', slug='lenga', category=self.category,
+            product_type=Product.ProductType.TREE, price=Decimal('35.00'),
+        )
+        self.list_url = reverse('products:unit-list')
+
+    def create_units(self, count, product=None, **fields):
+        product = product or self.oak
+        units = []
+        for _ in range(count):
+            number = SponsorshipUnit.objects.count() + 1
+            unit = SponsorshipUnit.objects.create(
+                code=f'TREE-{number:03d}', name=f'Tree {number}', product=product, **fields
+            )
+            UnitImage.objects.create(unit=unit, image_url=f'https://example.com/{number}.jpg', is_primary=True)
+            units.append(unit)
+        return units
+
+    def count_queries(self, url, params=None):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(context)
+
+    def slugs(self, response):
+        return [item['slug'] for item in response.data['results']]
+
+    def test_list_query_count_is_constant(self):
+        """Test that a page of units does not issue queries per unit."""
+        self.create_units(3)
+        small = self.count_queries(self.list_url)
+        self.create_units(3, product=self.lenga)
+        self.assertEqual(self.count_queries(self.list_url), small)
+
+    def test_list_hides_inactive(self):
+        """Test that inactive units and units of inactive products are excluded."""
+        visible, hidden = self.create_units(2)
+        hidden.is_active = False
+        hidden.save()
+        self.create_units(1, product=self.lenga)
+        self.lenga.is_active = False
+        self.lenga.save()
+        response = self.client.get(self.list_url)
+        self.assertEqual(self.slugs(response), [visible.slug])
+
+    def walk_cursor(self, params):
+        """Follow the keyset pages of the list and collect the slugs."""
+        slugs = []
+        response = self.client.get(self.list_url, {**params, 'pagination': 'cursor', 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            slugs.extend(self.slugs(response))
+            if not response.data['next']:
+                return slugs
+            response = self.client.get(response.data['next'])
+
+    def test_cursor_pages_nullable_and_related_orderings(self):
+        """Test that keyset pages follow nulls-last and related-field orderings."""
+        units = self.create_units(2) + self.create_units(3, product=self.lenga)
+        for unit, co2 in zip(units, [Decimal('3'), None, Decimal('5'), Decimal('3'), None]):
+            unit.co2_per_year = co2
+            unit.save()
+        expected = [units[index].slug for index in (2, 3, 0, 4, 1)]
+        self.assertEqual(self.walk_cursor({'ordering': '-co2_per_year'}), expected)
+        expected = [unit.slug for unit in sorted(units, key=lambda unit: (unit.product.price, unit.id))]
+        self.assertEqual(self.walk_cursor({'ordering': 'price'}), expected)
+
+    def test_detail_bounds_updates_and_hides_private(self):
+        """Test that the detail payload caps public updates and links the rest."""
+        unit = self.create_units(1)[0]
+        for index in range(7):
+            UnitUpdate.objects.create(unit=unit, title=f'Update {index}', content='...')
+        UnitUpdate.objects.create(unit=unit, title='Private', content='...', is_public=False)
+        response = self.client.get(reverse('products:unit-detail', kwargs={'slug': unit.slug}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['updates']), 5)
+        self.assertNotIn('Private', [update['title'] for update in response.data['updates']])
+        self.assertTrue(response.data['updates_next'])
+        self.assertIsNone(response.data['gallery_next'])
+
+        response = self.client.get(reverse('products:unit-updates', kwargs={'slug': unit.slug}))
+        self.assertEqual(len(response.data['results']), 7)
+
+    def test_updates_since_feed(self):
+        """Test that ?since= returns only newer public updates, oldest first."""
+        unit = self.create_units(1)[0]
+        for index in range(3):
+            UnitUpdate.objects.create(unit=unit, title=f'Update {index}', content='...')
+        detail = self.client.get(reverse('products:unit-detail', kwargs={'slug': unit.slug}))
+        cursor = detail.data['updates_cursor']
+        url = reverse('products:unit-updates', kwargs={'slug': unit.slug})
+
+        response = self.client.get(url, {'since': cursor})
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(response.data['cursor'], cursor)
+
+        UnitUpdate.objects.create(unit=unit, title='Private', content='...', is_public=False)
+        for title in ('New 1', 'New 2', 'New 3'):
+            UnitUpdate.objects.create(unit=unit, title=title, content='...')
+        response = self.client.get(url, {'since': cursor, 'page_size': 2})
+        self.assertEqual([update['title'] for update in response.data['results']], ['New 1', 'New 2'])
+        self.assertIn('since=', response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([update['title'] for update in response.data['results']], ['New 3'])
+        self.assertIsNone(response.data['next'])
+        response = self.client.get(url, {'since': response.data['cursor']})
+        self.assertEqual(response.data['results'], [])
+
+        response = self.client.get(url, {'since': ''})
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertEqual(response.data['results'][0]['title'], 'Update 0')
+        self.assertEqual(self.client.get(url, {'since': 'bogus'}).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_slug_is_404(self):
+        """Test that unknown units return 404."""
+        response = self.client.get(reverse('products:unit-detail', kwargs={'slug': 'missing'}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filters_and_ordering(self):
+        """Test status, price and CO2 ordering filters."""
+        small, large = self.create_units(2)
+        SponsorshipUnit.objects.filter(pk=small.pk).update(co2_per_year=Decimal('5.00'))
+        SponsorshipUnit.objects.filter(pk=large.pk).update(
+            co2_per_year=Decimal('25.00'), status=SponsorshipUnit.Status.SPONSORED
+        )
+        expensive = self.create_units(1, product=self.lenga)[0]
+
+        response = self.client.get(self.list_url, {'status': 'sponsored'})
+        self.assertEqual(self.slugs(response), [large.slug])
+        response = self.client.get(self.list_url, {'min_price': '30'})
+        self.assertEqual(self.slugs(response), [expensive.slug])
+        response = self.client.get(self.list_url, {'ordering': '-co2_per_year'})
+        self.assertEqual(self.slugs(response), [large.slug, small.slug, expensive.slug])
+
+        response = self.client.get(self.list_url, {'ordering': 'bogus'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search(self):
+        """Test that search requires q and ranks exact code matches first."""
+        self.create_units(3)
+        url = reverse('products:unit-search')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(url, {'q': 'tree-002'})
+        self.assertEqual(response.data['results'][0]['code'], 'TREE-002')
+
+
+class UnitMapTest(APITestCase):
+    """Tests for the clustered sponsorship unit map."""
+
+    def setUp(self):
+        cache.clear()
+        category = Category.objects.create(name='Trees', slug='trees')
+        self.product = Product.objects.create(
+            title='Roble', slug='roble', category=category,
+            product_type=Product.ProductType.TREE, price=Decimal('20.00'),
+        )
+        self.url = reverse('products:unit-map')
+        # Three units around Valdivia, one near Santiago
+        self.units = [
+            self.create_unit('-39.814', '-73.246'),
+            self.create_unit('-39.816', '-73.241', status=SponsorshipUnit.Status.SPONSORED),
+            self.create_unit('-39.821', '-73.252'),
+            self.create_unit('-33.449', '-70.669'),
+        ]
+        self.chile = '-76,-56,-66,-17'
+
+    def create_unit(self, lat, lng, **fields):
+        number = SponsorshipUnit.objects.count() + 1
+        return SponsorshipUnit.objects.create(
+            code=f'TREE-{number:03d}', name=f'Tree {number}', product=self.product,
+            location_lat_approx=Decimal(lat), location_lng_approx=Decimal(lng), **fields
+        )
+
+    def get_map(self, bbox, zoom):
+        response = self.client.get(self.url, {'bbox': bbox, 'zoom': zoom})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_low_zoom_returns_clusters_with_status_counts(self):
+        """Test that low zooms group units into clusters with a status breakdown."""
+        data = self.get_map(self.chile, 6)
+        self.assertEqual(data['units'], [])
+        clusters = sorted(data['clusters'], key=lambda cluster: cluster['count'])
+        self.assertEqual([cluster['count'] for cluster in clusters], [1, 3])
+        self.assertEqual(clusters[1]['statuses']['available'], 2)
+        self.assertEqual(clusters[1]['statuses']['sponsored'], 1)
+        self.assertAlmostEqual(clusters[1]['lat'], -39.817, places=3)
+
+    def test_high_zoom_returns_units_inside_bbox(self):
+        """Test that high zooms return individual units of the viewport."""
+        data = self.get_map('-73.3,-39.9,-73.2,-39.8', 15)
+        self.assertEqual(data['clusters'], [])
+        self.assertEqual(
+            sorted(unit['code'] for unit in data['units']), ['TREE-001', 'TREE-002', 'TREE-003']
+        )
+        self.assertFalse(data['truncated'])
+
+    def test_layers_are_cached_per_zoom(self):
+        """Test that a cached cluster layer is served without queries."""
+        self.get_map(self.chile, 6)
+        with self.assertNumQueries(0):
+            self.get_map(self.chile, 2)
+            self.get_map('-74,-40,-73,-39', 6)
+
+    def test_status_change_invalidates_clusters(self):
+        """Test that a unit status change is reflected in the next response."""
+        self.get_map(self.chile, 4)
+        unit = self.units[0]
+        unit.status = SponsorshipUnit.Status.RESERVED
+        unit.save()
+        statuses = [cluster['statuses'] for cluster in self.get_map(self.chile, 4)['clusters']]
+        self.assertEqual(sum(item['reserved'] for item in statuses), 1)
+
+    def test_invalid_params(self):
+        """Test that bbox and zoom are validated."""
+        response = self.client.get(self.url, {'bbox': '1,2,3', 'zoom': 5})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'bbox': self.chile})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class UnitAllocationTest(TestCase):
+    """Tests for claiming available sponsorship units."""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        self.user = get_user_model().objects.create_user(
+            username='sponsor', email='sponsor@example.com', password='x'
+        )
+        category = Category.objects.create(name='Trees', slug='trees')
+        self.product = Product.objects.create(
+            title='Roble', slug='roble', category=category,
+            product_type=Product.ProductType.TREE, price=Decimal('20.00'),
+        )
+        self.units = [
+            SponsorshipUnit.objects.create(code=f'TREE-{index:03d}', name=f'Tree {index}', product=self.product)
+            for index in range(4)
+        ]
+        self.units[0].status = SponsorshipUnit.Status.SPONSORED
+        self.units[0].save()
+        self.units[1].is_active = False
+        self.units[1].save()
+        self.service = SponsorshipUnitService()
+
+    def test_claims_available_units_for_sponsor(self):
+        """Test that available active units are sponsored by the buyer."""
+        claimed = self.service.allocate_units(self.product.id, 2, sponsor=self.user)
+        self.assertEqual(claimed, [self.units[2].id, self.units[3].id])
+        for unit in SponsorshipUnit.objects.filter(id__in=claimed):
+            self.assertEqual(unit.status, SponsorshipUnit.Status.SPONSORED)
+            self.assertEqual(unit.sponsor, self.user)
+            self.assertIsNotNone(unit.sponsored_at)
+
+    def test_reserve_status(self):
+        """Test that units can be claimed as reserved."""
+        claimed = self.service.allocate_units(
+            self.product.id, 1, sponsor=self.user, status=SponsorshipUnit.Status.RESERVED
+        )
+        unit = SponsorshipUnit.objects.get(id=claimed[0])
+        self.assertEqual(unit.status, SponsorshipUnit.Status.RESERVED)
+        self.assertIsNone(unit.sponsored_at)
+
+    def test_all_or_nothing(self):
+        """Test that a shortfall claims nothing unless partial is allowed."""
+        self.assertEqual(self.service.allocate_units(self.product.id, 3, sponsor=self.user), [])
+        self.assertEqual(
+            SponsorshipUnit.objects.filter(status=SponsorshipUnit.Status.AVAILABLE, is_active=True).count(), 2
+        )
+        claimed = self.service.allocate_units(self.product.id, 3, sponsor=self.user, partial=True)
+        self.assertEqual(len(claimed), 2)
+
+    def test_claim_bumps_units_version(self):
+        """Test that bulk claims invalidate cached unit data."""
+        from .cache import get_units_version
+
+        version = get_units_version()
+        self.service.allocate_units(self.product.id, 1, sponsor=self.user)
+        self.assertGreater(get_units_version(), version)
+
+
+class ConcurrentUnitAllocationTest(TransactionTestCase):
+    """Tests that parallel buyers never get the same unit."""
+
+    def test_units_are_claimed_once(self):
+        """Test that 12 parallel claims of 1 unit over 6 units yield 6 distinct units."""
+        category = Category.objects.create(name='Trees', slug='trees')
+        product = Product.objects.create(
+            title='Roble', slug='roble', category=category,
+            product_type=Product.ProductType.TREE, price=Decimal('20.00'),
+        )
+        for index in range(6):
+            SponsorshipUnit.objects.create(code=f'TREE-{index:03d}', name=f'Tree {index}', product=product)
+        service = SponsorshipUnitService()
+        workers = 12
+        barrier = threading.Barrier(workers)
+
+        def claim(_):
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        return service.allocate_units(product.id, 1)
+                    except OperationalError:
+                        # SQLite reports contention as "table is locked"; retry
+                        time.sleep(0.001)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = [unit_id for claimed in executor.map(claim, range(workers)) for unit_id in claimed]
+        self.assertEqual(len(results), 6)
+        self.assertEqual(len(set(results)), 6)
+        self.assertFalse(SponsorshipUnit.objects.filter(status=SponsorshipUnit.Status.AVAILABLE).exists())
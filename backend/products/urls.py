@@ -1,21 +1,31 @@
 """
 Product URL configuration.
 
-This module defines URL patterns for product and category endpoints.
+This module defines URL patterns for product, category and sponsorship unit endpoints.
 """
 
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 
-from .views import ProductViewSet, CategoryViewSet
+from .views import (
+    ProductViewSet, CategoryViewSet, CatalogExportView, HomeView, SearchSuggestView, SponsorshipUnitViewSet
+)
 
 # Create router and register viewsets
 router = DefaultRouter()
 router.register(r'products', ProductViewSet, basename='product')
 router.register(r'categories', CategoryViewSet, basename='category')
+router.register(r'units', SponsorshipUnitViewSet, basename='unit')
 
 app_name = 'products'
 
 urlpatterns = [
+    path('home/', HomeView.as_view(), name='home'),
+    path('search/suggest/', SearchSuggestView.as_view(), name='search-suggest'),
+    re_path(
+        r'^export/(?P<resource>products|units)\.(?P<export_format>ndjson|csv)$',
+        CatalogExportView.as_view(),
+        name='catalog-export',
+    ),
     path('', include(router.urls)),
 ]
@@ -4,23 +4,63 @@ Product API views.
 This module defines API endpoints for products and categories.
 """
 
+from django.core.cache import cache
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import require_safe
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAdminUser
+from rest_framework.permissions import AllowAny, IsAuthenticatedOrReadOnly, IsAdminUser
+from rest_framework.throttling import ScopedRateThrottle
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import SearchFilter, OrderingFilter
 from drf_spectacular.utils import extend_schema, extend_schema_view, OpenApiParameter
 
+from config.pagination import KeysetPagination, SinceKeysetPagination
+from .cache import CatalogCacheMixin, ConditionalGetMixin, get_cache_stats
+from .exports import EXPORT_CONTENT_TYPES, stream_export
+from .fieldsets import optimize_queryset
+from .filters import (
+    CatalogOrderingFilter, CatalogSearchFilter, ProximityFilter, RangeFilter, UnitSearchFilter
+)
+from .projections import ProductListProjection, ProjectedListMixin
 from .models import Product, Category
 from .serializers import (
+    AvailabilityBatchSerializer,
+    AvailabilityResultSerializer,
+    BatchQuerySerializer,
+    BBoxQuerySerializer,
     CategorySerializer,
     CategoryListSerializer,
+    NearestQuerySerializer,
     ProductListSerializer,
     ProductDetailSerializer,
     ProductCreateSerializer,
+    ProductImageSerializer,
+    ProductUpdateSerializer,
+    SponsorshipUnitDetailSerializer,
+    SponsorshipUnitListSerializer,
+    SponsorshipUnitSearchSerializer,
+    SuggestQuerySerializer,
+    SuggestResponseSerializer,
+    UnitImageSerializer,
+    UnitMapQuerySerializer,
+    UnitMapResponseSerializer,
+    UnitUpdateSerializer,
+    get_request_language,
+)
+from .services import product_service, category_service, home_service, unit_service
+from .sitemaps import (
+    SITEMAP_CONTENT_TYPE,
+    cache_while_streaming,
+    index_cache_key,
+    iter_index,
+    iter_shard,
+    shard_cache_key,
+    shard_exists,
 )
-from .services import product_service, category_service
 
 
 @extend_schema_view(
@@ -35,11 +75,12 @@ from .services import product_service, category_service
         tags=["Products"]
     ),
 )
-class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for product categories.
     
     Provides list and retrieve operations for categories.
+    Supports conditional GET (ETag / Last-Modified).
     """
     
     queryset = Category.objects.filter(is_active=True)
@@ -51,6 +92,11 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
             return CategoryListSerializer
         return CategorySerializer
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['language'] = get_request_language(self.request)
+        return context
+    
     @extend_schema(
         summary="Get category products",
         description="Get all products in a specific category.",
@@ -73,30 +119,51 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
             OpenApiParameter(name='category', description='Filter by category slug'),
             OpenApiParameter(name='product_type', description='Filter by product type'),
             OpenApiParameter(name='is_featured', description='Filter featured products'),
-            OpenApiParameter(name='search', description='Search in title and description'),
+            OpenApiParameter(name='min_price', type=float, description='Minimum price (inclusive)'),
+            OpenApiParameter(name='max_price', type=float, description='Maximum price (inclusive)'),
+            OpenApiParameter(name='min_rating', type=float, description='Minimum rating 0-5 (inclusive)'),
+            OpenApiParameter(name='max_rating', type=float, description='Maximum rating 0-5 (inclusive)'),
+            OpenApiParameter(name='ordering', description='price, -price, rating, -rating, created_at, -created_at'),
+            OpenApiParameter(name='search', description='Full-text search in titles, descriptions and species (ES/EN)'),
+            OpenApiParameter(name='near', description='"lat,lng": annotate distance_km and sort by distance'),
+            OpenApiParameter(name='radius_km', type=float, description='With near: only products within this radius'),
+            OpenApiParameter(name='fields', description='Comma separated fields to include'),
+            OpenApiParameter(name='omit', description='Comma separated fields to exclude'),
         ]
     ),
     retrieve=extend_schema(
         summary="Get product details",
-        description="Get full product details by slug.",
-        tags=["Products"]
+        description="Get full product details by slug. Gallery and updates are capped; "
+                    "gallery_next / updates_next link to the rest.",
+        tags=["Products"],
+        parameters=[
+            OpenApiParameter(name='fields', description='Comma separated fields to include'),
+            OpenApiParameter(name='omit', description='Comma separated fields to exclude'),
+        ]
     ),
 )
-class ProductViewSet(viewsets.ReadOnlyModelViewSet):
+class ProductViewSet(ConditionalGetMixin, CatalogCacheMixin, ProjectedListMixin, viewsets.ReadOnlyModelViewSet):
     """
     ViewSet for products.
     
     Provides list and retrieve operations with filtering and search.
+    List and retrieve responses are served from the versioned catalog cache,
+    and all catalog reads support conditional GET (ETag / Last-Modified).
+    ?fields= / ?omit= prune both the response and the SQL. List payloads
+    are rendered from values() rows by ProductListProjection.
     """
     
     queryset = Product.objects.filter(is_active=True).select_related('category').prefetch_related('gallery')
     permission_classes = [IsAuthenticatedOrReadOnly]
     lookup_field = 'slug'
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [
+        DjangoFilterBackend, RangeFilter, CatalogSearchFilter, ProximityFilter, CatalogOrderingFilter
+    ]
     filterset_fields = ['category__slug', 'product_type', 'is_featured', 'is_new']
-    search_fields = ['title', 'description', 'short_description', 'species']
     ordering_fields = ['price', 'rating', 'created_at']
     ordering = ['-created_at']
+    geo_fields = ('location_lat', 'location_lng')
+    list_projection_class = ProductListProjection
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -104,13 +171,35 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         category = self.request.query_params.get('category')
         if category:
             queryset = queryset.filter(category__slug=category)
+        if self.action == 'retrieve':
+            queryset = queryset.prefetch_related(None).prefetch_related(
+                *ProductDetailSerializer.get_prefetches()
+            )
         return queryset
     
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return optimize_queryset(queryset, self.get_serializer_class(), self.request)
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return ProductListSerializer
         return ProductDetailSerializer
     
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['language'] = get_request_language(self.request)
+        return context
+    
+    def product_list_response(self, request, products):
+        """Render a product list, answering 304 when the client copy is current."""
+        projection = ProductListProjection(context=self.get_serializer_context())
+        return self.conditional_response(
+            request,
+            products,
+            lambda: Response(projection.render(projection.values(products)))
+        )
+    
     @extend_schema(
         summary="Get featured products",
         description="Get products marked as featured for homepage display.",
@@ -121,8 +210,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         """Get featured products."""
         limit = int(request.query_params.get('limit', 10))
         products = product_service.get_featured_products(limit)
-        serializer = ProductListSerializer(products, many=True)
-        return Response(serializer.data)
+        return self.product_list_response(request, products)
     
     @extend_schema(
         summary="Get new arrivals",
@@ -134,8 +222,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
         """Get new arrival products."""
         limit = int(request.query_params.get('limit', 10))
         products = product_service.get_new_arrivals(limit)
-        serializer = ProductListSerializer(products, many=True)
-        return Response(serializer.data)
+        return self.product_list_response(request, products)
     
     @extend_schema(
         summary="Get tree products",
@@ -146,8 +233,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     def trees(self, request):
         """Get all tree products."""
         products = product_service.get_trees()
-        serializer = ProductListSerializer(products, many=True)
-        return Response(serializer.data)
+        return self.product_list_response(request, products)
     
     @extend_schema(
         summary="Get retreat products",
@@ -158,8 +244,7 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
     def retreats(self, request):
         """Get all retreat products."""
         products = product_service.get_retreats()
-        serializer = ProductListSerializer(products, many=True)
-        return Response(serializer.data)
+        return self.product_list_response(request, products)
     
     @extend_schema(
         summary="Check product availability",
@@ -178,3 +263,404 @@ class ProductViewSet(viewsets.ReadOnlyModelViewSet):
             'is_available': is_available,
             'stock': product.stock if not product.is_unlimited_stock else None,
         })
+    
+    @extend_schema(
+        summary="Check availability in batch",
+        description="Check up to 200 (product_id, quantity) lines with one query. Lines "
+                    "for the same product are checked against their combined quantity.",
+        tags=["Products"],
+        request=AvailabilityBatchSerializer,
+        responses=AvailabilityResultSerializer(many=True)
+    )
+    @action(
+        detail=False, methods=['post'], url_path='availability',
+        url_name='availability-batch', permission_classes=[AllowAny]
+    )
+    def availability_batch(self, request):
+        """Check availability of many products at once."""
+        params = AvailabilityBatchSerializer(data=request.data)
+        params.is_valid(raise_exception=True)
+        lines = [(item['product_id'], item['quantity']) for item in params.validated_data['items']]
+        results = product_service.check_availability_batch(lines)
+        return Response({
+            'items': results,
+            'all_available': all(line['is_available'] for line in results),
+        })
+    
+    @extend_schema(
+        summary="Get products in batch",
+        description="Resolve up to 200 products by ids=1,2,3 or slugs=a,b in one request. "
+                    "Results keep the request order; unknown or inactive keys are listed "
+                    "in missing.",
+        tags=["Products"],
+        parameters=[BatchQuerySerializer]
+    )
+    @action(detail=False, methods=['get'])
+    def batch(self, request):
+        """Get many products by id or slug."""
+        return self.cached_response(request, 'batch', self.batch_response)
+    
+    def batch_response(self, request):
+        params = BatchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        field = 'id' if 'ids' in params.validated_data else 'slug'
+        keys = params.validated_data['ids' if field == 'id' else 'slugs']
+        queryset = optimize_queryset(
+            product_service.get_all_products(), ProductListSerializer, request, keep=(field,)
+        )
+        products, missing = product_service.get_products_batch(queryset, keys, field)
+        serializer = ProductListSerializer(products, many=True, context=self.get_serializer_context())
+        return Response({'results': serializer.data, 'missing': missing})
+    
+    @extend_schema(
+        summary="Get catalog facet counts",
+        description="Get product counts per category, product type, pricing type, price "
+                    "bucket and featured/new flags for the applied filters (same query "
+                    "params as the product list). Cached per filter signature.",
+        tags=["Products"]
+    )
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Get facet counts for the current filters."""
+        return self.cached_response(request, 'facets', self.facets_response)
+    
+    def facets_response(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(product_service.get_facets(queryset, get_request_language(request)))
+    
+    @extend_schema(
+        summary="Get products in a bounding box",
+        description="Get active products located inside a map viewport "
+                    "(bbox=min_lng,min_lat,max_lng,max_lat).",
+        tags=["Products"],
+        parameters=[BBoxQuerySerializer],
+        responses=ProductListSerializer(many=True)
+    )
+    @action(detail=False, methods=['get'])
+    def within(self, request):
+        """Get products inside a bounding box (paginated)."""
+        params = BBoxQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        projection = ProductListProjection(context=self.get_serializer_context())
+        rows = projection.values(product_service.get_products_within(params.validated_data['bbox']))
+        page = self.paginate_queryset(rows)
+        return self.get_paginated_response(projection.render(page))
+    
+    @extend_schema(
+        summary="Get nearest products",
+        description="Get the active products nearest to a point, closest first, "
+                    "with distance_km.",
+        tags=["Products"],
+        parameters=[NearestQuerySerializer],
+        responses=ProductListSerializer(many=True)
+    )
+    @action(detail=False, methods=['get'])
+    def nearest(self, request):
+        """Get the N nearest products."""
+        params = NearestQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        products = product_service.get_nearest_products(**params.validated_data)
+        serializer = ProductListSerializer(products, many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
+    
+    def related_page_response(self, request, slug, queryset_getter, serializer_class):
+        """Serve a product's related collection with keyset pagination."""
+        product = product_service.get_product_by_slug(slug)
+        if product is None:
+            raise Http404
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(queryset_getter(product), request, self)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+    
+    @extend_schema(
+        summary="Get product gallery",
+        description="Get all gallery images of a product (cursor paginated).",
+        tags=["Products"],
+        responses=ProductImageSerializer(many=True)
+    )
+    @action(detail=True, methods=['get'])
+    def gallery(self, request, slug=None):
+        """Get the full product gallery."""
+        return self.related_page_response(
+            request, slug, product_service.get_product_gallery, ProductImageSerializer
+        )
+    
+    @extend_schema(
+        summary="Get product updates",
+        description="Get the full update timeline of a product, newest first (cursor paginated).",
+        tags=["Products"],
+        responses=ProductUpdateSerializer(many=True)
+    )
+    @action(detail=True, methods=['get'])
+    def updates(self, request, slug=None):
+        """Get the full product update timeline."""
+        return self.related_page_response(
+            request, slug, product_service.get_product_updates, ProductUpdateSerializer
+        )
+    
+    @extend_schema(
+        summary="Get catalog cache stats (Admin)",
+        description="Get hit/miss counters and the current version of the catalog cache.",
+        tags=["Products"]
+    )
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        """Get catalog cache statistics (admin only)."""
+        return Response(get_cache_stats())
+
+
+@extend_schema_view(
+    list=extend_schema(
+        summary="List sponsorship units",
+        description="Get active units of active products with optional filtering.",
+        tags=["Units"],
+        parameters=[
+            SponsorshipUnitSearchSerializer,
+            OpenApiParameter(name='near', description='"lat,lng": annotate distance_km and sort by distance'),
+            OpenApiParameter(name='radius_km', type=float, description='With near: only units within this radius'),
+            OpenApiParameter(name='fields', description='Comma separated fields to include'),
+            OpenApiParameter(name='omit', description='Comma separated fields to exclude'),
+        ]
+    ),
+    retrieve=extend_schema(
+        summary="Get sponsorship unit details",
+        description="Get full unit details by slug. Gallery and public updates are capped; "
+                    "gallery_next / updates_next link to the rest.",
+        tags=["Units"],
+        parameters=[
+            OpenApiParameter(name='fields', description='Comma separated fields to include'),
+            OpenApiParameter(name='omit', description='Comma separated fields to exclude'),
+        ]
+    ),
+)
+class SponsorshipUnitViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    ViewSet for sponsorship units.
+    
+    Provides list, search and retrieve operations for active units of
+    active products. Product and sponsor are joined and primary images are
+    annotated, so a list page costs a fixed number of queries; the detail
+    gallery and updates are bounded prefetches. ?near= uses the approximate
+    coordinates shown to non-sponsors.
+    """
+    
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    lookup_field = 'slug'
+    filter_backends = [ProximityFilter, UnitSearchFilter]
+    geo_fields = ('location_lat_approx', 'location_lng_approx')
+    
+    def get_queryset(self):
+        queryset = unit_service.get_units().with_primary_image()
+        if self.action == 'retrieve':
+            queryset = queryset.select_related('product__category').prefetch_related(
+                *SponsorshipUnitDetailSerializer.get_prefetches()
+            )
+        return queryset
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return optimize_queryset(queryset, self.get_serializer_class(), self.request)
+    
+    def get_serializer_class(self):
+        if self.action == 'retrieve':
+            return SponsorshipUnitDetailSerializer
+        return SponsorshipUnitListSerializer
+    
+    @extend_schema(
+        summary="Search sponsorship units",
+        description="Search units by code, name, species or location (q is required). "
+                    "Exact code matches come first unless an ordering is given.",
+        tags=["Units"],
+        parameters=[SponsorshipUnitSearchSerializer],
+        responses=SponsorshipUnitListSerializer(many=True)
+    )
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """Search units."""
+        if not request.query_params.get('q', '').strip():
+            raise ValidationError({'q': ['This field is required.']})
+        return self.list(request)
+    
+    @extend_schema(
+        summary="Get the unit map",
+        description="Get the units inside a map viewport (bbox=min_lng,min_lat,max_lng,max_lat). "
+                    "Below zoom 14, units are grouped into cached geohash clusters with "
+                    "per-status counts; from zoom 14 on, individual units are returned "
+                    "(at most 500). Approximate coordinates only.",
+        tags=["Units"],
+        parameters=[UnitMapQuerySerializer],
+        responses=UnitMapResponseSerializer
+    )
+    @action(detail=False, methods=['get'])
+    def map(self, request):
+        """Get clusters or unit markers for a map viewport."""
+        params = UnitMapQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        return Response(unit_service.get_map(params.validated_data['bbox'], params.validated_data['zoom']))
+    
+    def related_page_response(self, request, slug, queryset_getter, serializer_class,
+                              pagination_class=KeysetPagination):
+        """Serve a unit's related collection with keyset pagination."""
+        unit = unit_service.get_unit_by_slug(slug)
+        if unit is None:
+            raise Http404
+        paginator = pagination_class()
+        page = paginator.paginate_queryset(queryset_getter(unit), request, self)
+        serializer = serializer_class(page, many=True, context=self.get_serializer_context())
+        return paginator.get_paginated_response(serializer.data)
+    
+    @extend_schema(
+        summary="Get unit gallery",
+        description="Get all gallery images of a unit (cursor paginated).",
+        tags=["Units"],
+        responses=UnitImageSerializer(many=True)
+    )
+    @action(detail=True, methods=['get'])
+    def gallery(self, request, slug=None):
+        """Get the full unit gallery."""
+        return self.related_page_response(
+            request, slug, unit_service.get_unit_gallery, UnitImageSerializer
+        )
+    
+    @extend_schema(
+        summary="Get unit updates",
+        description="Get the public update timeline of a unit, newest first (cursor paginated). "
+                    "With ?since=<cursor> (e.g. the detail's updates_cursor), only newer updates "
+                    "are returned, oldest first; poll again with the returned cursor.",
+        tags=["Units"],
+        parameters=[
+            OpenApiParameter(name='since', description='Only updates after this cursor (empty: from the start)'),
+        ],
+        responses=UnitUpdateSerializer(many=True)
+    )
+    @action(detail=True, methods=['get'])
+    def updates(self, request, slug=None):
+        """Get the public update timeline of a unit, or the updates since a cursor."""
+        return self.related_page_response(
+            request, slug, unit_service.get_unit_updates, UnitUpdateSerializer,
+            pagination_class=SinceKeysetPagination
+        )
+
+
+class HomeView(APIView):
+    """
+    Homepage bundle.
+    
+    Featured products, new arrivals, categories and community forest stats
+    in one cached response per language.
+    """
+    
+    permission_classes = [AllowAny]
+    
+    @extend_schema(
+        summary="Get homepage bundle",
+        description=(
+            "Get featured products, new arrivals, categories and community "
+            "forest stats for the landing page in a single response."
+        ),
+        tags=["Products"]
+    )
+    def get(self, request):
+        bundle, hit = home_service.get_bundle(get_request_language(request))
+        response = Response(bundle)
+        response['X-Cache'] = 'HIT' if hit else 'MISS'
+        patch_vary_headers(response, ['Accept-Language'])
+        return response
+
+
+class SearchSuggestView(APIView):
+    """
+    Search-as-you-type suggestions.
+    
+    Served from a per-process in-memory prefix index of product titles,
+    species, location names and unit names/codes.
+    """
+    
+    permission_classes = [AllowAny]
+    
+    @extend_schema(
+        summary="Search suggestions",
+        description=(
+            "Products and sponsorship units with a word starting with `q` "
+            "(case and accent insensitive), best matches first."
+        ),
+        parameters=[SuggestQuerySerializer],
+        responses=SuggestResponseSerializer,
+        tags=["Products"]
+    )
+    def get(self, request):
+        params = SuggestQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        results = product_service.suggest(
+            params.validated_data['q'],
+            limit=params.validated_data['limit'],
+            kind=params.validated_data.get('type'),
+            language=get_request_language(request),
+        )
+        response = Response({'query': params.validated_data['q'], 'results': results})
+        patch_vary_headers(response, ['Accept-Language'])
+        return response
+
+
+class CatalogExportView(APIView):
+    """
+    Streaming catalog export.
+    
+    Every active product or unit as NDJSON or CSV, read through a
+    server-side cursor and streamed as it is encoded.
+    """
+    
+    permission_classes = [AllowAny]
+    throttle_classes = [ScopedRateThrottle]
+    throttle_scope = 'export'
+    
+    def perform_content_negotiation(self, request, force=False):
+        # The body is not rendered by DRF; never fail on the Accept header
+        return super().perform_content_negotiation(request, force=True)
+    
+    @extend_schema(
+        summary="Export the catalog",
+        description=(
+            "Stream every active product or sponsorship unit as NDJSON "
+            "(/api/export/products.ndjson) or CSV (/api/export/units.csv)."
+        ),
+        tags=["Products"],
+        responses={(200, 'application/x-ndjson'): str, (200, 'text/csv'): str}
+    )
+    def get(self, request, resource, export_format):
+        response = StreamingHttpResponse(
+            stream_export(resource, export_format),
+            content_type=EXPORT_CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="{resource}.{export_format}"'
+        return response
+
+
+def _sitemap_response(key: str, build) -> HttpResponse:
+    """Serve a cached sitemap body, or stream a fresh one and cache it."""
+    body = cache.get(key)
+    if body is not None:
+        response = HttpResponse(body, content_type=SITEMAP_CONTENT_TYPE)
+        response['X-Cache'] = 'HIT'
+    else:
+        response = StreamingHttpResponse(cache_while_streaming(key, build()), content_type=SITEMAP_CONTENT_TYPE)
+        response['X-Cache'] = 'MISS'
+    patch_cache_control(response, public=True, max_age=3600)
+    return response
+
+
+@require_safe
+def sitemap_index(request):
+    """Sitemap index listing every product shard."""
+    return _sitemap_response(index_cache_key(), iter_index)
+
+
+@require_safe
+def sitemap_shard(request, section, number):
+    """One shard of product page URLs."""
+    number = int(number)
+    key = shard_cache_key(section, number)
+    if cache.get(key) is None and not shard_exists(section, number):
+        raise Http404('Sitemap shard not found')
+    return _sitemap_response(key, lambda: iter_shard(section, number))
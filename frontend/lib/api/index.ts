@@ -7,3 +7,4 @@
 export { apiClient, ApiError } from './client';
 export * from './products';
 export * from './orders';
+export * from './units';
@@ -20,9 +20,13 @@ export interface Category {
   product_count?: number;
 }
 
+/** srcset strings of resized variants, keyed by format ('webp', 'jpeg') */
+export type ImageSrcSet = Partial<Record<'webp' | 'jpeg', string>>;
+
 export interface ProductImage {
   id: number;
   url: string;
+  srcset?: ImageSrcSet;
   alt_text: string;
   is_primary: boolean;
 }
@@ -52,6 +56,7 @@ export interface Product {
   product_type: 'tree' | 'forest' | 'lagoon' | 'experience';
   gallery?: ProductImage[];
   primary_image?: string;
+  primary_image_srcset?: ImageSrcSet;
   rating: number | string;
   reviews_count: number;
   features?: string[];
@@ -112,6 +117,10 @@ export async function getProducts(params?: {
   product_type?: string;
   is_featured?: boolean;
   search?: string;
+  min_price?: number;
+  max_price?: number;
+  min_rating?: number;
+  max_rating?: number;
   ordering?: string;
   page?: number;
 }): Promise<ProductListResponse> {
@@ -125,6 +134,29 @@ export async function getProductBySlug(slug: string): Promise<Product> {
   return apiClient.get<Product>(`/api/products/${slug}/`);
 }
 
+export interface ProductBatchResponse<K> {
+  results: Product[];
+  missing: K[];
+}
+
+/**
+ * Get many products in one request, in the given order (max 200)
+ */
+export async function getProductsByIds(ids: number[]): Promise<ProductBatchResponse<number>> {
+  return apiClient.get<ProductBatchResponse<number>>('/api/products/batch/', {
+    params: { ids: ids.join(',') },
+  });
+}
+
+/**
+ * Get many products by slug in one request, in the given order (max 200)
+ */
+export async function getProductsBySlugs(slugs: string[]): Promise<ProductBatchResponse<string>> {
+  return apiClient.get<ProductBatchResponse<string>>('/api/products/batch/', {
+    params: { slugs: slugs.join(',') },
+  });
+}
+
 /**
  * Get featured products
  */
@@ -143,6 +175,49 @@ export async function getNewArrivals(limit = 10): Promise<Product[]> {
   });
 }
 
+export interface ForestStats {
+  tree_count: number;
+  total_co2_offset_kg: number;
+  total_co2_offset_tons: number;
+  equivalent_car_miles: number;
+}
+
+export interface HomeBundle {
+  featured: Product[];
+  new_arrivals: Product[];
+  categories: Category[];
+  forest_stats: ForestStats;
+}
+
+/**
+ * Get the homepage bundle (featured, new arrivals, categories, forest stats)
+ */
+export async function getHomeBundle(): Promise<HomeBundle> {
+  return apiClient.get<HomeBundle>('/api/home/');
+}
+
+export interface SearchSuggestion {
+  type: 'product' | 'unit';
+  id: number;
+  slug: string;
+  label: string;
+  matched: string;
+  category_slug: string | null;
+  code: string | null;
+}
+
+/**
+ * Get search-as-you-type suggestions for products and sponsorship units
+ */
+export async function getSearchSuggestions(
+  q: string,
+  params?: { limit?: number; type?: 'product' | 'unit' }
+): Promise<{ query: string; results: SearchSuggestion[] }> {
+  return apiClient.get('/api/search/suggest/', {
+    params: { q, ...params },
+  });
+}
+
 /**
  * Get tree products
  */
@@ -0,0 +1,223 @@
+/**
+ * Sponsorship units API client
+ * 
+ * API functions for listing, searching and reading sponsorship units.
+ */
+
+import { apiClient } from './client';
+import type { ImageSrcSet, Product } from './products';
+
+// =============================================================================
+// Types
+// =============================================================================
+
+export type UnitStatus = 'available' | 'sponsored' | 'reserved' | 'inactive';
+
+export type UnitOrdering = 'price' | '-price' | '-co2_per_year' | '-created_at' | 'name';
+
+export interface SponsorshipUnit {
+  id: number;
+  code: string;
+  name: string;
+  slug: string;
+  product_title: string;
+  product_type: Product['product_type'];
+  price: number | string;
+  price_label?: string;
+  status: UnitStatus;
+  is_available: boolean;
+  location_name: string;
+  species: string;
+  co2_per_year: number | string | null;
+  primary_image?: string;
+  is_featured: boolean;
+  distance_km?: number;
+}
+
+export interface UnitImage {
+  id: number;
+  url: string;
+  srcset?: ImageSrcSet;
+  alt_text: string;
+  caption: string;
+  taken_at: string | null;
+  is_primary: boolean;
+  display_order: number;
+}
+
+export interface UnitUpdate {
+  id: number;
+  update_type: string;
+  update_type_display: string;
+  title: string;
+  content: string;
+  image_display_url: string;
+  srcset?: ImageSrcSet;
+  height_cm: number | null;
+  co2_absorbed: number | string | null;
+  health_status: string;
+  is_public: boolean;
+  created_at: string;
+}
+
+/** Exact for the unit's sponsor, approximate (with radius_km) for everyone else */
+export interface UnitLocation {
+  type: 'exact' | 'approximate';
+  name: string;
+  lat: number | null;
+  lng: number | null;
+  area?: string;
+  radius_km?: number;
+  message?: string;
+  can_visit: boolean;
+}
+
+export interface SponsorshipUnitDetail {
+  id: number;
+  code: string;
+  name: string;
+  slug: string;
+  product: Product;
+  status: UnitStatus;
+  is_available: boolean;
+  description: string;
+  story: string;
+  location: UnitLocation;
+  is_user_sponsor: boolean;
+  species: string;
+  age_years: number | null;
+  height_cm: number | null;
+  area_m2: number | string | null;
+  co2_per_year: number | string | null;
+  co2_absorbed_total: number | string | null;
+  sponsor_name: string | null;
+  sponsored_at: string | null;
+  sponsorship_expires_at: string | null;
+  is_active: boolean;
+  is_featured: boolean;
+  // Capped; *_next links to the full collection (null when complete)
+  gallery: UnitImage[];
+  gallery_next: string | null;
+  updates: UnitUpdate[];
+  updates_next: string | null;
+  // Pass to getUnitUpdatesSince to fetch only updates posted later
+  updates_cursor: string | null;
+  primary_image?: string;
+  created_at: string;
+  updated_at: string;
+}
+
+export type UnitListParams = {
+  product_type?: string;
+  status?: UnitStatus;
+  min_price?: number;
+  max_price?: number;
+  location?: string;
+  min_rating?: number;
+  max_rating?: number;
+  is_featured?: boolean;
+  ordering?: UnitOrdering;
+  near?: string;
+  radius_km?: number;
+  page?: number;
+};
+
+export interface UnitListResponse {
+  count: number;
+  next: string | null;
+  previous: string | null;
+  results: SponsorshipUnit[];
+}
+
+/** Units of one geohash cell; lat/lng is the centroid of their approximate locations */
+export interface UnitMapCluster {
+  geohash: string;
+  lat: number;
+  lng: number;
+  count: number;
+  statuses: Record<UnitStatus, number>;
+}
+
+export interface UnitMapPoint {
+  id: number;
+  code: string;
+  name: string;
+  slug: string;
+  status: UnitStatus;
+  lat: number;
+  lng: number;
+}
+
+/** Clusters below zoom 14, individual units (capped, see truncated) from zoom 14 on */
+export interface UnitMapResponse {
+  zoom: number;
+  precision: number | null;
+  clusters: UnitMapCluster[];
+  units: UnitMapPoint[];
+  truncated: boolean;
+}
+
+/** Public updates after a cursor, oldest first */
+export interface UnitUpdatesFeed {
+  next: string | null;
+  results: UnitUpdate[];
+  // Poll again with this cursor; null until the unit has public updates
+  cursor: string | null;
+}
+
+// =============================================================================
+// API Functions
+// =============================================================================
+
+/**
+ * Get sponsorship units with optional filters
+ */
+export async function getUnits(params?: UnitListParams): Promise<UnitListResponse> {
+  return apiClient.get<UnitListResponse>('/api/units/', { params });
+}
+
+/**
+ * Get sponsorship unit by slug
+ */
+export async function getUnitBySlug(slug: string): Promise<SponsorshipUnitDetail> {
+  return apiClient.get<SponsorshipUnitDetail>(`/api/units/${slug}/`);
+}
+
+/**
+ * Search sponsorship units by code, name, species or location
+ */
+export async function searchUnits(
+  q: string,
+  params?: UnitListParams
+): Promise<UnitListResponse> {
+  return apiClient.get<UnitListResponse>('/api/units/search/', {
+    params: { ...params, q },
+  });
+}
+
+/**
+ * Get map clusters or unit markers for a viewport
+ * (bbox in GeoJSON order: [west, south, east, north])
+ */
+export async function getUnitMap(
+  bbox: [number, number, number, number],
+  zoom: number
+): Promise<UnitMapResponse> {
+  return apiClient.get<UnitMapResponse>('/api/units/map/', {
+    params: { bbox: bbox.join(','), zoom: Math.floor(zoom) },
+  });
+}
+
+/**
+ * Get the public updates of a unit posted after a cursor
+ * (the detail's updates_cursor or a previous feed cursor; null for all)
+ */
+export async function getUnitUpdatesSince(
+  slug: string,
+  since: string | null,
+  pageSize?: number
+): Promise<UnitUpdatesFeed> {
+  return apiClient.get<UnitUpdatesFeed>(`/api/units/${slug}/updates/`, {
+    params: { since: since ?? '', page_size: pageSize },
+  });
+}
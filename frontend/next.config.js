@@ -32,6 +32,27 @@ const nextConfig = {
     NEXT_PUBLIC_STRIPE_PUBLISHABLE_KEY: process.env.NEXT_PUBLIC_STRIPE_PUBLISHABLE_KEY,
   },
   
+  // Sitemaps are generated by the backend. In production nginx routes
+  // these paths to the backend directly; without nginx (docker-compose
+  // dev) they are proxied over the internal network. NEXT_PUBLIC_API_URL
+  // is not a fallback: it can be the site's own origin.
+  async rewrites() {
+    const apiUrl = process.env.INTERNAL_API_URL;
+    if (!apiUrl) {
+      return [];
+    }
+    return [
+      {
+        source: '/sitemap.xml',
+        destination: `${apiUrl}/sitemap.xml`,
+      },
+      {
+        source: '/sitemaps/:file',
+        destination: `${apiUrl}/sitemaps/:file`,
+      },
+    ];
+  },
+  
   // Security headers
   async headers() {
     return [